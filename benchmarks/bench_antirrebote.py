@@ -0,0 +1,120 @@
+# benchmarks/bench_antirrebote.py
+# Replay horario con muchas fugas: C clientes durante H horas, una fracción de ellos con una fuga
+# continua desde una hora al azar (probabilidades en paseo aleatorio, clasificadas con las reglas
+# del motor) y cada hora un lote de alertas a registrar_alertas, como el modo lote del simulador.
+# El antirrebote (antirrebote_alertas.py) usa el reloj del replay: una hora de datos = 3600 s.
+# Compara sin antirrebote (GESAI_ANTIRREBOTE_S=0) con varios intervalos: sentencias de escritura
+# (INSERT/UPDATE/DELETE, con set_trace_callback), transacciones con cambios, notificaciones y
+# tokens enviados, tiempo, y comprueba que el estado final (incidencia abierta y su clase de
+# severidad por cliente) es el mismo, y que una incidencia resuelta o reclasificada desde otro
+# proceso no sigue omitiendo las alertas del cliente.
+#   python benchmarks/bench_antirrebote.py --clientes 2000 --horas 72 --fugas 0.6
+
+import argparse
+import re
+import sqlite3
+import time
+import numpy as np
+from comun import bbdd_temporal
+import motor_gesai
+from antirrebote_alertas import AntirreboteAlertas, clase_severidad
+
+def replay(clientes, horas, fugas, semilla=0):
+    """Lista de lotes horarios de alertas (fila, cliente_id, estado, detalle, p_hoy, version)."""
+    rng = np.random.default_rng(semilla)
+    fuga = rng.random(clientes) < fugas
+    inicio = rng.integers(0, horas, clientes)
+    p = rng.uniform(0.72, 0.97, clientes)
+    lotes = []
+    for h in range(horas):
+        p = np.clip(p + rng.normal(0, 0.02, clientes), 0.6, 0.99)
+        activos = np.flatnonzero(fuga & (inicio <= h))
+        p_hoy = p[activos]
+        estados, detalles = motor_gesai._aplicar_reglas_lote(p_hoy, p_hoy + rng.normal(0, 0.03, len(activos)),
+                                                             p_hoy + rng.normal(0, 0.08, len(activos)))
+        lotes.append([(0, str(100000 + c), e, d, float(ph), 'bench')
+                      for c, e, d, ph in zip(activos, estados, detalles, p_hoy) if "No Fuga" not in e])
+    return lotes
+
+def ejecutar(lotes, intervalo):
+    motor_gesai.cerrar_pool_bbdd()
+    path = bbdd_temporal()
+    reloj = [0.0]
+    motor_gesai.antirrebote = AntirreboteAlertas(intervalo, reloj=lambda: reloj[0])
+    sentencias = []
+    conectar = motor_gesai._conectar_bbdd
+    def conectar_trazado(*args):
+        conn = conectar(*args)
+        conn.set_trace_callback(sentencias.append)
+        return conn
+    motor_gesai._conectar_bbdd = conectar_trazado
+    t0 = time.perf_counter()
+    try:
+        for h, lote in enumerate(lotes):
+            reloj[0] = h * 3600.0
+            motor_gesai.registrar_alertas(lote)
+    finally:
+        motor_gesai._conectar_bbdd = conectar
+    segundos = time.perf_counter() - t0
+    escrituras = [s for s in sentencias if re.match(r'\s*(INSERT|UPDATE|DELETE)', s, re.I)]
+    conn = sqlite3.connect(path)
+    estado_final = {c: clase_severidad(e) for c, e in conn.execute("SELECT cliente_id, estado FROM incidencias WHERE verificacion != 'RESUELTA'")}
+    notificaciones = conn.execute("SELECT COUNT(*) FROM notificaciones").fetchone()[0]
+    conn.close()
+    motor_gesai.cerrar_pool_bbdd()
+    return {
+        'segundos': segundos, 'escrituras': len(escrituras),
+        'incidencias': sum(1 for s in escrituras if 'incidencias' in s), 'tokens': sum(1 for s in escrituras if 'tokens_verificacion' in s),
+        'commits': sum(1 for s in sentencias if s.strip().upper() == 'COMMIT'), 'notificaciones': notificaciones,
+        'estado_final': estado_final, 'antirrebote': motor_gesai.antirrebote.estadisticas(),
+    }
+
+def cambios_externos():
+    """Una incidencia resuelta o reclasificada por otro proceso no sigue omitiendo alertas."""
+    motor_gesai.cerrar_pool_bbdd()
+    path = bbdd_temporal()
+    motor_gesai.antirrebote = AntirreboteAlertas(6 * 3600)
+    alerta = (0, '100001', 'Fuga Grave', 'bench', 0.9, 'bench')
+    primera = motor_gesai.registrar_alertas([alerta])[0]['incidencia_id']
+    assert 'Agrupada' in motor_gesai.registrar_alertas([alerta])[0]['message']
+    otro = sqlite3.connect(path)  #Otro proceso: la app resuelve la incidencia
+    otro.execute("UPDATE incidencias SET verificacion = 'RESUELTA' WHERE id = ?", (primera,))
+    otro.commit()
+    nueva = motor_gesai.registrar_alertas([alerta])[0]['incidencia_id']
+    assert nueva != primera, "La alerta se omitió aunque la incidencia estaba resuelta"
+    otro.execute("UPDATE incidencias SET estado = 'Fuga Leve (Tendencia)' WHERE id = ?", (nueva,))  #Edición a mano
+    otro.commit()
+    motor_gesai.registrar_alertas([alerta])
+    assert clase_severidad(otro.execute("SELECT estado FROM incidencias WHERE id = ?", (nueva,)).fetchone()[0]) == 'Grave'
+    otro.close()
+    motor_gesai.cerrar_pool_bbdd()
+    print(f"✅ Resuelta o reclasificada desde otro proceso: la alerta siguiente se escribe "
+          f"({motor_gesai.antirrebote.estadisticas()['invalidadas']} omisiones invalidadas por la fila)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Escrituras de alertas con y sin antirrebote")
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--horas', type=int, default=72)
+    parser.add_argument('--fugas', type=float, default=0.6, help="Fracción de clientes con fuga continua")
+    parser.add_argument('--intervalos', type=float, nargs='+', default=[3600, 6 * 3600, 24 * 3600], help="Segundos")
+    args = parser.parse_args()
+
+    lotes = replay(args.clientes, args.horas, args.fugas)
+    alertas = sum(len(l) for l in lotes)
+    print(f"Replay: {args.clientes} clientes x {args.horas} h, {args.fugas:.0%} con fuga -> {alertas} alertas")
+    print(f"{'Antirrebote':<12} | {'Escrituras':>10} | {'Por alerta':>10} | {'Incidencias':>11} | {'Tokens':>7} | {'Pushes':>7} | {'Omitidas':>8} | {'Tiempo s':>8}")
+    base = None
+    for intervalo in [0] + args.intervalos:
+        r = ejecutar(lotes, intervalo)
+        nombre = 'no' if intervalo == 0 else f"{intervalo / 3600:g} h"
+        print(f"{nombre:<12} | {r['escrituras']:>10} | {r['escrituras'] / alertas:>10.2f} | {r['incidencias']:>11} | {r['tokens']:>7} | "
+              f"{r['notificaciones']:>7} | {r['antirrebote']['omitidas']:>8} | {r['segundos']:>8.2f}", flush=True)
+        if base is None: base = r
+        else:
+            assert r['estado_final'] == base['estado_final'], f"Estado final distinto con antirrebote de {nombre}"
+            print(f"{'':<12}   x{base['escrituras'] / r['escrituras']:.1f} menos escrituras, x{base['notificaciones'] / max(r['notificaciones'], 1):.1f} menos pushes")
+    print(f"✅ Mismas incidencias abiertas y clase de severidad final ({len(base['estado_final'])} clientes) con y sin antirrebote")
+    cambios_externos()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# benchmarks/bench_arboles.py
+# Evaluador NumPy (evaluador_arboles) vs LightGBM Booster.predict para los 3 horizontes:
+# equivalencia numérica y tiempo por lote pequeño y grande.
+#   python benchmarks/bench_arboles.py --tamanos 1 16 256 4096 50000
+
+import argparse
+import time
+import numpy as np
+from comun import generar_lecturas, modelos_lightgbm
+import motor_gesai
+from evaluador_arboles import compilar_boosters, comprobar_equivalencia
+
+def cronometrar(fn, X, repeticiones):
+    fn(X)  # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(repeticiones): fn(X)
+    return (time.perf_counter() - t0) / repeticiones
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark evaluador NumPy vs LightGBM")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1, 16, 256, 4096, 50000])
+    args = parser.parse_args()
+
+    boosters = [modelos_lightgbm()[h].booster_ for h in motor_gesai.HORIZONTES]
+    t0 = time.perf_counter()
+    compilado = compilar_boosters(boosters, motor_gesai.HORIZONTES)
+    print(f"Compilación: {time.perf_counter() - t0:.2f}s ({compilado.num_arboles} árboles x {compilado.nodos_por_arbol} nodos)")
+
+    X_total = motor_gesai._codificar_lote(generar_lecturas(max(args.tamanos), semilla=7), motor_gesai._cargar_motor().esquema)
+    X_total[::11, 8] = np.nan  # TIPO_DIA desconocido -> rama de missing categórica
+    print(f"Diferencia máxima vs predict_proba: {comprobar_equivalencia(compilado, boosters, X_total):.3e}\n")
+
+    lgbm = lambda X: np.vstack([b.predict(X, raw_score=False) for b in boosters])
+    print(f"{'Filas':>7} | {'LightGBM (ms)':>13} | {'NumPy (ms)':>10} | {'Aceleración':>11}")
+    for n in args.tamanos:
+        X = X_total[:n]
+        rep = max(1, 2000 // n)
+        t_lgb = cronometrar(lgbm, X, rep) * 1000
+        t_np = cronometrar(compilado.predecir, X, rep) * 1000
+        print(f"{n:>7} | {t_lgb:>13.3f} | {t_np:>10.3f} | {t_lgb / t_np:>10.2f}x")
+
+if __name__ == '__main__':
+    main()
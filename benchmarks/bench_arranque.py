@@ -0,0 +1,118 @@
+# benchmarks/bench_arranque.py
+# Arranque de un worker: tiempo de `import motor_gesai`, tiempo hasta la primera
+# predicción y memoria (RSS / PSS / privada) con N workers independientes vivos a la vez.
+# PSS reparte las páginas compartidas (p.ej. artefactos mmap) entre los procesos que las usan.
+# Con --fork los workers salen por fork de un proceso que ya cargó el motor, como en el modo pool
+# del simulador: heredan los modelos (copia en escritura) en vez de cargarlos cada uno.
+#   python benchmarks/bench_arranque.py --workers 4 [--fork]
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+from comun import SRC_DIR
+
+#Se ejecuta en un intérprete limpio para medir el import real
+SCRIPT_WORKER = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import motor_gesai
+t_import = time.perf_counter() - t0
+modulos = set(sys.modules)
+
+t0 = time.perf_counter()
+conjunto = motor_gesai._cargar_motor()
+if conjunto:
+    fila = {c: 1.0 for c in conjunto.esquema.columnas}
+    fila.update({'US_AIGUA_SUBM': 'DOMÈSTIC', 'TIPO_DIA': 'Laborable'})
+    conjunto.predecir(motor_gesai._codificar_lectura(fila, conjunto.esquema))
+t_pred = time.perf_counter() - t0
+
+print("listo", flush=True)
+sys.stdin.readline()  #Esperamos a que todos los workers estén cargados antes de medir
+m = {}
+with open('/proc/self/smaps_rollup') as f:
+    for linea in f:
+        partes = linea.split()
+        if partes[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+            m[partes[0][:-1]] = int(partes[1]) / 1024
+print(json.dumps({'import_s': t_import, 'primera_prediccion_s': t_pred,
+                  'rss': m['Rss'], 'pss': m['Pss'], 'privada': m['Private_Clean'] + m['Private_Dirty'],
+                  'lightgbm': 'lightgbm' in modulos, 'faker': 'faker' in modulos,
+                  'reports': 'reports_manager' in modulos}), flush=True)
+'''
+
+def memoria():
+    m = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if partes[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                m[partes[0][:-1]] = int(partes[1]) / 1024
+    return {'rss': m['Rss'], 'pss': m['Pss'], 'privada': m['Private_Clean'] + m['Private_Dirty']}
+
+def worker_fork(cola, medir):
+    """Worker del modo pool: primera predicción con los modelos heredados y un hilo de LightGBM."""
+    import motor_gesai
+    motor_gesai.PARAMETROS_PREDICCION = {'num_threads': 1}
+    t0 = time.perf_counter()
+    conjunto = motor_gesai._cargar_motor()
+    fila = {c: 1.0 for c in conjunto.esquema.columnas}
+    fila.update({'US_AIGUA_SUBM': 'DOMÈSTIC', 'TIPO_DIA': 'Laborable'})
+    conjunto.predecir(motor_gesai._codificar_lectura(fila, conjunto.esquema))
+    t_pred = time.perf_counter() - t0
+    cola.put('listo')
+    medir.wait()
+    cola.put({'import_s': 0.0, 'primera_prediccion_s': t_pred, **memoria(), 'lightgbm': 'lightgbm' in sys.modules,
+              'faker': 'faker' in sys.modules, 'reports': 'reports_manager' in sys.modules})
+
+def arrancar_fork(num_workers):
+    import motor_gesai
+    t0 = time.perf_counter()
+    motor_gesai._cargar_motor()
+    print(f"Padre: motor cargado en {(time.perf_counter() - t0) * 1000:.0f} ms antes del fork")
+    ctx = mp.get_context('fork')
+    cola, medir = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=worker_fork, args=(cola, medir)) for _ in range(num_workers)]
+    for p in procs: p.start()
+    for _ in procs:
+        if cola.get(timeout=300) != 'listo': raise SystemExit("❌ Un worker no llegó a predecir")
+    medir.set()
+    resultados = [cola.get(timeout=300) for _ in procs]
+    for p in procs: p.join()
+    return resultados
+
+def arrancar_independientes(num_workers):
+    procs = [subprocess.Popen([sys.executable, '-c', SCRIPT_WORKER], cwd=SRC_DIR, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+             for _ in range(num_workers)]
+    for p in procs:
+        while (linea := p.stdout.readline()).strip() != "listo":
+            if not linea: raise SystemExit("❌ Un worker terminó antes de cargar el motor")
+    resultados = []
+    for p in procs:
+        p.stdin.write("medir\n"); p.stdin.flush()
+    for p in procs:
+        resultados.append(json.loads(p.stdout.readline()))
+        p.wait()
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque y memoria por worker")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--fork', action='store_true', help="Workers por fork de un proceso con el motor ya cargado")
+    args = parser.parse_args()
+
+    resultados = arrancar_fork(args.workers) if args.fork else arrancar_independientes(args.workers)
+    r0 = resultados[0]
+    print(f"Motor de inferencia : {os.environ.get('GESAI_MOTOR_INFERENCIA', 'lightgbm')} ({'fork' if args.fork else 'procesos independientes'})")
+    if not args.fork: print(f"Tras el import      : lightgbm={r0['lightgbm']} faker={r0['faker']} reports_manager={r0['reports']}")
+    for i, r in enumerate(resultados):
+        print(f"Worker {i}: import {r['import_s'] * 1000:7.1f} ms | 1ª predicción {r['primera_prediccion_s'] * 1000:7.1f} ms"
+              f" | RSS {r['rss']:6.1f} MB | PSS {r['pss']:6.1f} MB | privada {r['privada']:6.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_bbdd.py
+# Conexiones a gesai.db: una conexión nueva por llamada (GESAI_BBDD_POOL=0, lo de antes) frente
+# al pool de pool_bbdd.py (WAL + PRAGMAs + caché de sentencias), con H hilos haciendo lo que
+# hacen los callbacks de Dash (refresco del dashboard cada 2 s, sondeo de la vista móvil cada
+# 3 s, detalle de una incidencia) mientras un escritor registra alertas como el simulador.
+#   python benchmarks/bench_bbdd.py --hilos 1 4 16 --segundos 5
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import numpy as np
+import comun  #noqa: F401 (solo añade src/ y la raíz al path)
+import motor_gesai
+from setup_database import crear_tablas
+from crypto_manager import cifrar_pii
+
+def poblar(path, clientes, incidencias):
+    """gesai.db con clientes, incidencias abiertas y notificaciones pendientes."""
+    conn = sqlite3.connect(path)
+    crear_tablas(conn)
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)",
+                     [(str(100000 + k), nombre, nombre, nombre, nombre) for k in range(clientes)])
+    conn.executemany("INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion) VALUES (?, ?, ?, ?)",
+                     [(str(100000 + k), 'Fuga Moderada', 'PENDIENTE', 'Fuga Moderada. Prob: 80%. Estable') for k in range(incidencias)])
+    conn.executemany("INSERT INTO notificaciones (cliente_id, mensaje, link) VALUES (?, ?, ?)",
+                     [(str(100000 + k), 'Alerta', 'http://x/verificar/t') for k in range(incidencias)])
+    conn.commit()
+    conn.close()
+
+def callback_dash(rng, clientes, incidencias):
+    """Un callback al azar con el reparto del dashboard (2 s), la vista móvil (3 s) y los detalles."""
+    r = rng.random()
+    if r < 0.5:
+        motor_gesai.get_lista_incidencias_activas('todas')
+    elif r < 0.85:
+        cid = str(100000 + rng.randrange(clientes))
+        for n in motor_gesai.get_notificaciones_pendientes_cliente(cid):
+            motor_gesai.marcar_notificacion_leida(n['notificacion_id'])
+    else:
+        motor_gesai.get_detalles_incidencia(rng.randrange(1, incidencias + 1))
+
+def carrera(hilos, segundos, clientes, incidencias, escritor):
+    fin = time.perf_counter() + segundos
+    latencias, errores = [[] for _ in range(hilos)], []
+
+    def lector(k):
+        rng = random.Random(k)
+        while time.perf_counter() < fin:
+            t0 = time.perf_counter()
+            try: callback_dash(rng, clientes, incidencias)
+            except Exception as e: errores.append(e)
+            latencias[k].append(time.perf_counter() - t0)
+
+    escritas = [0]
+    def escribir():
+        rng = random.Random(-1)
+        while time.perf_counter() < fin:
+            alertas = [(0, str(100000 + rng.randrange(clientes)), 'Fuga Grave', 'Crítica', 0.9, 'bench') for _ in range(50)]
+            motor_gesai.registrar_alertas(alertas)
+            escritas[0] += len(alertas)
+            time.sleep(0.05)
+
+    ths = [threading.Thread(target=lector, args=(k,)) for k in range(hilos)]
+    if escritor: ths.append(threading.Thread(target=escribir))
+    for t in ths: t.start()
+    for t in ths: t.join()
+    todas = np.concatenate([np.array(l) for l in latencias]) * 1000
+    return len(todas) / segundos, np.percentile(todas, [50, 99]), escritas[0] / segundos, len(errores)
+
+def main():
+    parser = argparse.ArgumentParser(description="Conexión por llamada frente a pool de conexiones")
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--clientes', type=int, default=5000)
+    parser.add_argument('--incidencias', type=int, default=500)
+    parser.add_argument('--sin-escritor', action='store_true', help="Sin alertas concurrentes del simulador")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='gesai_bbdd_')
+    try:
+        #1. Coste de obtener y soltar una conexión
+        path = os.path.join(tmp, 'micro.db')
+        poblar(path, 10, 10)
+        motor_gesai.DB_PATH = path
+        print(f"{'Obtener + cerrar conexión':<28} | {'µs':>7}")
+        for nombre, pool in [('conexión nueva', 0), ('pool', motor_gesai.BBDD_POOL or 8)]:
+            motor_gesai.BBDD_POOL = pool
+            t0 = time.perf_counter()
+            for _ in range(2000):
+                conn = motor_gesai._conectar_bbdd()
+                conn.execute("SELECT 1 FROM clientes WHERE cliente_id = ?", ('100001',)).fetchone()
+                conn.close()
+            print(f"{nombre:<28} | {(time.perf_counter() - t0) / 2000 * 1e6:>7.1f}")
+
+        #2. Callbacks concurrentes (+ escritor)
+        print(f"\n{'Modo':<20} | {'Hilos':>5} | {'Callbacks/s':>11} | {'p50 ms':>7} | {'p99 ms':>8} | {'Alertas/s':>9} | Errores")
+        for hilos in args.hilos:
+            for nombre, pool in [('por llamada', 0), ('pool', 8)]:
+                #Una BBDD por modo: WAL queda grabado en el fichero
+                path = os.path.join(tmp, f'{nombre.replace(" ", "_")}_{hilos}.db')
+                poblar(path, args.clientes, args.incidencias)
+                motor_gesai.DB_PATH, motor_gesai.BBDD_POOL = path, pool
+                rps, (p50, p99), escritas, errores = carrera(hilos, args.segundos, args.clientes, args.incidencias, not args.sin_escritor)
+                modo = sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0]
+                print(f"{f'{nombre} ({modo})':<20} | {hilos:>5} | {rps:>11.0f} | {p50:>7.2f} | {p99:>8.2f} | {escritas:>9.0f} | {errores}", flush=True)
+                motor_gesai.cerrar_pool_bbdd()
+        print(f"\nPool: {motor_gesai.BBDD_PRAGMAS}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# benchmarks/bench_buffer.py
+# Buffer de consumo por cliente (buffer_consumo.py): coste de anotar lecturas dentro de
+# evaluar_lote, latencia de consulta (memoria / instantánea en disco / almacén indexado /
+# dataset), memoria real por cliente, expulsión y tiempo de volcado.
+#   python benchmarks/bench_buffer.py --clientes 1000 10000 --horas 720
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from comun import SRC_DIR, generar_lecturas
+import motor_gesai
+import historico_clientes
+import buffer_consumo
+
+#RSS medida en un intérprete limpio: en este proceso el heap ya tiene memoria libre reutilizable
+SCRIPT_RSS = r'''
+import sys, os
+import numpy as np
+import buffer_consumo
+def rss():
+    with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+num_clientes, horas = int(sys.argv[1]), int(sys.argv[2])
+buf = buffer_consumo.BufferConsumo(num_clientes)
+antes = rss()
+fechas = np.arange(horas, dtype=np.int64)
+for k in range(num_clientes):
+    for f in fechas: buf.anotar(str(k), f, 1.0)
+print((rss() - antes) / num_clientes)
+'''
+
+def rss_por_cliente(num_clientes, horas):
+    salida = subprocess.run([sys.executable, '-c', SCRIPT_RSS, str(num_clientes), str(horas)], cwd=SRC_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return float(salida.strip())
+
+def cronometrar(fn, argumentos):
+    tiempos = []
+    for a in argumentos:
+        t0 = time.perf_counter()
+        fn(a)
+        tiempos.append(time.perf_counter() - t0)
+    return np.percentile(np.array(tiempos) * 1000, [50, 99])
+
+def rejilla(num_clientes, horas, rng):
+    """Lecturas horarias de cada cliente, llegando desordenadas y con un 10% repetidas."""
+    clientes = np.repeat(np.arange(100000, 100000 + num_clientes), horas).astype(str)
+    fechas = (pd.Timestamp('2024-01-01').value + np.tile(np.arange(horas), num_clientes) * 3_600_000_000_000).astype(np.int64)
+    consumo = rng.gamma(2.0, 50.0, len(clientes)).round(3)
+    orden = rng.permutation(len(clientes))
+    repetidas = rng.choice(orden, len(orden) // 10)
+    orden = np.concatenate([orden, repetidas])
+    return clientes[orden], fechas[orden], consumo[orden], (clientes, fechas, consumo)
+
+def main():
+    parser = argparse.ArgumentParser(description="Buffer de consumo por cliente")
+    parser.add_argument('--clientes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--horas', type=int, default=720, help="Lecturas por cliente en la rejilla")
+    parser.add_argument('--consultas', type=int, default=500)
+    parser.add_argument('--lote', type=int, default=500)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    #1. Coste de anotar dentro de evaluar_lote
+    df = generar_lecturas(20 * args.lote, semilla=1, num_clientes=1000)
+    lotes = [df.iloc[i:i + args.lote] for i in range(0, len(df), args.lote)]
+    motor_gesai.evaluar_lote(lotes[0])
+    tiempos = {'sin buffer': np.inf, 'con buffer': np.inf}
+    for _ in range(3):  #Alternando, y el mejor de cada: menos sensible al ruido
+        for nombre, activo in [('sin buffer', False), ('con buffer', True)]:
+            motor_gesai.buffer_lecturas = buffer_consumo.BufferConsumo(10_000 if activo else 0)
+            t0 = time.perf_counter()
+            for l in lotes: motor_gesai.evaluar_lote(l)
+            tiempos[nombre] = min(tiempos[nombre], (time.perf_counter() - t0) / len(df) * 1e6)
+    print(f"evaluar_lote (lote {args.lote}): sin buffer {tiempos['sin buffer']:.1f} µs/lectura | "
+          f"con buffer {tiempos['con buffer']:.1f} µs/lectura (+{tiempos['con buffer'] / tiempos['sin buffer'] - 1:.1%})")
+
+    print(f"\n{'Clientes':>8} | {'Anotar':>9} | {'Volcado':>8} | {'Memoria p50/p99':>17} | {'Instantánea p50/p99':>19} | "
+          f"{'Almacén p50/p99':>17} | {'Dataset p50':>11}")
+    for num_clientes in args.clientes:
+        tmp = tempfile.mkdtemp(prefix='gesai_buffer_')
+        try:
+            c, f, v, (c_ord, f_ord, v_ord) = rejilla(num_clientes, args.horas, rng)
+            buf = buffer_consumo.BufferConsumo(num_clientes)
+            t0 = time.perf_counter()
+            for i in range(0, len(c), args.lote): buf.anotar_lote(c[i:i + args.lote], f[i:i + args.lote], v[i:i + args.lote])
+            t_anotar = (time.perf_counter() - t0) / len(c) * 1e6
+
+            t0 = time.perf_counter()
+            buf.guardar(os.path.join(tmp, 'buffer'))
+            t_volcado = time.perf_counter() - t0
+            inst = buffer_consumo.abrir(os.path.join(tmp, 'buffer'))
+
+            #Disco: almacén indexado y dataset (CSV) con los mismos datos
+            csv = os.path.join(tmp, 'datos.csv')
+            pd.DataFrame({'POLISSA_SUBM': c_ord, 'FECHA_HORA_CRONO': f_ord.view('datetime64[ns]'), 'CONSUMO_REAL': v_ord}).to_csv(csv, index=False)
+            historico_clientes.construir(csv, os.path.join(tmp, 'historico'))
+            hist = historico_clientes.abrir(os.path.join(tmp, 'historico'))
+
+            muestra = rng.integers(100000, 100000 + num_clientes, args.consultas).astype(str)
+            for cli in muestra[:20]:  #Mismo resultado en memoria, en la instantánea y en el almacén
+                a, b, h = buf.consultar(cli), inst.consultar(cli), hist.consultar(cli, args.horas)
+                assert np.array_equal(a[0], h[0]) and np.array_equal(a[1], h[1]), "El buffer no coincide con el almacén"
+                assert np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1]), "La instantánea no coincide con el buffer"
+            p_mem = cronometrar(buf.consultar, muestra)
+            p_inst = cronometrar(inst.consultar, muestra)
+            p_hist = cronometrar(lambda x, h=hist: h.consultar(x, args.horas), muestra)
+            motor_gesai._historico = None
+            historico_clientes_dir, historico_clientes.HISTORICO_DIR = historico_clientes.HISTORICO_DIR, os.path.join(tmp, 'no_existe')
+            p_dataset = cronometrar(lambda x: motor_gesai._historico_disco(x, csv), muestra[:3])[0]
+            historico_clientes.HISTORICO_DIR = historico_clientes_dir
+
+            print(f"{num_clientes:>8} | {t_anotar:>6.2f} µs | {t_volcado:>7.2f}s | "
+                  f"{p_mem[0]:>7.3f}/{p_mem[1]:.3f} ms | {p_inst[0]:>9.3f}/{p_inst[1]:.3f} ms | "
+                  f"{p_hist[0]:>7.3f}/{p_hist[1]:.3f} ms | {p_dataset:>8.0f} ms", flush=True)
+            del buf, inst, hist
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    #Expulsión: el doble de clientes que filas
+    buf = buffer_consumo.BufferConsumo(1000, horas=24)
+    for k in range(2000): buf.anotar(str(k), 0, 1.0, ahora=float(k))
+    assert buf.consultar('0') is None and buf.consultar('1999') is not None
+    liberados = buf.expulsar_inactivos(500, ahora=2000.0)
+    print(f"\nExpulsión: 2000 clientes en 1000 filas -> {buf.expulsiones - liberados} por LRU; "
+          f"{liberados} más por inactividad > 500 s; quedan {len(buf)}")
+    print(f"Memoria por cliente con {args.horas} lecturas: {rss_por_cliente(2000, args.horas) / 1024:.1f} KB de RSS medidos | "
+          f"{buffer_consumo.bytes_por_cliente() / 1024:.1f} KB documentados + entrada de diccionario")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# benchmarks/bench_cache.py
+# Caché de predicciones: lecturas elegidas con random.choice sobre un conjunto fijo
+# de registros (igual que simulacion_backend), puntuadas con y sin caché.
+#   python benchmarks/bench_cache.py --registros 2000 --n 20000 --max-entradas 1000
+
+import argparse
+import random
+import time
+import numpy as np
+from comun import generar_lecturas
+import motor_gesai
+from cache_predicciones import CachePredicciones
+
+def medir(conjunto, lecturas):
+    t0 = time.perf_counter()
+    salidas = [motor_gesai._predecir_lectura(conjunto, r) for r in lecturas]
+    return time.perf_counter() - t0, np.array(salidas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Caché de predicciones por huella de la fila")
+    parser.add_argument('--registros', type=int, default=2000, help="Registros distintos (como datos_simulacion_features.csv)")
+    parser.add_argument('--n', type=int, default=20000, help="Lecturas puntuadas")
+    parser.add_argument('--max-entradas', type=int, nargs='+', default=[0, 500, 50_000])
+    args = parser.parse_args()
+
+    registros = generar_lecturas(args.registros).to_dict('records')
+    random.seed(0)
+    lecturas = [random.choice(registros) for _ in range(args.n)]
+    conjunto = motor_gesai._cargar_motor()
+
+    referencia = None
+    print(f"{'Máx. entradas':>13} | {'lecturas/s':>10} | {'aciertos':>8} | {'expulsiones':>11} | idénticas")
+    for m in args.max_entradas:
+        motor_gesai.cache_predicciones = CachePredicciones(m, motor_gesai.CACHE_TTL)
+        t, salidas = medir(conjunto, lecturas)
+        if referencia is None: referencia = salidas
+        e = motor_gesai.estadisticas_cache()
+        print(f"{m:>13} | {args.n / t:>10.0f} | {e['tasa_aciertos']:>8.1%} | {e['expulsiones']:>11} | {np.array_equal(salidas, referencia)}")
+
+if __name__ == '__main__':
+    main()
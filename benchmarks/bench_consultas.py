@@ -0,0 +1,136 @@
+# benchmarks/bench_consultas.py
+# Consultas calientes sobre una gesai.db grande (1M filas en incidencias, notificaciones, tokens y
+# clientes), antes y después de las migraciones de migraciones_bbdd.py:
+#   - latencia de cada función del motor sobre el esquema antiguo (v0, sin índices) y migrado
+#   - tiempo de migrar en su sitio la BBDD con datos
+#   - plan de ejecución (EXPLAIN QUERY PLAN) de cada sentencia que ejecuta el motor, capturada con
+#     set_trace_callback: falla si alguna recorre entera una tabla (SCAN sin índice)
+#   python benchmarks/bench_consultas.py --filas 1000000
+
+import argparse
+import os
+import random
+import re
+import shutil
+import sqlite3
+import time
+import numpy as np
+from comun import bbdd_temporal
+import motor_gesai
+import migraciones_bbdd
+from crypto_manager import cifrar_pii, generar_token_seguro
+
+#Tablas de pocas filas, sea cual sea el volumen: recorrerlas enteras es lo más barato
+PEQUENAS = {'resumen_incidencias'}
+
+def poblar(path, filas, rng):
+    """Esquema antiguo (v0, sin índices) con `filas` filas por tabla; el 5% de incidencias abiertas."""
+    conn = sqlite3.connect(path)
+    for (nombre,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND (name LIKE 'idx_%' OR name LIKE 'ux_%')").fetchall():
+        conn.execute(f"DROP INDEX {nombre}")
+    conn.execute("PRAGMA user_version = 0")
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", ((str(10**6 + k), nombre, nombre, nombre, nombre) for k in range(filas)))
+    base = time.time() - 365 * 86400
+    conn.executemany(
+        "INSERT INTO incidencias (cliente_id, fecha_deteccion, estado, verificacion, descripcion) VALUES (?, ?, ?, ?, ?)",
+        ((str(10**6 + rng.randrange(filas)), time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(base + k * 31536000 / filas)),
+          'Fuga Moderada', 'PENDIENTE' if rng.random() < 0.05 else 'RESUELTA', 'Fuga Moderada. Prob: 80%. Estable') for k in range(filas)))
+    conn.executemany("INSERT INTO notificaciones (cliente_id, mensaje, link, leida) VALUES (?, ?, ?, ?)",
+                     ((str(10**6 + rng.randrange(filas)), 'Alerta', 'http://x/verificar/t', int(rng.random() < 0.9)) for _ in range(filas)))
+    conn.executemany("INSERT INTO tokens_verificacion (token, incidencia_id) VALUES (?, ?)",
+                     ((generar_token_seguro(), k + 1) for k in range(filas)))
+    conn.commit()
+    conn.close()
+
+def consultas(rng, filas):
+    """Las funciones del motor que usan el dashboard, la vista móvil y el simulador."""
+    cid = lambda: str(10**6 + rng.randrange(filas))
+    return [
+        ('get_lista_incidencias_activas', lambda: motor_gesai.get_lista_incidencias_activas('todas')),
+        ('get_lista_incidencias (filtro)', lambda: motor_gesai.get_lista_incidencias_activas('Moderada')),
+        ('get_resumen_incidencias', motor_gesai.get_resumen_incidencias),
+        ('get_notificaciones_pendientes', lambda: motor_gesai.get_notificaciones_pendientes_cliente(cid())),
+        ('marcar_notificacion_leida', lambda: motor_gesai.marcar_notificacion_leida(rng.randrange(1, filas))),
+        ('get_detalles_incidencia', lambda: motor_gesai.get_detalles_incidencia(rng.randrange(1, filas))),
+        ('registrar_alertas (10)', lambda: motor_gesai.registrar_alertas([(0, cid(), 'Fuga Grave', 'Crítica', 0.9, 'b')] * 10)),
+        ('validar_token_y_registrar', lambda: motor_gesai.validar_token_y_registrar('no-existe', {})),
+    ]
+
+def cronometrar(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        try: fn()
+        except sqlite3.OperationalError:  #Sentencias que necesitan el esquema nuevo (ON CONFLICT de la v3)
+            return float('nan')
+        tiempos.append(time.perf_counter() - t0)
+    return np.median(tiempos) * 1000
+
+def trazar(funciones):
+    """Sentencias SQL (con los valores) que ejecutan las funciones."""
+    sentencias = []
+    conectar = motor_gesai._conectar_bbdd
+    def conectar_trazado(*args):
+        conn = conectar(*args)
+        conn.set_trace_callback(sentencias.append)
+        return conn
+    motor_gesai._conectar_bbdd = conectar_trazado
+    try:
+        for _, fn in funciones: fn()
+    finally:
+        motor_gesai._conectar_bbdd = conectar
+    return [s for s in dict.fromkeys(sentencias) if re.match(r'\s*(SELECT|UPDATE|DELETE)', s, re.I)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Planes y latencia de las consultas calientes")
+    parser.add_argument('--filas', type=int, default=1_000_000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    motor_gesai.antirrebote.intervalo = 0  #Cada alerta llega a la BBDD (sin antirrebote)
+
+    path = bbdd_temporal()
+    tmp = os.path.dirname(path)
+    try:
+        t0 = time.perf_counter()
+        poblar(path, args.filas, rng)
+        print(f"gesai.db v0 con {args.filas} filas por tabla ({time.perf_counter() - t0:.0f}s, {os.path.getsize(path) / 2**20:.0f} MB)")
+
+        #1. Esquema antiguo: el motor no migra (se marca como ya preparada)
+        motor_gesai._bbdd_preparadas.add(path)
+        antes = {n: cronometrar(f, max(3, args.repeticiones // 5)) for n, f in consultas(rng, args.filas)}
+        motor_gesai.cerrar_pool_bbdd()
+
+        #2. Migración en su sitio
+        conn = sqlite3.connect(path)
+        t0 = time.perf_counter()
+        aplicadas = migraciones_bbdd.migrar(conn, verbose=True)
+        print(f"Migración v0 -> v{migraciones_bbdd.version(conn)} ({aplicadas}) en {time.perf_counter() - t0:.1f}s")
+        conn.close()
+        despues = {n: cronometrar(f, args.repeticiones) for n, f in consultas(rng, args.filas)}
+
+        print(f"\n{'Función (mediana)':<32} | {'v0 ms':>8} | {'migrada ms':>10} | {'x':>6}")
+        for n in antes:
+            if np.isnan(antes[n]): print(f"{n:<32} | {'—':>8} | {despues[n]:>10.3f} | {'—':>6}")
+            else: print(f"{n:<32} | {antes[n]:>8.2f} | {despues[n]:>10.3f} | {antes[n] / despues[n]:>6.0f}")
+
+        #3. Planes: ninguna sentencia recorre una tabla entera
+        conn = sqlite3.connect(path)
+        recorridos = []
+        print("\nPlanes de ejecución:")
+        for sql in trazar(consultas(rng, args.filas)):
+            plan = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            malos = [p for p in plan if re.match(r'SCAN \w+$', p) and p.split()[1] not in PEQUENAS]
+            recorridos += [(sql, p) for p in malos]
+            print(f"   {'❌' if malos else '✅'} {' '.join(sql.split())[:90]}")
+            for p in plan: print(f"        {p}")
+        conn.close()
+        assert not recorridos, f"Sentencias con recorrido completo de tabla: {recorridos}"
+        print(f"✅ Ninguna consulta caliente recorre una tabla de {args.filas} filas")
+    finally:
+        motor_gesai.cerrar_pool_bbdd()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
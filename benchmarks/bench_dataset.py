@@ -0,0 +1,146 @@
+# benchmarks/bench_dataset.py
+# datos_simulacion_features: CSV parseado como texto (camino original) frente al fichero
+# Arrow mapeado de dataset_features. Tamaño en disco, tiempo de carga de cada consumidor
+# (simulador: todo; histórico: 3 columnas de un cliente; setup: POLISSA_SUBM) y memoria
+# RSS / PSS / privada con N procesos leyendo el mismo dataset a la vez.
+#   python benchmarks/bench_dataset.py --filas 500000 --procesos 3
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from comun import SRC_DIR, generar_lecturas
+import motor_gesai
+import dataset_features
+
+COLS_HISTORICO = ['POLISSA_SUBM', 'FECHA_HORA_CRONO', 'CONSUMO_REAL']
+
+#Cada proceso carga el dataset entero y recorre todas las columnas (todas las páginas en memoria)
+SCRIPT_PROCESO = r'''
+import sys, json
+import numpy as np
+import pandas as pd
+import dataset_features
+modo, csv, arrow = sys.argv[1:4]
+if modo == 'csv':
+    datos = pd.read_csv(csv)
+elif modo == 'arrow':
+    datos = dataset_features.cargar_tabla(path_csv=csv, path_arrow=arrow)
+else:
+    datos = dataset_features.cargar(path_csv=csv, path_arrow=arrow)
+#Una lectura por página de cada buffer: todo el dataset residente sin crear copias
+if modo == 'arrow':
+    buffers = [b for c in datos.columns for trozo in c.chunks for b in trozo.buffers() if b is not None]
+else:
+    buffers = [(s.cat.codes if s.dtype == 'category' else s).to_numpy() for _, s in datos.items()]
+    buffers = [b for b in buffers if b.dtype != object]
+total = sum(int(np.frombuffer(b, np.uint8)[::4096].sum()) for b in buffers)
+print("listo", flush=True)
+sys.stdin.readline()
+m = {}
+with open('/proc/self/smaps_rollup') as f:
+    for linea in f:
+        partes = linea.split()
+        if partes[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+            m[partes[0][:-1]] = int(partes[1]) / 1024
+print(json.dumps({'rss': m['Rss'], 'pss': m['Pss'], 'privada': m['Private_Clean'] + m['Private_Dirty']}), flush=True)
+'''
+
+def cronometrar(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos) * 1000
+
+def memoria(modo, csv, arrow, procesos):
+    """Media por proceso con `procesos` procesos vivos a la vez."""
+    procs = [subprocess.Popen([sys.executable, '-c', SCRIPT_PROCESO, modo, csv, arrow], cwd=SRC_DIR, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+             for _ in range(procesos)]
+    for p in procs:
+        while (linea := p.stdout.readline()).strip() != "listo":
+            if not linea: raise SystemExit(f"❌ Un proceso ({modo}) terminó antes de cargar el dataset")
+    for p in procs:
+        p.stdin.write("medir\n"); p.stdin.flush()
+    res = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs: p.wait()
+    return {k: float(np.mean([r[k] for r in res])) for k in res[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset de simulación: CSV frente a Arrow mapeado")
+    parser.add_argument('--filas', type=int, default=500000)
+    parser.add_argument('--clientes', type=int, default=1000)
+    parser.add_argument('--procesos', type=int, default=3)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='gesai_dataset_')
+    try:
+        csv, arrow = os.path.join(tmp, 'datos.csv'), os.path.join(tmp, 'datos.arrow')
+        df = generar_lecturas(args.filas, semilla=0, num_clientes=args.clientes)
+        #Como en el CSV real: 3 decimales, y enteros en festivo y recuentos del censo
+        num = df.select_dtypes('number').columns
+        df[num] = df[num].round(3)
+        enteras = [c for c in num if c == 'FESTIVO' or c.startswith(('Antig_', 'Pob_', 'Num_'))]
+        df[enteras] = df[enteras].round()
+        df.to_csv(csv, index=False)
+        del df
+
+        t0 = time.perf_counter()
+        tabla = dataset_features.importar_csv(csv, arrow)
+        t_importar = time.perf_counter() - t0
+        tipos = pd.Series([str(t) for t in tabla.schema.types]).value_counts()
+        del tabla
+        print(f"Filas {args.filas} | CSV {os.path.getsize(csv) / 2**20:.0f} MB -> Arrow {os.path.getsize(arrow) / 2**20:.0f} MB "
+              f"(importación {t_importar:.1f}s)")
+        print("Tipos en Arrow: " + ', '.join(f"{t} x{n}" for t, n in tipos.items()))
+
+        #Mismos datos por los dos caminos (valores, no tipos)
+        a = pd.read_csv(csv, dtype={'POLISSA_SUBM': str})
+        b = dataset_features.cargar(path_csv=csv, path_arrow=arrow)
+        for c in a.columns:
+            x, y = a[c], b[c]
+            if c == 'FECHA_HORA_CRONO': x, y = pd.to_datetime(x), pd.to_datetime(y)
+            elif x.dtype == object: x, y = x.astype(str), y.astype(str)
+            else: x, y = x.to_numpy(np.float64), y.to_numpy(np.float64)
+            assert np.array_equal(np.asarray(x), np.asarray(y)), f"Columna {c} distinta entre CSV y Arrow"
+        conjunto = motor_gesai._cargar_motor()
+        pa_ = conjunto.predecir(motor_gesai._codificar_lote(a.head(5000), conjunto.esquema))
+        pb_ = conjunto.predecir(motor_gesai._codificar_lote(b.head(5000), conjunto.esquema))
+        assert np.array_equal(pa_, pb_), "Las predicciones cambian con el Arrow"
+        print("✅ Mismos valores y predicciones idénticas bit a bit desde CSV y Arrow")
+        del a, b
+
+        cliente = '100007'
+        casos = [
+            ('simulador (todo)', lambda: pd.read_csv(csv),
+             lambda: dataset_features.cargar(path_csv=csv, path_arrow=arrow)),
+            ('histórico (3 col, 1 cliente)',
+             lambda: (lambda d: d[d['POLISSA_SUBM'] == cliente])(pd.read_csv(csv, usecols=COLS_HISTORICO, dtype={'POLISSA_SUBM': str})),
+             lambda: dataset_features.cargar(COLS_HISTORICO, clientes=[cliente], path_csv=csv, path_arrow=arrow)),
+            ('setup (POLISSA_SUBM)', lambda: pd.read_csv(csv, usecols=['POLISSA_SUBM']),
+             lambda: dataset_features.cargar(['POLISSA_SUBM'], path_csv=csv, path_arrow=arrow)),
+        ]
+        print(f"\n{'Consumidor':<30} | {'CSV ms':>8} | {'Arrow ms':>8} | {'Aceleración':>11}")
+        for nombre, f_csv, f_arrow in casos:
+            t_csv, t_arrow = cronometrar(f_csv, args.repeticiones), cronometrar(f_arrow, args.repeticiones)
+            print(f"{nombre:<30} | {t_csv:>8.0f} | {t_arrow:>8.1f} | {t_csv / t_arrow:>10.0f}x", flush=True)
+
+        print(f"\nMemoria media por proceso con {args.procesos} procesos a la vez (MB):")
+        print(f"{'Modo':<26} | {'RSS':>7} | {'PSS':>7} | {'Privada':>7}")
+        for modo, nombre in [('csv', 'pd.read_csv'), ('arrow', 'cargar_tabla (Arrow)'), ('pandas', 'cargar (Arrow -> pandas)')]:
+            m = memoria(modo, csv, arrow, args.procesos)
+            print(f"{nombre:<26} | {m['rss']:>7.0f} | {m['pss']:>7.0f} | {m['privada']:>7.0f}", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
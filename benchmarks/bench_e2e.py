@@ -0,0 +1,226 @@
+# benchmarks/bench_e2e.py
+# Banco de pruebas extremo a extremo del camino de detección: lecturas sintéticas o grabadas
+# (CSV) con un porcentaje fijo de alertas, por cada variante (individual / lote / pool).
+# Mide throughput, latencia p50/p95/p99 y tiempo por etapa (features, predicción, reglas,
+# cifrado PII, BBDD), guarda JSON y compara contra una línea base guardada.
+#   python benchmarks/bench_e2e.py --ratios 0 0.1 0.5 --n 2000
+#   python benchmarks/bench_e2e.py --csv data/processed-data/datos_simulacion_features.csv
+#   python benchmarks/bench_e2e.py --baseline benchmarks/resultados/base.json --tolerancia 0.10
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from comun import BASE_DIR, generar_lecturas, bbdd_temporal
+import motor_gesai
+import simulacion_backend
+
+ETAPAS = ['features', 'prediccion', 'reglas', 'cifrado', 'bbdd', 'otros']
+RESULTADOS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'resultados')
+
+#PERFILADO POR ETAPAS
+class Perfilador:
+    """Tiempo exclusivo por etapa: lo que se mide dentro de otra etapa (p.ej. cifrado dentro de bbdd) se le resta."""
+
+    def __init__(self):
+        self.tiempos = defaultdict(float)
+        self._pila = []
+        self._originales = []
+
+    def envolver(self, etapa, fn):
+        def cronometrada(*args, **kwargs):
+            self._pila.append(0.0)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - t0
+                hijos = self._pila.pop()
+                self.tiempos[etapa] += total - hijos
+                if self._pila: self._pila[-1] += total
+        return cronometrada
+
+    def parchear(self, objeto, nombre, etapa):
+        original = getattr(objeto, nombre)
+        self._originales.append((objeto, nombre, original))
+        setattr(objeto, nombre, self.envolver(etapa, original))
+
+    def __enter__(self):
+        m = motor_gesai
+        for nombre, etapa in [('_codificar_lectura', 'features'), ('_codificar_lote', 'features'),
+                              ('_aplicar_reglas', 'reglas'), ('_aplicar_reglas_lote', 'reglas'),
+                              ('cifrar_pii', 'cifrado'), ('descifrar_pii', 'cifrado'), ('generar_token_seguro', 'cifrado'),
+                              ('_registrar_alerta', 'bbdd'), ('registrar_alertas', 'bbdd')]:
+            self.parchear(m, nombre, etapa)
+        self.parchear(m.ConjuntoModelos, 'predecir', 'prediccion')
+        perfilador, conectar = self, m._conectar_bbdd
+        def conectar_cronometrada(*args):
+            conn = conectar(*args)
+            return _ConexionCronometrada(conn, perfilador) if conn else conn
+        self._originales.append((m, '_conectar_bbdd', conectar))
+        m._conectar_bbdd = self.envolver('bbdd', conectar_cronometrada)
+        return self
+
+    def __exit__(self, *exc):
+        for objeto, nombre, original in reversed(self._originales): setattr(objeto, nombre, original)
+        self._originales.clear()
+
+class _ConexionCronometrada:
+    """Conexión sqlite3 cuyo commit cuenta como etapa 'bbdd'."""
+    def __init__(self, conn, perfilador):
+        self._conn = conn
+        self.commit = perfilador.envolver('bbdd', conn.commit)
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+#LECTURAS CON % DE ALERTAS FIJO
+def clasificar(pool):
+    """True en las lecturas del pool que el motor actual convierte en alerta."""
+    conjunto = motor_gesai._cargar_motor()
+    p_hoy, p_man, p_7d = conjunto.predecir(motor_gesai._codificar_lote(pool, conjunto.esquema))
+    estados, _ = motor_gesai._aplicar_reglas_lote(p_hoy, p_man, p_7d, conjunto.umbrales)
+    return np.array(["No Fuga" not in e for e in estados])
+
+def muestrear(pool, es_alerta, n, ratio, rng):
+    k = int(round(ratio * n))
+    alertas, normales = np.flatnonzero(es_alerta), np.flatnonzero(~es_alerta)
+    if (k and not len(alertas)) or (n - k and not len(normales)):
+        raise SystemExit(f"❌ El pool no tiene lecturas suficientes para un {ratio:.0%} de alertas")
+    idx = np.concatenate([rng.choice(alertas, k), rng.choice(normales, n - k)])
+    return pool.iloc[rng.permutation(idx)].reset_index(drop=True)
+
+#VARIANTES
+def correr_individual(df, args):
+    registros = df.to_dict('records')
+    lat = np.empty(len(registros))
+    t0 = time.perf_counter()
+    for i, r in enumerate(registros):
+        t = time.perf_counter()
+        motor_gesai.ejecutar_deteccion_simulada(str(r['POLISSA_SUBM']), datos_externos=r)
+        lat[i] = time.perf_counter() - t
+    return time.perf_counter() - t0, lat
+
+def correr_lote(df, args):
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(0, len(df), args.lote):
+        t = time.perf_counter()
+        motor_gesai.ejecutar_deteccion_lote(df.iloc[i:i + args.lote])
+        lat.append(time.perf_counter() - t)
+    return time.perf_counter() - t0, np.array(lat)
+
+def correr_pool(df, args):
+    #Los workers eligen al azar dentro de df: el % de alertas se mantiene en media
+    m = simulacion_backend.ejecutar_pool(df, args.workers, len(df), verbose=False)
+    return m['segundos'], None
+
+VARIANTES = {'individual': correr_individual, 'lote': correr_lote, 'pool': correr_pool}
+
+def medir(variante, df, args):
+    bbdd_temporal()
+    fn = VARIANTES[variante]
+    motor_gesai.cache_predicciones.vaciar()
+    fn(df.iloc[:min(20, len(df))], args)  #Calentamiento (sobre otra BBDD: no cuenta clientes ya creados)
+    bbdd_temporal()
+    motor_gesai.cache_predicciones.vaciar()
+    with Perfilador() as perf:
+        duracion, lat = fn(df, args)
+    n = len(df)
+    etapas = {e: perf.tiempos.get(e, 0.0) for e in ETAPAS[:-1]}
+    if variante != 'pool': etapas['otros'] = max(duracion - sum(etapas.values()), 0.0)
+    r = {
+        'lecturas_s': n / duracion, 'segundos': duracion,
+        'latencia_unidad': {'individual': 'lectura', 'lote': f'lote de {args.lote}', 'pool': None}[variante],
+        'etapas_ms_por_lectura': {e: t * 1000 / n for e, t in etapas.items()} if variante != 'pool' else None,
+    }
+    if lat is not None and len(lat):
+        r.update({f'p{q}_ms': float(np.percentile(lat, q) * 1000) for q in (50, 95, 99)})
+    return r
+
+#INFORME Y LÍNEA BASE
+def entorno():
+    import lightgbm, sklearn
+    return {
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'lightgbm': lightgbm.__version__, 'sklearn': sklearn.__version__, 'sqlite': motor_gesai.sqlite3.sqlite_version,
+        'nucleos': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+        'motor_inferencia': motor_gesai.MOTOR_INFERENCIA, 'cache_max': motor_gesai.cache_predicciones.max_entradas,
+        'version_modelos': motor_gesai._cargar_motor().version,
+    }
+
+def imprimir(resultados):
+    print(f"\n{'Variante':<10} | {'Alertas':>7} | {'lecturas/s':>10} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | ms/lectura por etapa")
+    for r in resultados:
+        etapas = r['etapas_ms_por_lectura']
+        txt_etapas = ' '.join(f"{e}={v:.3f}" for e, v in etapas.items()) if etapas else '-'
+        lat = ' | '.join(f"{r[k]:>8.2f}" if k in r else f"{'-':>8}" for k in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{r['variante']:<10} | {r['ratio_alertas']:>7.0%} | {r['lecturas_s']:>10.0f} | {lat} | {txt_etapas}")
+
+def comparar(resultados, baseline, tolerancia):
+    """Compara contra la línea base. Retorna el nº de regresiones (throughput o p99 peor que la tolerancia)."""
+    previos = {(r['variante'], r['ratio_alertas']): r for r in baseline['resultados']}
+    regresiones = 0
+    print(f"\nComparación con la línea base ({baseline['fecha']}, tolerancia {tolerancia:.0%}):")
+    for r in resultados:
+        b = previos.get((r['variante'], r['ratio_alertas']))
+        if b is None: continue
+        d_thr = r['lecturas_s'] / b['lecturas_s'] - 1
+        d_p99 = r['p99_ms'] / b['p99_ms'] - 1 if 'p99_ms' in r and 'p99_ms' in b else None
+        mal = d_thr < -tolerancia or (d_p99 is not None and d_p99 > tolerancia)
+        regresiones += mal
+        print(f"  {'❌' if mal else '✅'} {r['variante']:<10} {r['ratio_alertas']:>4.0%}: lecturas/s {d_thr:+.1%}"
+              + (f", p99 {d_p99:+.1%}" if d_p99 is not None else ""))
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extremo a extremo del camino de detección")
+    parser.add_argument('--variantes', nargs='+', default=['individual', 'lote'], choices=list(VARIANTES))
+    parser.add_argument('--ratios', type=float, nargs='+', default=[0.0, 0.1, 0.5], help="Fracción de lecturas que generan alerta")
+    parser.add_argument('--n', type=int, default=2000, help="Lecturas por medición")
+    parser.add_argument('--csv', default=None, help="Lecturas grabadas (esquema datos_simulacion_features.csv) en vez de sintéticas")
+    parser.add_argument('--clientes', type=int, default=1000, help="Clientes distintos en las lecturas sintéticas")
+    parser.add_argument('--lote', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', default=None, help="JSON de resultados (por defecto benchmarks/resultados/e2e_<fecha>.json)")
+    parser.add_argument('--baseline', default=None, help="JSON de una ejecución anterior con la que comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.csv:
+        pool = pd.read_csv(args.csv, dtype={'POLISSA_SUBM': str})
+        origen = os.path.basename(args.csv)
+    else:
+        pool = generar_lecturas(max(20 * args.n, 20000), semilla=args.semilla, num_clientes=args.clientes)
+        origen = 'sinteticas'
+    es_alerta = clasificar(pool)
+    print(f"Pool de lecturas: {len(pool)} ({origen}), {es_alerta.mean():.1%} alertas de forma natural")
+
+    resultados = []
+    for ratio in args.ratios:
+        df = muestrear(pool, es_alerta, args.n, ratio, np.random.default_rng(args.semilla))
+        for v in args.variantes:
+            print(f"  midiendo {v} con {ratio:.0%} de alertas...", flush=True)
+            resultados.append({'variante': v, 'ratio_alertas': ratio, 'n': args.n, **medir(v, df, args)})
+
+    informe = {'fecha': datetime.datetime.now().isoformat(timespec='seconds'), 'origen': origen,
+               'args': vars(args), 'entorno': entorno(), 'resultados': resultados}
+    imprimir(resultados)
+
+    salida = args.salida or os.path.join(RESULTADOS_DIR, f"e2e_{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f: json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados en {salida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+        if comparar(resultados, baseline, args.tolerancia): sys.exit(1)
+
+if __name__ == '__main__':
+    main()
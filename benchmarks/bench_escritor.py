@@ -0,0 +1,99 @@
+# benchmarks/bench_escritor.py
+# Ráfaga de fugas: H hilos guardando alertas sueltas con motor_gesai.guardar_alerta (el camino de
+# ejecutar_deteccion_simulada), con una transacción por alerta (GESAI_GRUPO_COMMIT=0) frente al
+# escritor con group commit (escritor_alertas.py), en synchronous=FULL (un fsync por commit) y
+# NORMAL (el valor del pool). Alertas/s, commits (fsync)/s, tamaño medio de grupo y latencia
+# p50/p99 hasta que la alerta está confirmada. Además, un productor que encola sin esperar
+# (registrar_alertas_async, como el modo pool del simulador).
+#   python benchmarks/bench_escritor.py --hilos 1 8 32 --alertas 2000
+
+import argparse
+import random
+import sqlite3
+import threading
+import time
+import numpy as np
+from comun import bbdd_temporal
+import motor_gesai
+from crypto_manager import cifrar_pii
+
+CLIENTES = 5000
+
+def preparar(sincronizacion, grupo):
+    motor_gesai.cerrar_escritor_alertas()
+    motor_gesai.cerrar_pool_bbdd()
+    path = bbdd_temporal()
+    conn = sqlite3.connect(path)
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", [(str(100000 + k), nombre, nombre, nombre, nombre) for k in range(CLIENTES)])
+    conn.commit()
+    conn.close()
+    motor_gesai.BBDD_PRAGMAS['synchronous'] = sincronizacion
+    motor_gesai.GRUPO_COMMIT = grupo
+    return path
+
+def contar(path):
+    conn = sqlite3.connect(path)
+    n = conn.execute("SELECT COUNT(*) FROM incidencias").fetchone()[0]
+    conn.close()
+    return n
+
+def rafaga(hilos, alertas):
+    latencias = [[] for _ in range(hilos)]
+    ids = []
+    def hilo(k):
+        rng = random.Random(k)
+        for _ in range(alertas // hilos):
+            t0 = time.perf_counter()
+            res = motor_gesai.guardar_alerta(str(100000 + rng.randrange(CLIENTES)), 'Fuga Grave', 'Crítica', 0.9, 'bench')
+            latencias[k].append(time.perf_counter() - t0)
+            ids.append(res.get('incidencia_id'))
+    ths = [threading.Thread(target=hilo, args=(k,)) for k in range(hilos)]
+    t0 = time.perf_counter()
+    for t in ths: t.start()
+    for t in ths: t.join()
+    segundos = time.perf_counter() - t0
+    assert None not in ids, "Alguna alerta no devolvió su incidencia_id"
+    return segundos, np.concatenate([np.array(l) for l in latencias]) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Group commit de alertas")
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--alertas', type=int, default=2000)
+    parser.add_argument('--grupo', type=int, default=256, help="GESAI_GRUPO_COMMIT del modo group commit")
+    args = parser.parse_args()
+    motor_gesai._cargar_motor()
+    motor_gesai.antirrebote.intervalo = 0  #Cada alerta llega a la BBDD (sin antirrebote)
+
+    print(f"{'synchronous':<11} | {'Modo':<22} | {'Hilos':>5} | {'Alertas/s':>9} | {'Commits/s':>9} | {'Grupo':>6} | {'p50 ms':>7} | {'p99 ms':>7}")
+    for sincronizacion in ['FULL', 'NORMAL']:
+        for hilos in args.hilos:
+            for nombre, grupo in [('transacción por alerta', 0), ('group commit', args.grupo)]:
+                path = preparar(sincronizacion, grupo)
+                segundos, lat = rafaga(hilos, args.alertas)
+                n = (args.alertas // hilos) * hilos
+                e = motor_gesai.estadisticas_escritor()
+                commits = e['commits'] if e else n
+                assert contar(path) <= n
+                print(f"{sincronizacion:<11} | {nombre:<22} | {hilos:>5} | {n / segundos:>9.0f} | {commits / segundos:>9.0f} | "
+                      f"{n / commits:>6.1f} | {np.percentile(lat, 50):>7.2f} | {np.percentile(lat, 99):>7.2f}", flush=True)
+
+    #Productor que no espera (modo pool / secuencial del simulador)
+    print(f"\n{'synchronous':<11} | {'Encolar sin esperar':<28} | {'Alertas/s':>9} | {'Commits/s':>9} | {'Grupo':>6}")
+    for sincronizacion in ['FULL', 'NORMAL']:
+        path = preparar(sincronizacion, args.grupo)
+        rng = random.Random(0)
+        alertas = [(0, str(100000 + rng.randrange(CLIENTES)), 'Fuga Grave', 'Crítica', 0.9, 'bench') for _ in range(args.alertas)]
+        t0 = time.perf_counter()
+        futuros = []
+        for i in range(0, len(alertas), 50): futuros += motor_gesai.registrar_alertas_async(alertas[i:i + 50])
+        ids = [f.result()['incidencia_id'] for f in futuros]
+        segundos = time.perf_counter() - t0
+        e = motor_gesai.estadisticas_escritor()
+        assert len(ids) == args.alertas and contar(path) == len(set(ids))
+        print(f"{sincronizacion:<11} | {'registrar_alertas_async':<28} | {args.alertas / segundos:>9.0f} | "
+              f"{e['commits'] / segundos:>9.0f} | {e['grupo_medio']:>6.1f}")
+    motor_gesai.cerrar_escritor_alertas()
+
+if __name__ == '__main__':
+    main()
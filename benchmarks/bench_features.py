@@ -0,0 +1,118 @@
+# benchmarks/bench_features.py
+# Motor de features en streaming (features_online.py) frente al código del notebook de
+# entrenamiento (groupby + shift + rolling(168) sobre el histórico): igualdad bit a bit de las
+# 19 columnas derivadas y de las predicciones, µs por lectura, coste de recalcular con pandas
+# a cada lote y memoria por cliente.
+#   python benchmarks/bench_features.py --clientes 200 --horas 1000
+
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from comun import generar_lecturas
+import motor_gesai
+import features_online
+
+ID = 'POLISSA_SUBM'
+
+def features_notebook(df):
+    """Celda de features temporales de model-training.ipynb, tal cual."""
+    df = df.sort_values([ID, 'FECHA_HORA_CRONO']).copy()
+    for col in features_online.LAG_FEATURES:
+        for lag in features_online.LAG_STEPS:
+            df[f'{col}_LAG_{lag}H'] = df.groupby(ID)[col].shift(lag)
+    w = features_online.WINDOW_SIZE
+    df['CONSUMO_ROLLING_MEAN_7D'] = df.groupby(ID)['CONSUMO_REAL'].transform(lambda x: x.rolling(w, min_periods=1).mean())
+    df['CONSUMO_ROLLING_STD_7D'] = df.groupby(ID)['CONSUMO_REAL'].transform(lambda x: x.rolling(w, min_periods=1).std())
+    df['RATIO_CONSUMO_MEDIA_7D'] = df['CONSUMO_REAL'] / (df['CONSUMO_ROLLING_MEAN_7D'] + features_online.EPSILON)
+    df['DIFF_CONSUMO_MEDIA_7D'] = df['CONSUMO_REAL'] - df['CONSUMO_ROLLING_MEAN_7D']
+    return df
+
+def rejilla(num_clientes, horas, semilla=0):
+    """Lecturas horarias de cada cliente con huecos (NaN), tramos constantes, negativos y picos."""
+    rng = np.random.default_rng(semilla)
+    df = generar_lecturas(num_clientes * horas, semilla=semilla, num_clientes=num_clientes)
+    k = np.repeat(np.arange(num_clientes), horas)
+    h = np.tile(np.arange(horas), num_clientes)
+    df[ID] = (100000 + k).astype(str)
+    df['FECHA_HORA_CRONO'] = pd.Timestamp('2024-01-01') + pd.to_timedelta(h, unit='h')
+    consumo = rng.gamma(2.0, 50.0, len(df)).round(3)
+    consumo[rng.random(len(df)) < 0.05] = np.nan
+    consumo[(k % 3 == 0) & (h > horas // 3) & (h < horas // 2)] = 0.0
+    consumo[k % 7 == 1] *= -1
+    consumo[(k % 11 == 2) & (h < horas // 2)] = 1e9
+    df['CONSUMO_REAL'] = consumo
+    df['TEMP_MEDIA'] = rng.normal(15, 6, len(df)).round(1)
+    df['PRECIPITACION'] = np.where(rng.random(len(df)) < 0.8, 0.0, rng.exponential(2.0, len(df))).round(1)
+    return df.drop(columns=features_online.COLUMNAS_DERIVADAS)
+
+def distintas(a, b):
+    a, b = a.to_numpy(np.float64), b.to_numpy(np.float64)
+    return int((~((a == b) | (np.isnan(a) & np.isnan(b)))).sum())
+
+def main():
+    parser = argparse.ArgumentParser(description="Features en streaming frente al notebook")
+    parser.add_argument('--clientes', type=int, default=200)
+    parser.add_argument('--horas', type=int, default=1000)
+    parser.add_argument('--lote', type=int, default=500)
+    args = parser.parse_args()
+
+    crudas = rejilla(args.clientes, args.horas)
+    #Stream: todas las lecturas de cada hora, clientes intercalados (como llegan al gateway)
+    stream = crudas.sort_values(['FECHA_HORA_CRONO', ID], kind='stable').reset_index(drop=True)
+    offline = features_notebook(crudas).sort_values(['FECHA_HORA_CRONO', ID], kind='stable').reset_index(drop=True)
+
+    #1. Igualdad con el notebook
+    motor = features_online.MotorFeatures()
+    t0 = time.perf_counter()
+    trozos = [motor.completar_lote(stream.iloc[i:i + args.lote], ID)[0] for i in range(0, len(stream), args.lote)]
+    t_lote = (time.perf_counter() - t0) / len(stream) * 1e6
+    online = pd.concat(trozos)
+    malas = {c: distintas(offline[c], online[c]) for c in features_online.COLUMNAS_DERIVADAS}
+    assert not any(malas.values()), f"Features distintas del notebook: { {c: n for c, n in malas.items() if n} }"
+    print(f"✅ {len(stream)} lecturas ({args.clientes} clientes x {args.horas} h): "
+          f"{len(features_online.COLUMNAS_DERIVADAS)} columnas idénticas bit a bit al notebook")
+
+    #2. Mismas predicciones puntuando las crudas
+    motor_gesai.motor_features = features_online.MotorFeatures()
+    n = min(len(stream), 20_000)
+    res_crudas, alertas_crudas = motor_gesai.evaluar_crudas(stream.iloc[:n], ID, anotar=False)
+    res_offline, alertas_offline = motor_gesai.evaluar_lote(offline.iloc[:n], ID, anotar=False)
+    assert res_crudas == res_offline and alertas_crudas == alertas_offline, "Las predicciones cambian con las features en streaming"
+    print(f"✅ evaluar_crudas: mismos resultados y alertas que evaluar_lote con las features del notebook ({n} lecturas)")
+
+    #3. Lecturas repetidas o desordenadas: se descartan sin tocar el estado
+    antes = motor.estadisticas()['descartadas']
+    _, aplicadas = motor.completar_lote(stream.iloc[-args.lote:], ID)
+    assert not aplicadas.any() and motor.estadisticas()['descartadas'] - antes == args.lote
+    print(f"✅ Reenvío del último lote: {args.lote} lecturas descartadas")
+
+    #4. Coste por lectura
+    motor = features_online.MotorFeatures()
+    registros = stream.head(50_000).to_dict('records')
+    t0 = time.perf_counter()
+    for r in registros: motor.actualizar(r[ID], r)
+    t_una = (time.perf_counter() - t0) / len(registros) * 1e6
+    #Sin estado: a cada lote hay que recalcular con pandas sobre el histórico acumulado (7 días por cliente como mínimo)
+    ventana = stream[stream['FECHA_HORA_CRONO'] >= stream['FECHA_HORA_CRONO'].max() - pd.Timedelta(hours=features_online.LAG_STEPS[-1] + features_online.WINDOW_SIZE)]
+    t0 = time.perf_counter()
+    for _ in range(3): features_notebook(ventana)
+    t_pandas = (time.perf_counter() - t0) / 3 / args.lote * 1e6
+    print(f"\n{'Camino':<44} | {'µs/lectura':>10}")
+    print(f"{'actualizar (lectura a lectura)':<44} | {t_una:>10.1f}")
+    print(f"{f'completar_lote (lotes de {args.lote})':<44} | {t_lote:>10.1f}")
+    print(f"{f'pandas sobre 240 h de {args.clientes} clientes por lote':<44} | {t_pandas:>10.1f}")
+
+    #5. Memoria por cliente
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    motor = features_online.MotorFeatures()
+    for k in range(1000): motor.actualizar(k, {'CONSUMO_REAL': 1.0, 'TEMP_MEDIA': 15.0, 'PRECIPITACION': 0.0})
+    por_cliente = (tracemalloc.get_traced_memory()[0] - antes) / 1000
+    tracemalloc.stop()
+    print(f"\nMemoria: {por_cliente / 1024:.2f} KB por cliente "
+          f"(GESAI_FEATURES_MAX_CLIENTES={motor_gesai.FEATURES_MAX_CLIENTES} -> {por_cliente * motor_gesai.FEATURES_MAX_CLIENTES / 2**20:.0f} MB como máximo)")
+
+if __name__ == '__main__':
+    main()
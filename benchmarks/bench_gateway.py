@@ -0,0 +1,89 @@
+# benchmarks/bench_gateway.py
+# Generador de carga para el gateway de ingesta (src/gateway_ingesta.py): C conexiones
+# envían N lecturas NDJSON lo más rápido posible (o a --tasa lecturas/s) y se mide el
+# throughput y la latencia de confirmación (envío -> ack) p50/p95/p99.
+# Sin --puerto arranca un gateway propio en este proceso con una BBDD temporal.
+#   python benchmarks/bench_gateway.py --n 20000 --conexiones 4
+#   python benchmarks/bench_gateway.py --puerto 8765 --n 5000   (contra un gateway ya lanzado)
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import numpy as np
+from comun import generar_lecturas, bbdd_temporal
+import gateway_ingesta
+
+async def cliente(host, puerto, lineas, intervalo, latencias, estados):
+    reader, writer = await asyncio.open_connection(host, puerto, limit=gateway_ingesta.MAX_LINEA)
+    enviadas = []
+
+    async def enviar():
+        t0 = time.perf_counter()
+        for i, linea in enumerate(lineas):
+            if intervalo:
+                espera = t0 + i * intervalo - time.perf_counter()
+                if espera > 0: await asyncio.sleep(espera)
+            enviadas.append(time.perf_counter())
+            writer.write(linea)
+            if i % 64 == 63: await writer.drain()  #El gateway frena aquí si su cola está llena
+        await writer.drain()
+        writer.write_eof()
+
+    tarea = asyncio.create_task(enviar())
+    for _ in range(len(lineas)):
+        ack = json.loads(await reader.readline())
+        latencias.append(time.perf_counter() - enviadas[ack['n'] - 1])
+        estados[ack['status']] = estados.get(ack['status'], 0) + 1
+    await tarea
+    writer.close()
+
+async def generar_carga(host, puerto, lineas, conexiones, tasa):
+    latencias, estados = [], {}
+    intervalo = conexiones / tasa if tasa else 0
+    trozos = [lineas[i::conexiones] for i in range(conexiones)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente(host, puerto, t, intervalo, latencias, estados) for t in trozos))
+    return time.perf_counter() - t0, np.array(latencias) * 1000, estados
+
+def arrancar_gateway(args):
+    """Gateway en un hilo con su propio bucle asyncio; retorna (gateway, puerto)."""
+    bbdd_temporal()
+    listo = threading.Event()
+    puerto = []
+    def hilo():
+        async def principal():
+            gw = gateway_ingesta.GatewayIngesta(args.lote, args.espera_ms)
+            puerto.append(gw)
+            await gw.servir('127.0.0.1', 0, listo=lambda p: (puerto.append(p), listo.set()), informar=False)
+        asyncio.run(principal())
+    threading.Thread(target=hilo, daemon=True).start()
+    listo.wait()
+    return puerto[0], puerto[1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga NDJSON para el gateway de ingesta")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=None, help="Gateway externo (por defecto, uno propio)")
+    parser.add_argument('--n', type=int, default=20000)
+    parser.add_argument('--conexiones', type=int, default=4)
+    parser.add_argument('--tasa', type=float, default=None, help="Lecturas/s en total (por defecto, sin límite)")
+    parser.add_argument('--lote', type=int, default=gateway_ingesta.TAM_LOTE)
+    parser.add_argument('--espera-ms', type=float, default=gateway_ingesta.ESPERA_LOTE_MS)
+    args = parser.parse_args()
+
+    df = generar_lecturas(args.n)
+    df['FECHA_HORA_CRONO'] = df['FECHA_HORA_CRONO'].astype(str)
+    lineas = [(json.dumps(r, ensure_ascii=False) + '\n').encode() for r in df.to_dict('records')]
+
+    gw, puerto = (None, args.puerto) if args.puerto else arrancar_gateway(args)
+    duracion, lat, estados = asyncio.run(generar_carga(args.host, puerto, lineas, args.conexiones, args.tasa))
+
+    print(f"Lecturas    : {len(lat)} en {duracion:.2f}s -> {len(lat) / duracion:.0f} lecturas/s ({args.conexiones} conexiones)")
+    print(f"Latencia ack: p50={np.percentile(lat, 50):.1f} ms p95={np.percentile(lat, 95):.1f} ms p99={np.percentile(lat, 99):.1f} ms")
+    print(f"Estados     : {estados}")
+    if gw: print(f"Micro-lotes : {gw.lotes} (media {gw.lecturas / max(gw.lotes, 1):.0f} lecturas)")
+
+if __name__ == '__main__':
+    main()
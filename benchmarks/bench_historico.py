@@ -0,0 +1,80 @@
+# benchmarks/bench_historico.py
+# get_consumo_historico: escaneo del CSV completo (camino original) frente al almacén
+# indexado por cliente (historico_clientes) con 1k / 100k / 1M clientes.
+# El CSV sintético solo tiene las 3 columnas que se leen; el real tiene ~55, así que
+# el camino original es aquí más rápido de lo que sería con el fichero de verdad.
+#   python benchmarks/bench_historico.py --clientes 1000 100000 1000000 --horas 720 72 12
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import comun  #noqa: F401 (solo añade src/ y la raíz al path)
+import motor_gesai
+import historico_clientes
+
+def generar_csv(path, num_clientes, horas, rng):
+    """Rejilla horaria: cada cliente con `horas` lecturas, filas desordenadas por cliente."""
+    clientes = np.repeat(np.arange(100000, 100000 + num_clientes), horas).astype(str)
+    fechas = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.tile(np.arange(horas), num_clientes), unit='h')
+    df = pd.DataFrame({'POLISSA_SUBM': clientes, 'FECHA_HORA_CRONO': fechas,
+                       'CONSUMO_REAL': rng.gamma(2.0, 50.0, len(clientes)).round(3)})
+    df.sample(frac=1, random_state=0).to_csv(path, index=False)
+    return len(df)
+
+def cronometrar(fn, clientes):
+    tiempos = []
+    for c in clientes:
+        t0 = time.perf_counter()
+        fn(c)
+        tiempos.append(time.perf_counter() - t0)
+    return np.array(tiempos) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Histórico por cliente: escaneo CSV vs almacén indexado")
+    parser.add_argument('--clientes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--horas', type=int, nargs='+', default=[720, 72, 12], help="Lecturas por cliente en cada tamaño")
+    parser.add_argument('--consultas', type=int, default=1000, help="Consultas al almacén indexado")
+    parser.add_argument('--consultas-csv', type=int, default=2, help="Consultas con escaneo del CSV")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'Clientes':>9} | {'Filas':>10} | {'CSV MB':>6} | {'Construir':>9} | {'Escaneo CSV p50':>15} | {'Índice p50':>10} | {'Índice p99':>10} | {'Aceleración':>11}")
+    for num_clientes, horas in zip(args.clientes, args.horas):
+        tmp = tempfile.mkdtemp(prefix='gesai_hist_')
+        try:
+            csv = os.path.join(tmp, 'datos.csv')
+            filas = generar_csv(csv, num_clientes, horas, rng)
+            historico_clientes.HISTORICO_DIR = os.path.join(tmp, 'historico')
+            motor_gesai._historico = None
+
+            #Camino original: sin almacén construido
+            muestra_csv = rng.integers(100000, 100000 + num_clientes, args.consultas_csv).astype(str)
+            t_csv = cronometrar(lambda c: motor_gesai._historico_cliente(c, csv), muestra_csv)
+
+            t0 = time.perf_counter()
+            historico_clientes.construir(csv, historico_clientes.HISTORICO_DIR)
+            t_construir = time.perf_counter() - t0
+
+            muestra = rng.integers(100000, 100000 + num_clientes, args.consultas).astype(str)
+            motor_gesai._historico_cliente(muestra[0], csv)  #Apertura del mmap
+            t_idx = cronometrar(lambda c: motor_gesai._historico_cliente(c, csv), muestra)
+
+            #Mismo resultado por los dos caminos
+            a = motor_gesai._historico_cliente(muestra_csv[0], csv).reset_index(drop=True)
+            motor_gesai._historico = None
+            historico_clientes.HISTORICO_DIR = os.path.join(tmp, 'no_existe')
+            b = motor_gesai._historico_cliente(muestra_csv[0], csv).reset_index(drop=True)
+            assert a.equals(b), "El almacén indexado no coincide con el escaneo del CSV"
+
+            p50_csv, p50_idx = np.percentile(t_csv, 50), np.percentile(t_idx, 50)
+            print(f"{num_clientes:>9} | {filas:>10} | {os.path.getsize(csv) / 2**20:>6.0f} | {t_construir:>8.1f}s | "
+                  f"{p50_csv:>12.0f} ms | {p50_idx:>7.3f} ms | {np.percentile(t_idx, 99):>7.3f} ms | {p50_csv / p50_idx:>10.0f}x", flush=True)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_latencia.py
+# Latencia p50/p99 de puntuar UNA lectura (solo features + 3 modelos, sin BBDD):
+# camino pandas original vs esquema precompilado + fila NumPy.
+#   python benchmarks/bench_latencia.py --n 2000
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from comun import generar_lecturas, modelos_lightgbm
+import motor_gesai
+
+def puntuar_pandas(lectura):
+    """Camino anterior: DataFrame de una fila, casting por columna y predict_proba x3."""
+    fila = pd.DataFrame([lectura])
+    cols_validas = [c for c in motor_gesai._cargar_motor().esquema.columnas if c in fila.columns]
+    X_input = fila[cols_validas].copy()
+    for c in X_input.columns:
+        if c in motor_gesai.CATEGORICAS: X_input[c] = X_input[c].astype('category')
+        else: X_input[c] = pd.to_numeric(X_input[c], errors='coerce').fillna(0.0)
+    return [modelos_lightgbm()[h].predict_proba(X_input, raw_score=False)[:, 1][0] for h in motor_gesai.HORIZONTES]
+
+def puntuar_esquema(lectura):
+    conjunto = motor_gesai._cargar_motor()
+    return list(conjunto.predecir(motor_gesai._codificar_lectura(lectura, conjunto.esquema))[:, 0])
+
+def medir(fn, registros):
+    tiempos = np.empty(len(registros))
+    salidas = []
+    for i, r in enumerate(registros):
+        t0 = time.perf_counter()
+        salidas.append(fn(r))
+        tiempos[i] = time.perf_counter() - t0
+    return tiempos * 1000, np.array(salidas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de una lectura: pandas vs esquema precompilado")
+    parser.add_argument('--n', type=int, default=2000)
+    args = parser.parse_args()
+
+    registros = generar_lecturas(args.n).to_dict('records')
+    for fn in (puntuar_pandas, puntuar_esquema): fn(registros[0])  # calentamiento
+
+    t_pd, p_pd = medir(puntuar_pandas, registros)
+    t_np, p_np = medir(puntuar_esquema, registros)
+
+    for nombre, t in (("pandas", t_pd), ("esquema", t_np)):
+        print(f"{nombre:<8} p50={np.percentile(t, 50):7.3f} ms  p99={np.percentile(t, 99):7.3f} ms")
+    print(f"Reducción p50: x{np.percentile(t_pd, 50) / np.percentile(t_np, 50):.1f}")
+    print(f"Predicciones idénticas bit a bit: {np.array_equal(p_pd, p_np)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_lector.py
+# Lectura del dataset de simulación con memoria acotada (dataset_features): pico de memoria y
+# tiempo de cada camino, cada uno en un proceso limpio, para varios tamaños de dataset.
+#   - original: pd.read_csv + to_dict('records') (lo que hacía simulacion_backend.main)
+#   - importación a Arrow: en memoria (_compactar(_leer_csv)) frente a por bloques (importar_csv)
+#   - modo serie (lecturas_aleatorias), recorrido secuencial (iterar_lotes) y muestra de 10k
+#     filas, desde el Arrow mapeado y desde el CSV por bloques (reservorio)
+#   python benchmarks/bench_lector.py --filas 250000 1000000 --memoria-mb 64
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from comun import SRC_DIR, generar_lecturas
+import dataset_features
+
+SCRIPT = r'''
+import sys, time, json, threading
+import numpy as np
+import pandas as pd
+import dataset_features as d
+modo, csv, arrow, memoria = sys.argv[1], sys.argv[2], sys.argv[3], float(sys.argv[4])
+def rss_anonima():
+    #Memoria privada: las páginas del Arrow mapeado son caché de disco compartida y recuperable
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('RssAnon:')) / 1024
+pico = [0.0]
+def vigilar():
+    while True:
+        pico[0] = max(pico[0], rss_anonima())
+        time.sleep(0.002)
+base = rss_anonima()
+threading.Thread(target=vigilar, daemon=True).start()
+t0 = time.perf_counter()
+if modo == 'original':
+    n = len(pd.read_csv(csv).to_dict('records'))
+elif modo == 'importar_memoria':
+    n = d._compactar(d._leer_csv(csv)).num_rows
+elif modo == 'importar_bloques':
+    n = d.importar_csv(csv, arrow, memoria_mb=memoria).num_rows
+else:
+    origen, accion = modo.split(':')
+    a = arrow if origen == 'arrow' else arrow + '.no_existe'
+    if accion == 'serie':
+        gen = d.lecturas_aleatorias(1000, 0, memoria_mb=memoria, path_csv=csv, path_arrow=a)
+        n = sum(len(next(gen).to_dict('records')) for _ in range(20))
+    elif accion == 'secuencial':
+        n = sum(len(l) for l in d.iterar_lotes(memoria_mb=memoria, path_csv=csv, path_arrow=a))
+    else:
+        n = len(d.muestra(10000, 0, memoria_mb=memoria, path_csv=csv, path_arrow=a))
+t = time.perf_counter() - t0
+time.sleep(0.01)
+print(json.dumps({'filas': n, 's': t, 'pico': pico[0] - base}))
+'''
+
+MODOS = [
+    ('original', 'read_csv + to_dict (original)'),
+    ('importar_memoria', 'importar: en memoria'),
+    ('importar_bloques', 'importar: por bloques'),
+    ('arrow:serie', 'serie 20x1000 (Arrow)'),
+    ('csv:serie', 'serie 20x1000 (CSV, reservorio)'),
+    ('arrow:secuencial', 'secuencial (Arrow)'),
+    ('csv:secuencial', 'secuencial (CSV por bloques)'),
+    ('arrow:muestra', 'muestra 10k (índices)'),
+    ('csv:muestra', 'muestra 10k (reservorio)'),
+]
+
+def medir(modo, csv, arrow, memoria_mb):
+    salida = subprocess.run([sys.executable, '-c', SCRIPT, modo, csv, arrow, str(memoria_mb)], cwd=SRC_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+def uniformidad(csv, filas, memoria_mb, repeticiones=20, k=2000):
+    """Fracción de la muestra de reservorio que cae en cada décimo del CSV (uniforme: 10% cada uno)."""
+    conteo = np.zeros(10)
+    for s in range(repeticiones):
+        m = dataset_features._reservorio(k, np.random.default_rng(s), ['FILA'], memoria_mb, csv)
+        conteo += np.bincount(m.column('FILA').to_numpy().astype(np.int64) * 10 // filas, minlength=10)
+    return conteo / conteo.sum()
+
+def main():
+    parser = argparse.ArgumentParser(description="Lectura del dataset con memoria acotada")
+    parser.add_argument('--filas', type=int, nargs='+', default=[250000, 1000000])
+    parser.add_argument('--memoria-mb', type=float, default=64)
+    args = parser.parse_args()
+
+    resultados = {}
+    for filas in args.filas:
+        tmp = tempfile.mkdtemp(prefix='gesai_lector_')
+        try:
+            csv, arrow = os.path.join(tmp, 'datos.csv'), os.path.join(tmp, 'datos.arrow')
+            df = generar_lecturas(filas, semilla=0, num_clientes=10000)
+            num = df.select_dtypes('number').columns
+            df[num] = df[num].round(3)
+            df.insert(0, 'FILA', np.arange(filas))
+            df.to_csv(csv, index=False)
+            del df
+            print(f"Filas {filas}: CSV {os.path.getsize(csv) / 2**20:.0f} MB", flush=True)
+            resultados[filas] = {modo: medir(modo, csv, arrow, args.memoria_mb) for modo, _ in MODOS}
+            #La importación por bloques da la misma tabla que en memoria
+            a = dataset_features._compactar(dataset_features._leer_csv(csv))
+            b = dataset_features.tabla_mapeada(path_csv=csv, path_arrow=arrow)
+            assert a.schema.equals(b.schema) and a.equals(b), "La importación por bloques no coincide con la de memoria"
+            del a, b
+            decimos = uniformidad(csv, filas, args.memoria_mb)
+            print(f"   ✅ Importación por bloques idéntica a la de memoria | reservorio por décimos del CSV: "
+                  f"{decimos.min():.1%}..{decimos.max():.1%} (uniforme 10%)", flush=True)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    cab = ' | '.join(f"{f'{f} filas':>19}" for f in args.filas)
+    print(f"\nMemoria privada (RssAnon) máxima sobre la base del proceso y tiempo (techo {args.memoria_mb:g} MB)")
+    print(f"{'Camino':<34} | {cab}")
+    for modo, nombre in MODOS:
+        celdas = ' | '.join(f"{resultados[f][modo]['pico']:>7.0f} MB {resultados[f][modo]['s']:>7.2f}s" for f in args.filas)
+        print(f"{nombre:<34} | {celdas}")
+
+if __name__ == '__main__':
+    main()
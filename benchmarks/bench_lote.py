@@ -0,0 +1,37 @@
+# benchmarks/bench_lote.py
+# Lecturas/segundo: ejecutar_deteccion_simulada (fila a fila) vs ejecutar_deteccion_lote.
+#   python benchmarks/bench_lote.py --n 5000
+
+import argparse
+import time
+from comun import generar_lecturas, bbdd_temporal
+import motor_gesai
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detección individual vs lote")
+    parser.add_argument('--n', type=int, default=5000, help="Lecturas del lote")
+    parser.add_argument('--n-individual', type=int, default=500, help="Lecturas para el camino fila a fila")
+    args = parser.parse_args()
+
+    bbdd_temporal()
+    df = generar_lecturas(args.n)
+    registros = df.to_dict('records')[:args.n_individual]
+
+    t0 = time.perf_counter()
+    for r in registros:
+        motor_gesai.ejecutar_deteccion_simulada(str(r['POLISSA_SUBM']), datos_externos=r)
+    t_ind = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    res = motor_gesai.ejecutar_deteccion_lote(df)
+    t_lote = time.perf_counter() - t0
+
+    alertas = sum(r['status'] == 'ALERTA' for r in res)
+    v_ind = len(registros) / t_ind
+    v_lote = len(df) / t_lote
+    print(f"Fila a fila : {len(registros):>7} lecturas en {t_ind:7.3f}s -> {v_ind:10.0f} lecturas/s")
+    print(f"Lote        : {len(df):>7} lecturas en {t_lote:7.3f}s -> {v_lote:10.0f} lecturas/s ({alertas} alertas)")
+    print(f"Aceleración : x{v_lote / v_ind:.1f}")
+
+if __name__ == '__main__':
+    main()
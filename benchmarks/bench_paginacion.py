@@ -0,0 +1,126 @@
+# benchmarks/bench_paginacion.py
+# Listado de incidencias del dashboard: OFFSET (lo que haría falta para pasar de las 50 primeras
+# con la consulta de antes) frente a get_pagina_incidencias, paginada por clave
+# (fecha_deteccion, id) con los filtros en SQL (migración 6).
+#   - latencia de las páginas 1, 10 y 100 por filtro con 1k / 100k / 1M incidencias abiertas
+#   - recorrer todas las páginas da las mismas incidencias que la consulta entera ordenada, sin
+#     duplicados ni huecos, con muchas fechas repetidas (CURRENT_TIMESTAMP es al segundo)
+#   - cuántas incidencias veía el dashboard antes (LIMIT 50 y filtro en Python sobre esas 50)
+#   python benchmarks/bench_paginacion.py --abiertas 1000 100000 1000000
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import time
+import numpy as np
+from comun import bbdd_temporal
+import motor_gesai
+from crypto_manager import cifrar_pii
+
+ESTADOS = ['Fuga Grave', 'Fuga Grave (En Crecimiento)', 'Fuga Moderada', 'Fuga Leve (Tendencia)']
+VERIFICACIONES = ['PENDIENTE', 'CARTA PENDIENTE', 'VERIFICADO (Encuesta)']
+FILTROS = ['todas', 'Grave', 'Moderada', 'carta']
+PAGINAS = [1, 10, 100]
+
+def poblar(path, abiertas, rng):
+    """abiertas incidencias abiertas (una por cliente) y otras tantas resueltas, ~20 por segundo."""
+    conn = sqlite3.connect(path)
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", ((str(10**6 + k), nombre, nombre, nombre, nombre) for k in range(abiertas)))
+    conn.executemany("INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion, fecha_deteccion) "
+                     "VALUES (?, ?, ?, 'bench', datetime(1700000000 + ?, 'unixepoch'))",
+                     ((str(10**6 + k // 2), rng.choice(ESTADOS), 'RESUELTA' if k % 2 else rng.choice(VERIFICACIONES), rng.randrange(max(2 * abiertas // 20, 1)))
+                      for k in range(2 * abiertas)))
+    conn.commit()
+    conn.close()
+
+def pagina_offset(filtro, n, tam):
+    """Página n con OFFSET sobre la consulta de antes (fecha_deteccion DESC), ya con el filtro en SQL."""
+    cond, params = motor_gesai._filtro_incidencias(filtro)
+    conn = motor_gesai._conectar_bbdd()  #Misma conexión del pool que get_pagina_incidencias
+    filas = conn.execute(f"""
+        SELECT i.*, c.nombre as cliente_nombre FROM incidencias i JOIN clientes c ON i.cliente_id = c.cliente_id
+        WHERE i.verificacion != 'RESUELTA'{cond} ORDER BY i.fecha_deteccion DESC, i.id DESC LIMIT ? OFFSET ?""",
+        params + [tam, (n - 1) * tam]).fetchall()
+    for r in filas: motor_gesai.descifrar_pii(r['cliente_nombre'])
+    conn.close()
+    return filas
+
+def cursores(filtro, paginas, tam):
+    """Cursor 'siguiente' con el que se pide cada página de `paginas` (None para la primera)."""
+    res, siguiente = {1: None}, None
+    for n in range(2, max(paginas) + 1):
+        siguiente = motor_gesai.get_pagina_incidencias(filtro, siguiente, tam)['siguiente']
+        if siguiente is None: break
+        res[n] = siguiente
+    return res
+
+def cronometrar(fn, repeticiones=15):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return np.median(tiempos) * 1000
+
+def ids_esperados(path, filtro):
+    cond, params = motor_gesai._filtro_incidencias(filtro)
+    conn = sqlite3.connect(path)
+    ids = [r[0] for r in conn.execute(f"SELECT i.id FROM incidencias i WHERE i.verificacion != 'RESUELTA'{cond} "
+                                      "ORDER BY i.fecha_deteccion DESC, i.id DESC", params)]
+    conn.close()
+    return ids
+
+def recorrer(filtro, tam):
+    ids, siguiente, paginas = [], None, 0
+    while True:
+        p = motor_gesai.get_pagina_incidencias(filtro, siguiente, tam)
+        ids += [r['id'] for r in p['incidencias']]
+        paginas += 1
+        siguiente = p['siguiente']
+        if siguiente is None: return ids, paginas
+
+def vistas_antes(path, filtro):
+    """Incidencias del filtro que mostraba el dashboard: LIMIT 50 sin filtro y filtro en Python."""
+    conn = sqlite3.connect(path)
+    filas = conn.execute("SELECT estado, verificacion FROM incidencias WHERE verificacion != 'RESUELTA' ORDER BY fecha_deteccion DESC LIMIT 50").fetchall()
+    conn.close()
+    if filtro == 'todas': return len(filas)
+    if filtro == 'carta': return sum('CARTA' in v.upper() for _, v in filas)
+    return sum(filtro.upper() in e.upper() for e, _ in filas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Listado de incidencias paginado por clave frente a OFFSET")
+    parser.add_argument('--abiertas', type=int, nargs='+', default=[1000, 100_000, 1_000_000])
+    parser.add_argument('--tam', type=int, default=motor_gesai.TAM_PAGINA_INCIDENCIAS)
+    parser.add_argument('--recorrer-hasta', type=int, default=100_000, help="Recorre todas las páginas hasta este tamaño de tabla")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"Páginas de {args.tam} incidencias; ms por página (mediana), OFFSET / clave")
+    print(f"{'Abiertas':>9} | {'Filtro':<8} | {'Total':>8} | {'Antes':>5} | " + " | ".join(f"{'pág ' + str(n):>17}" for n in PAGINAS))
+    for abiertas in args.abiertas:
+        path = bbdd_temporal()
+        poblar(path, abiertas, rng)
+        for filtro in FILTROS:
+            esperados = ids_esperados(path, filtro)
+            c = cursores(filtro, PAGINAS, args.tam)
+            celdas = []
+            for n in PAGINAS:
+                if n not in c: celdas.append(f"{'—':>17}"); continue
+                ms_offset = cronometrar(lambda: pagina_offset(filtro, n, args.tam))
+                ms_clave = cronometrar(lambda: motor_gesai.get_pagina_incidencias(filtro, c[n], args.tam))
+                celdas.append(f"{ms_offset:>8.2f} / {ms_clave:<6.2f}")
+            print(f"{abiertas:>9} | {filtro:<8} | {len(esperados):>8} | {vistas_antes(path, filtro):>5} | " + " | ".join(celdas), flush=True)
+            if abiertas <= args.recorrer_hasta:
+                ids, paginas = recorrer(filtro, args.tam)
+                assert ids == esperados, f"Recorrido distinto de la consulta ordenada ({filtro}, {abiertas})"
+                assert len(set(ids)) == len(ids) and paginas == max(1, -(-len(ids) // args.tam))
+        motor_gesai.cerrar_pool_bbdd()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    print(f"✅ Recorrer todas las páginas da las mismas incidencias y en el mismo orden que la consulta entera (hasta {args.recorrer_hasta} abiertas)")
+
+if __name__ == '__main__':
+    main()
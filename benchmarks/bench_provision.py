@@ -0,0 +1,149 @@
+# benchmarks/bench_provision.py
+# Alta de clientes de setup_database.py:
+#   - elección de ids: columna POLISSA_SUBM entera + unique() + random.sample (original) frente al
+#     muestreo en streaming de dataset_features.clientes_al_azar, desde el Arrow y desde el CSV;
+#     pico de memoria privada y tiempo, cada uno en un proceso limpio
+#   - inserción: bucle original (cursor.execute y 4 cifrados por cliente, en serie) frente a
+#     provisionar_clientes (workers + executemany en transacciones grandes), clientes/s
+#   python benchmarks/bench_provision.py --filas 2000000 --distintos 500000 --clientes 20000 --workers 1 4
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from comun import SRC_DIR
+import dataset_features
+import setup_database
+from crypto_manager import cifrar_pii, descifrar_pii
+
+SCRIPT = r'''
+import sys, time, json, threading, random
+import dataset_features as d
+modo, csv, arrow, k = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+def rss_anonima():
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('RssAnon:')) / 1024
+pico = [0.0]
+def vigilar():
+    while True:
+        pico[0] = max(pico[0], rss_anonima())
+        time.sleep(0.002)
+base = rss_anonima()
+threading.Thread(target=vigilar, daemon=True).start()
+t0 = time.perf_counter()
+origen, accion = modo.split(':')
+a = arrow if origen == 'arrow' else arrow + '.no_existe'
+if accion == 'original':
+    unique = d.cargar(['POLISSA_SUBM'], path_csv=csv, path_arrow=a)['POLISSA_SUBM'].astype(str).unique().tolist()
+    ids = random.sample(unique, k) if len(unique) >= k else unique
+else:
+    ids = d.clientes_al_azar(k, 0, path_csv=csv, path_arrow=a)
+t = time.perf_counter() - t0
+time.sleep(0.01)
+print(json.dumps({'ids': len(ids), 's': t, 'pico': pico[0] - base}))
+'''
+
+MODOS = [
+    ('arrow:original', 'unique + random.sample (Arrow)'),
+    ('arrow:streaming', 'clientes_al_azar (Arrow)'),
+    ('csv:original', 'unique + random.sample (CSV)'),
+    ('csv:streaming', 'clientes_al_azar (CSV por bloques)'),
+]
+
+def medir(modo, csv, arrow, k):
+    salida = subprocess.run([sys.executable, '-c', SCRIPT, modo, csv, arrow, str(k)], cwd=SRC_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+def provision_original(conn, ids):
+    """Bucle de insertar_datos_iniciales antes de provisionar_clientes, tal cual."""
+    cursor = conn.cursor()
+    for i, c_id in enumerate(ids):
+        es_digital = (i % 4 != 0)
+        raw_nombre = setup_database.faker.name()
+        raw_addr = setup_database.faker.address()
+        raw_telf = setup_database.faker.phone_number() if es_digital else None
+        raw_email = f"{raw_nombre.split()[0].lower()}@mail.com" if es_digital else None
+        cursor.execute(
+            "INSERT OR IGNORE INTO clientes (cliente_id, nombre, telefono, email, direccion) VALUES (?, ?, ?, ?, ?)",
+            (str(c_id), cifrar_pii(raw_nombre), cifrar_pii(raw_telf), cifrar_pii(raw_email), cifrar_pii(raw_addr))
+        )
+    conn.commit()
+
+def bbdd_vacia(tmp, nombre):
+    path = os.path.join(tmp, nombre)
+    conn = sqlite3.connect(path)
+    setup_database.crear_tablas(conn)
+    return conn
+
+def main():
+    parser = argparse.ArgumentParser(description="Alta de clientes de setup_database")
+    parser.add_argument('--filas', type=int, default=2_000_000, help="Filas del dataset sintético")
+    parser.add_argument('--distintos', type=int, default=500_000, help="POLISSA_SUBM distintos en el dataset")
+    parser.add_argument('--muestra', type=int, default=100_000, help="Ids a elegir del dataset")
+    parser.add_argument('--clientes', type=int, default=20_000, help="Clientes a insertar")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='gesai_provision_')
+    try:
+        #1. Elección de ids
+        csv, arrow = os.path.join(tmp, 'datos.csv'), os.path.join(tmp, 'datos.arrow')
+        rng = np.random.default_rng(0)
+        pd.DataFrame({
+            'POLISSA_SUBM': rng.integers(10**8, 10**8 + args.distintos, args.filas).astype(str),
+            'FECHA_HORA_CRONO': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 24 * 365, args.filas), unit='h'),
+            'CONSUMO_REAL': rng.gamma(2.0, 50.0, args.filas).round(3),
+        }).to_csv(csv, index=False)
+        dataset_features.importar_csv(csv, arrow)
+        distintos = set(dataset_features.cargar(['POLISSA_SUBM'], path_csv=csv, path_arrow=arrow)['POLISSA_SUBM'].astype(str))
+        print(f"Dataset: {args.filas} filas, {len(distintos)} clientes distintos | CSV {os.path.getsize(csv) / 2**20:.0f} MB")
+
+        a = dataset_features.clientes_al_azar(args.muestra, 0, path_csv=csv, path_arrow=arrow)
+        b = dataset_features.clientes_al_azar(args.muestra, 0, path_csv=csv, path_arrow=arrow + '.no_existe')
+        assert a == b and len(set(a)) == len(a) == min(args.muestra, len(distintos)) and set(a) <= distintos
+        #Uniforme: cada mitad de los ids (ordenados) aporta la mitad de la muestra
+        mediana = sorted(distintos)[len(distintos) // 2]
+        bajos = np.mean([sum(c < mediana for c in dataset_features.clientes_al_azar(2000, s, path_csv=csv, path_arrow=arrow))
+                         for s in range(10)]) / 2000
+        print(f"   ✅ {len(a)} ids distintos del dataset, mismos desde Arrow y CSV | mitad inferior: {bajos:.1%} (uniforme 50%)")
+
+        print(f"\n{'Elección de ' + str(args.muestra) + ' ids':<38} | {'Memoria':>8} | {'Tiempo':>7}")
+        for modo, nombre in MODOS:
+            r = medir(modo, csv, arrow, args.muestra)
+            print(f"{nombre:<38} | {r['pico']:>5.0f} MB | {r['s']:>6.2f}s", flush=True)
+
+        #2. Inserción
+        ids = [str(10**7 + i) for i in range(args.clientes)]
+        print(f"\n{'Inserción de ' + str(args.clientes) + ' clientes':<38} | {'Clientes/s':>10} | {'Tiempo':>7}")
+        conn = bbdd_vacia(tmp, 'original.db')
+        t0 = time.perf_counter()
+        provision_original(conn, ids)
+        t_original = time.perf_counter() - t0
+        conn.close()
+        print(f"{'original (execute en serie)':<38} | {args.clientes / t_original:>10,.0f} | {t_original:>6.1f}s", flush=True)
+
+        setup_database.PATH_DATOS_REALES = os.path.join(tmp, 'no_existe.csv')  #Solo ids sintéticos: mide la inserción
+        for w in args.workers:
+            conn = bbdd_vacia(tmp, f'bulk_{w}.db')
+            t0 = time.perf_counter()
+            insertados, carta = setup_database.provisionar_clientes(conn, args.clientes, w, semilla=0)
+            t = time.perf_counter() - t0
+            assert insertados == args.clientes and carta == (args.clientes + 3) // 4
+            filas = conn.execute("SELECT nombre, telefono, email FROM clientes ORDER BY rowid LIMIT 8").fetchall()
+            assert all(descifrar_pii(n) for n, _, _ in filas) and (filas[0][1] is None) and filas[1][1] is not None
+            conn.close()
+            print(f"{f'provisionar_clientes ({w} workers)':<38} | {args.clientes / t:>10,.0f} | {t:>6.1f}s "
+                  f"(x{t_original / t:.1f})", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_recarga.py
+# Recarga en caliente: hilos puntuando lotes sin parar mientras se publica una versión
+# nueva en un registro temporal. Comprueba que no se pierde ninguna lectura, que cada
+# incidencia queda anotada con una versión válida y mide la latencia de lote durante el cambio.
+#   python benchmarks/bench_recarga.py --hilos 2 --segundos 6
+
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+import numpy as np
+from comun import generar_lecturas, bbdd_temporal
+import motor_gesai
+import registro_modelos
+
+def main():
+    parser = argparse.ArgumentParser(description="Recarga de modelos en caliente bajo carga")
+    parser.add_argument('--hilos', type=int, default=2)
+    parser.add_argument('--segundos', type=float, default=6.0)
+    parser.add_argument('--lote', type=int, default=200)
+    args = parser.parse_args()
+
+    registro_modelos.REGISTRO_DIR = tempfile.mkdtemp(prefix='gesai_registro_')
+    registro_modelos.publicar_version(motor_gesai.MODELOS_DIR, 'v1')
+    motor_gesai.INTERVALO_RECARGA = 0.2
+    bbdd = bbdd_temporal()
+    df = generar_lecturas(args.lote * 10)
+    print(f"Versión inicial: {motor_gesai._cargar_motor().version}")
+
+    fin = time.perf_counter() + args.segundos
+    lecturas, errores, tiempos = [0] * args.hilos, [0] * args.hilos, [[] for _ in range(args.hilos)]
+
+    def trabajador(i):
+        #Clientes propios por hilo: el alta de cliente en _registrar_alerta no admite dos escritores a la vez
+        df_hilo = df.assign(POLISSA_SUBM=f"H{i}-" + df['POLISSA_SUBM'])
+        k = 0
+        while time.perf_counter() < fin:
+            lote = df_hilo.iloc[(k % 10) * args.lote:(k % 10 + 1) * args.lote]
+            t0 = time.perf_counter()
+            try:
+                res = motor_gesai.ejecutar_deteccion_lote(lote)
+                errores[i] += sum(r['status'] == 'ERROR' for r in res) + (len(lote) - len(res))
+            except Exception as e:
+                print(f"❌ Lote fallido: {e}")
+                res, errores[i] = [], errores[i] + len(lote)
+            tiempos[i].append((t0, time.perf_counter() - t0))
+            lecturas[i] += len(res)
+            k += 1
+
+    hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(args.hilos)]
+    for h in hilos: h.start()
+    time.sleep(args.segundos / 3)
+    #v2: mismos .joblib, umbrales distintos, para ver el cambio en las incidencias
+    t_pub = time.perf_counter()
+    registro_modelos.publicar_version(motor_gesai.MODELOS_DIR, 'v2', {'UMBRAL_ALERTA': 0.6})
+    while motor_gesai.conjunto_activo.version != 'v2' and time.perf_counter() < fin: time.sleep(0.01)
+    t_swap = time.perf_counter()
+    for h in hilos: h.join()
+
+    conn = sqlite3.connect(bbdd)
+    por_version = dict(conn.execute("SELECT COALESCE(modelo_version, 'NULL'), COUNT(*) FROM incidencias GROUP BY 1").fetchall())
+    conn.close()
+    lat = np.array([d for t in tiempos for _, d in t]) * 1000
+    lat_cambio = np.array([d for t in tiempos for t0, d in t if t_pub <= t0 <= t_swap + 0.5]) * 1000
+
+    print(f"Versión final     : {motor_gesai.conjunto_activo.version}")
+    print(f"Publicación->swap : {(t_swap - t_pub) * 1000:.0f} ms (sondeo cada {motor_gesai.INTERVALO_RECARGA}s, incluye carga y calentamiento)")
+    print(f"Lecturas          : {sum(lecturas)} ({sum(lecturas) / args.segundos:.0f}/s), perdidas o con error: {sum(errores)}")
+    print(f"Incidencias       : {por_version}")
+    print(f"Latencia de lote  : p50={np.percentile(lat, 50):.1f} ms p99={np.percentile(lat, 99):.1f} ms"
+          + (f" | durante el cambio máx={lat_cambio.max():.1f} ms" if len(lat_cambio) else ""))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# benchmarks/bench_replay.py
+# Replay cronológico (simulacion_backend.ejecutar_replay) sobre lecturas sintéticas:
+# throughput y latencia a máxima velocidad y a velocidad fija, y determinismo
+# (misma huella de resultados en dos ejecuciones sobre BBDD distintas).
+#   python benchmarks/bench_replay.py --n 20000 --clientes 500 --velocidad 20000
+
+import argparse
+import pandas as pd
+from comun import generar_lecturas, bbdd_temporal
+import simulacion_backend
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay cronológico del simulador")
+    parser.add_argument('--n', type=int, default=20000)
+    parser.add_argument('--clientes', type=int, default=500)
+    parser.add_argument('--velocidad', type=float, default=20000, help="Factor para la pasada a velocidad fija")
+    args = parser.parse_args()
+
+    df = generar_lecturas(args.n, num_clientes=args.clientes)
+    #Rejilla horaria como la del CSV real: cada cliente lee una vez por hora
+    df['POLISSA_SUBM'] = (100000 + df.index % args.clientes).astype(str)
+    df['FECHA_HORA_CRONO'] = pd.Timestamp('2024-01-01') + pd.to_timedelta(df.index // args.clientes, unit='h')
+    df = df.sample(frac=1, random_state=0)  #Desordenado: el replay debe ordenarlo
+
+    huellas = []
+    for velocidad in (0, 0, args.velocidad):
+        bbdd_temporal()
+        m = simulacion_backend.ejecutar_replay(df, velocidad, verbose=False)
+        print(f"\nVelocidad {'máxima' if not velocidad else f'x{velocidad:g}'}:")
+        simulacion_backend.imprimir_resumen_replay(m)
+        huellas.append(m['huella'])
+    print(f"\nDeterminista entre ejecuciones: {len(set(huellas)) == 1}")
+
+if __name__ == '__main__':
+    main()
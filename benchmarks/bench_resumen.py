@@ -0,0 +1,147 @@
+# benchmarks/bench_resumen.py
+# KPI del dashboard (refresh_dashboard, cada 2 s): contar en Python sobre las 50 filas de
+# get_lista_incidencias_activas('todas') (lo de antes) frente a get_resumen_incidencias, que lee
+# resumen_incidencias (migración 4, mantenida por triggers), y frente a un COUNT(*) GROUP BY exacto.
+#   - latencia y valores de los KPI con 1k / 100k / 1M incidencias abiertas
+#   - coste de los triggers en el camino de escritura (registrar_alertas con y sin triggers)
+#   - el resumen coincide con el recuento tras altas, escaladas, encuestas, cartas, resoluciones y borrados
+#   python benchmarks/bench_resumen.py --abiertas 1000 100000 1000000
+
+import argparse
+import random
+import shutil
+import os
+import sqlite3
+import time
+import numpy as np
+from comun import bbdd_temporal
+import motor_gesai
+import migraciones_bbdd
+from crypto_manager import cifrar_pii
+
+ESTADOS = ['Fuga Grave', 'Fuga Grave (En Crecimiento)', 'Fuga Moderada', 'Fuga Leve (Tendencia)']
+VERIFICACIONES = ['PENDIENTE', 'CARTA PENDIENTE', 'VERIFICADO (Encuesta)']
+
+def poblar(path, abiertas, rng):
+    """abiertas incidencias abiertas (una por cliente) y otras tantas resueltas."""
+    conn = sqlite3.connect(path)
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", ((str(10**6 + k), nombre, nombre, nombre, nombre) for k in range(abiertas)))
+    conn.executemany("INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion) VALUES (?, ?, ?, ?)",
+                     ((str(10**6 + k // 2), rng.choice(ESTADOS), 'RESUELTA' if k % 2 else rng.choice(VERIFICACIONES), 'bench')
+                      for k in range(2 * abiertas)))
+    conn.commit()
+    conn.close()
+
+def kpi_lista():
+    """refresh_dashboard antes de resumen_incidencias."""
+    todas = motor_gesai.get_lista_incidencias_activas('todas') or []
+    return {'total': len(todas),
+            'graves': sum('GRAVE' in str(i.get('estado', '')).upper() for i in todas),
+            'moderadas': sum('MODERADA' in str(i.get('estado', '')).upper() for i in todas),
+            'cartas': sum('CARTA' in str(i.get('verificacion', '')).upper() for i in todas)}
+
+def kpi_exacto(path):
+    conn = sqlite3.connect(path)
+    filas = conn.execute("SELECT estado, verificacion, COUNT(*) FROM incidencias WHERE verificacion != 'RESUELTA' GROUP BY 1, 2").fetchall()
+    conn.close()
+    return {'total': sum(n for _, _, n in filas),
+            'graves': sum(n for e, _, n in filas if 'GRAVE' in e.upper()),
+            'moderadas': sum(n for e, _, n in filas if 'MODERADA' in e.upper()),
+            'cartas': sum(n for _, v, n in filas if 'CARTA' in v.upper())}
+
+def kpi_resumen():
+    r = motor_gesai.get_resumen_incidencias()
+    return {k: r[k] for k in ('total', 'graves', 'moderadas', 'cartas')}
+
+def cronometrar(fn, repeticiones=20):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        res = fn()
+        tiempos.append(time.perf_counter() - t0)
+    return np.median(tiempos) * 1000, res
+
+def comprobar_resumen(path):
+    """resumen_incidencias == recuento desde incidencias (todas las clases y verificaciones)."""
+    conn = sqlite3.connect(path)
+    resumen = {(c, v): n for c, v, n in conn.execute("SELECT clase, verificacion, total FROM resumen_incidencias WHERE total != 0")}
+    recuento = {(c, v): n for c, v, n in conn.execute(
+        f"SELECT {migraciones_bbdd._clase_sql('incidencias')}, COALESCE(verificacion, ''), COUNT(*) FROM incidencias GROUP BY 1, 2")}
+    conn.close()
+    return resumen == recuento, resumen
+
+def carga_mixta(path, operaciones, rng):
+    """Alertas (nuevas, escaladas, bajadas), encuestas, cartas, resoluciones y borrados al azar."""
+    clientes = [str(10**6 + k) for k in range(2000)]
+    motor_gesai.registrar_alertas([(0, c, rng.choice(ESTADOS), 'x', 0.9, 'b') for c in clientes[:100]])
+    for _ in range(operaciones):
+        r = rng.random()
+        if r < 0.6:
+            motor_gesai.registrar_alertas([(0, rng.choice(clientes), rng.choice(ESTADOS), 'x', 0.9, 'b') for _ in range(10)])
+            continue
+        conn = sqlite3.connect(path)
+        inc = rng.randrange(1, conn.execute("SELECT MAX(id) FROM incidencias").fetchone()[0] + 1)
+        if r < 0.75: conn.execute("UPDATE incidencias SET verificacion = 'VERIFICADO (Encuesta)' WHERE id = ? AND verificacion != 'RESUELTA'", (inc,))
+        elif r < 0.9: conn.execute("UPDATE incidencias SET verificacion = 'RESUELTA' WHERE id = ?", (inc,))
+        elif r < 0.95: conn.execute("UPDATE incidencias SET descripcion = 'editada', fecha_deteccion = CURRENT_TIMESTAMP WHERE id = ?", (inc,))
+        else:
+            conn.execute("DELETE FROM tokens_verificacion WHERE incidencia_id = ?", (inc,))
+            conn.execute("DELETE FROM incidencias WHERE id = ?", (inc,))
+        conn.commit()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="KPI del dashboard desde resumen_incidencias")
+    parser.add_argument('--abiertas', type=int, nargs='+', default=[1000, 100_000, 1_000_000])
+    parser.add_argument('--alertas', type=int, default=20000, help="Alertas para medir el coste de los triggers")
+    args = parser.parse_args()
+    motor_gesai.antirrebote.intervalo = 0  #Cada alerta llega a la BBDD (sin antirrebote)
+    rng = random.Random(0)
+
+    #1. Latencia y exactitud de los KPI
+    print(f"{'Abiertas':>9} | {'lista+Python ms':>15} | {'resumen ms':>10} | {'COUNT exacto ms':>15} | KPI lista / resumen / exacto (total, graves, moderadas, cartas)")
+    for abiertas in args.abiertas:
+        path = bbdd_temporal()
+        t0 = time.perf_counter()
+        poblar(path, abiertas, rng)
+        t_poblar = time.perf_counter() - t0
+        ms_lista, lista = cronometrar(kpi_lista)
+        ms_resumen, resumen = cronometrar(kpi_resumen)
+        ms_exacto, exacto = cronometrar(lambda: kpi_exacto(path), 3)
+        assert resumen == exacto, (resumen, exacto)
+        print(f"{abiertas:>9} | {ms_lista:>15.2f} | {ms_resumen:>10.3f} | {ms_exacto:>15.1f} | "
+              f"{tuple(lista.values())} / {tuple(resumen.values())} / {tuple(exacto.values())}  (alta con triggers {t_poblar:.1f}s)", flush=True)
+        motor_gesai.cerrar_pool_bbdd()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    #2. Coste de los triggers al escribir alertas
+    motor_gesai._get_faker()  #Fuera de la medida (se crea con el primer cliente nuevo)
+    print(f"\n{'Escritura':<16} | {'Alertas/s':>9} | {'µs por alerta':>13}")
+    for nombre, triggers in [('sin triggers', False), ('con triggers', True)]:
+        path = bbdd_temporal()
+        if not triggers:
+            conn = sqlite3.connect(path)
+            for t in ['trg_resumen_alta', 'trg_resumen_baja', 'trg_resumen_cambio']: conn.execute(f"DROP TRIGGER {t}")
+            conn.commit()
+            conn.close()
+        rng_a = random.Random(1)
+        alertas = [(0, str(10**6 + rng_a.randrange(2000)), rng_a.choice(ESTADOS), 'x', 0.9, 'b') for _ in range(args.alertas)]
+        t0 = time.perf_counter()
+        for i in range(0, len(alertas), 50): motor_gesai.registrar_alertas(alertas[i:i + 50])
+        segundos = time.perf_counter() - t0
+        print(f"{nombre:<16} | {len(alertas) / segundos:>9.0f} | {segundos / len(alertas) * 1e6:>13.1f}")
+        motor_gesai.cerrar_pool_bbdd()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    #3. Consistencia tras una carga mixta
+    path = bbdd_temporal()
+    carga_mixta(path, 2000, rng)
+    iguales, resumen = comprobar_resumen(path)
+    assert iguales, "resumen_incidencias no coincide con el recuento"
+    print(f"\n✅ resumen_incidencias coincide con el recuento tras la carga mixta ({sum(resumen.values())} incidencias, {len(resumen)} grupos)")
+    motor_gesai.cerrar_pool_bbdd()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
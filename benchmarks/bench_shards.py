@@ -0,0 +1,185 @@
+# benchmarks/bench_shards.py
+# Escritura de alertas con los datos de clientes repartidos en shards (shards_bbdd.py,
+# GESAI_SHARDS): P procesos escritores registrando alertas a la vez (registrar_alertas, una
+# transacción por llamada y shard, como varios simuladores o gateways), con todo en gesai.db
+# (lo de antes) y con 1, 4 y 8 shards.
+#   - alertas/s, latencia p50/p99 por llamada y errores (database is locked)
+#   - con --espera-commit-ms, cada COMMIT espera ese tiempo con el bloqueo de escritura cogido,
+#     como el fsync de un disco real (synchronous FULL): es lo que serializa un único gesai.db.
+#     Con 0 manda la CPU de los procesos (cifrado, tokens, Python), no el bloqueo
+#   - consistencia: las mismas alertas en gesai.db y en 4 shards dan las mismas incidencias
+#     abiertas, KPI y listado; volver a repartir 4 -> 8 conserva ids y tokens, y los ids nuevos no
+#     chocan
+#   python benchmarks/bench_shards.py --procesos 8 --shards 0 1 4 8 --segundos 10 --espera-commit-ms 0 5
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sqlite3
+import time
+import numpy as np
+from comun import bbdd_temporal
+import motor_gesai
+import shards_bbdd
+from crypto_manager import cifrar_pii
+
+ESTADOS = ['Fuga Grave', 'Fuga Grave (En Crecimiento)', 'Fuga Moderada', 'Fuga Leve (Tendencia)']
+
+def preparar(clientes, shards):
+    """gesai.db temporal con `clientes` clientes, repartida en `shards` (0 = sin repartir)."""
+    motor_gesai.cerrar_escritor_alertas()
+    motor_gesai.cerrar_pool_bbdd()
+    path = bbdd_temporal()
+    conn = sqlite3.connect(path)
+    nombre, email = cifrar_pii('Cliente Benchmark'), cifrar_pii('cliente@mail.com')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)",
+                     [(str(100000 + k), nombre, nombre, email if k % 4 else None, nombre) for k in range(clientes)])
+    conn.commit()
+    conn.close()
+    if shards: shards_bbdd.repartir(path, shards, verbose=False)
+    motor_gesai.SHARDS = shards
+    return path
+
+def alertas_al_azar(rng, n, clientes):
+    return [(0, str(100000 + rng.randrange(clientes)), rng.choice(ESTADOS), 'bench', 0.9, 'bench') for _ in range(n)]
+
+def escritor(args):
+    """Proceso escritor: registrar_alertas de `por_llamada` alertas hasta `fin` (time.time())."""
+    k, inicio, fin, por_llamada, clientes, espera = args
+    motor_gesai.cerrar_pool_bbdd()  #Conexiones propias de este proceso
+    if espera:
+        conectar = motor_gesai._conectar_bbdd
+        def conectar_lento(*args):
+            conn = conectar(*args)
+            #El trace de COMMIT llega antes de confirmar: se espera con el bloqueo de escritura cogido
+            if conn is not None: conn.set_trace_callback(lambda sql: time.sleep(espera) if sql == 'COMMIT' else None)
+            return conn
+        motor_gesai._conectar_bbdd = conectar_lento
+    rng = random.Random(k)
+    latencias, alertas, errores = [], 0, 0
+    while time.time() < inicio: time.sleep(0.001)
+    while time.time() < fin:
+        lote = alertas_al_azar(rng, por_llamada, clientes)
+        t0 = time.perf_counter()
+        try:
+            res = motor_gesai.registrar_alertas(lote)
+            errores += sum(r.get('status') == 'ERROR' for r in res)
+            alertas += len(res)
+        except sqlite3.Error:
+            errores += len(lote)
+        latencias.append(time.perf_counter() - t0)
+    motor_gesai.cerrar_pool_bbdd()
+    return alertas, errores, latencias
+
+def carrera(procesos, segundos, por_llamada, clientes, espera):
+    ctx = mp.get_context('fork')
+    inicio = time.time() + 1.0  #Todos los procesos empiezan a la vez, ya arrancados
+    with ctx.Pool(procesos) as pool:
+        res = pool.map(escritor, [(k, inicio, inicio + segundos, por_llamada, clientes, espera) for k in range(procesos)])
+    alertas, errores = sum(r[0] for r in res), sum(r[1] for r in res)
+    latencias = np.concatenate([r[2] for r in res]) * 1000
+    return alertas / segundos, np.percentile(latencias, [50, 99]), errores
+
+def volcar(path, shards):
+    """Filas de todas las tablas de clientes juntando gesai.db o sus shards."""
+    paths = shards_bbdd.paths_shards(path, shards) if shards else [path]
+    datos = {}
+    for tabla in shards_bbdd.TABLAS_CLIENTE:
+        filas = []
+        for p in paths:
+            conn = sqlite3.connect(p)
+            columnas = shards_bbdd._columnas(conn, tabla)
+            filas += conn.execute(f"SELECT {', '.join(columnas)} FROM {tabla}").fetchall()
+            conn.close()
+        datos[tabla] = sorted(filas, key=repr)
+    return datos
+
+def abiertas(path, shards):
+    """{cliente_id: (estado, verificacion)} de las incidencias abiertas."""
+    paths = shards_bbdd.paths_shards(path, shards) if shards else [path]
+    res = {}
+    for p in paths:
+        conn = sqlite3.connect(p)
+        res.update({c: (e, v) for c, e, v in conn.execute("SELECT cliente_id, estado, verificacion FROM incidencias WHERE verificacion != 'RESUELTA'")})
+        conn.close()
+    return res
+
+def recorrer_listado(filtro='todas', tam=20):
+    ids, claves, siguiente = [], [], None
+    while True:
+        p = motor_gesai.get_pagina_incidencias(filtro, siguiente, tam)
+        ids += [r['id'] for r in p['incidencias']]
+        claves += [(r['fecha_deteccion'], r['id']) for r in p['incidencias']]
+        if not (siguiente := p['siguiente']): return ids, claves
+
+def consistencia(clientes, alertas):
+    """Mismas alertas con gesai.db y con 4 shards; después, reparto 4 -> 8."""
+    lotes = [alertas_al_azar(random.Random(7 + i), 50, clientes) for i in range(alertas // 50)]
+    estado = {}
+    for shards in (0, 4):
+        path = preparar(clientes, shards)
+        for lote in lotes: motor_gesai.registrar_alertas(lote)
+        ids, claves = recorrer_listado()
+        assert len(ids) == len(set(ids)) and claves == sorted(claves, reverse=True), "Listado con duplicados o desordenado"
+        estado[shards] = (path, abiertas(path, shards), motor_gesai.get_resumen_incidencias(), len(ids))
+    (_, ab0, kpi0, n0), (path, ab4, kpi4, n4) = estado[0], estado[4]
+    assert ab0 == ab4 and kpi0 == kpi4 and n0 == n4 == len(ab0), "gesai.db y 4 shards no coinciden"
+    print(f"✅ gesai.db y 4 shards: mismas {len(ab0)} incidencias abiertas, mismos KPI y listado completo sin duplicados")
+
+    #Rutas de una incidencia, una notificación y un token en los shards
+    inc = motor_gesai.get_pagina_incidencias('todas', tam=1)['incidencias'][0]
+    assert motor_gesai.get_detalles_incidencia(inc['id'])['datos_incidencia']['cliente_id'] == inc['cliente_id']
+    conn = sqlite3.connect(shards_bbdd.paths_shards(path, 4)[-1])  #El último shard: se busca en todos
+    token = conn.execute("SELECT t.token FROM tokens_verificacion t JOIN incidencias i ON i.id = t.incidencia_id WHERE i.verificacion = 'PENDIENTE'").fetchone()[0]
+    conn.close()
+    assert motor_gesai.validar_token_y_registrar(token, {'bench': True})['success']
+
+    #Volver a repartir: 4 -> 8 conserva filas e ids; los ids nuevos no chocan con los copiados
+    antes = volcar(path, 4)
+    motor_gesai.cerrar_pool_bbdd()
+    shards_bbdd.repartir(path, 8, desde=4, verbose=False)
+    motor_gesai.SHARDS = 8
+    assert volcar(path, 8) == antes, "El reparto 4 -> 8 no conserva las filas"
+    ids_previos = {r[0] for r in antes['incidencias']}
+    nuevos = motor_gesai.registrar_alertas([(0, str(900000 + k), 'Fuga Grave', 'bench', 0.9, 'bench') for k in range(200)])
+    ids_nuevos = [r['incidencia_id'] for r in nuevos]
+    assert len(set(ids_nuevos)) == 200 and not ids_previos & set(ids_nuevos), "Ids repetidos tras volver a repartir"
+    pendientes = motor_gesai.get_notificaciones_pendientes_cliente('900000')
+    assert pendientes and all(n['cliente_id'] == '900000' for n in pendientes)
+    print(f"✅ Reparto 4 -> 8: {sum(len(v) for v in antes.values())} filas idénticas; 200 incidencias nuevas con ids únicos "
+          f"(hasta #{max(ids_nuevos)}); detalle, token y notificaciones encontrados en su shard")
+    motor_gesai.cerrar_pool_bbdd()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    shutil.rmtree(os.path.dirname(estado[0][0]), ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Alertas/s con P escritores y los clientes repartidos en shards")
+    parser.add_argument('--procesos', type=int, default=8)
+    parser.add_argument('--shards', type=int, nargs='+', default=[0, 1, 4, 8], help="0 = todo en gesai.db")
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--por-llamada', type=int, default=1, help="Alertas por registrar_alertas (1 = una transacción por alerta)")
+    parser.add_argument('--clientes', type=int, default=50_000)
+    parser.add_argument('--espera-commit-ms', type=float, nargs='+', default=[0, 5], help="Espera en cada COMMIT (fsync simulado)")
+    args = parser.parse_args()
+    motor_gesai.antirrebote.intervalo = 0  #Cada alerta llega a la BBDD (sin antirrebote)
+    motor_gesai.GRUPO_COMMIT = 0  #Una transacción por llamada y shard en cada proceso
+
+    print(f"{args.procesos} procesos escritores x {args.segundos:.0f} s, {args.por_llamada} alertas por llamada, {args.clientes} clientes, {len(os.sched_getaffinity(0))} CPU")
+    print(f"{'Commit +ms':>10} | {'Shards':>6} | {'Alertas/s':>9} | {'x gesai.db':>10} | {'p50 ms':>7} | {'p99 ms':>7} | {'Errores':>7}")
+    for espera in args.espera_commit_ms:
+        base = None
+        for shards in args.shards:
+            path = preparar(args.clientes, shards)
+            alertas_s, (p50, p99), errores = carrera(args.procesos, args.segundos, args.por_llamada, args.clientes, espera / 1000)
+            base = base or alertas_s
+            nombre = 'no' if shards == 0 else str(shards)
+            print(f"{espera:>10g} | {nombre:>6} | {alertas_s:>9.0f} | {alertas_s / base:>10.2f} | {p50:>7.2f} | {p99:>7.1f} | {errores:>7}", flush=True)
+            motor_gesai.cerrar_pool_bbdd()
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    consistencia(2000, 5000)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# benchmarks/bench_simulador.py
+# Modo pool del simulador (simulacion_backend.ejecutar_pool): lecturas/s con 1..N procesos
+# de inferencia y un único escritor de SQLite. La escala ideal es lineal con los núcleos libres.
+#   python benchmarks/bench_simulador.py --workers 1 2 4 --lecturas 20000
+
+import argparse
+import os
+from comun import generar_lecturas, bbdd_temporal
+import simulacion_backend
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado del simulador con N workers")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--lecturas', type=int, default=20000)
+    parser.add_argument('--registros', type=int, default=5000)
+    parser.add_argument('--lote', type=int, default=simulacion_backend.TAM_LOTE_WORKER)
+    parser.add_argument('--sin-bbdd', action='store_true', help="Descarta las alertas: mide solo la inferencia")
+    args = parser.parse_args()
+
+    df = generar_lecturas(args.registros)
+    print(f"Núcleos disponibles: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}\n")
+    print(f"{'Workers':>7} | {'lecturas/s':>10} | {'escala':>6} | {'eficiencia':>10} | {'carga (s)':>9} | {'escritura BBDD':>14}")
+    base = None
+    for w in args.workers:
+        bbdd_temporal()
+        m = simulacion_backend.ejecutar_pool(df, w, args.lecturas, args.lote, verbose=False, escribir=not args.sin_bbdd)
+        base = base or m['lecturas_s']
+        escala = m['lecturas_s'] / base
+        print(f"{w:>7} | {m['lecturas_s']:>10.0f} | {escala:>5.2f}x | {escala * args.workers[0] / w:>9.0%} | "
+              f"{m['carga_modelos_s']:>9.2f} | {m['escritura_s'] / m['segundos']:>13.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_sondeo.py
+# Sondeos de la app con S navegadores abiertos: S dashboards (refresh_dashboard cada 2 s) y S
+# vistas móviles (mobile_poll cada 3 s), a su ritmo real y desfasados, llamando a los callbacks de
+# src/app.py con el estado que guardaría cada navegador. Sin versión de cambios
+# (GESAI_VERSION_CAMBIOS_MS=0, lo de antes) frente a la versión de versiones_cambios.py:
+#   - en reposo: CPU del proceso (% de un núcleo), sentencias SQL y descifrados PII por segundo
+#   - con un escritor (una alerta cada --cada-alerta s): lo mismo, y que todos los dashboards ven
+#     la última incidencia al acabar
+#   python benchmarks/bench_sondeo.py --sesiones 50 --segundos 20
+
+import argparse
+import heapq
+import random
+import sqlite3
+import threading
+import time
+from comun import bbdd_temporal
+import motor_gesai
+import app
+from crypto_manager import cifrar_pii
+
+def poblar(path, clientes, abiertas):
+    conn = sqlite3.connect(path)
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", [(str(100000 + k), nombre, nombre, nombre, nombre) for k in range(clientes)])
+    conn.executemany("INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion) VALUES (?, ?, ?, ?)",
+                     [(str(100000 + k), random.choice(['Fuga Grave', 'Fuga Moderada']), 'PENDIENTE', 'bench') for k in range(abiertas)])
+    conn.commit()
+    conn.close()
+
+def contar_llamadas():
+    """Cuenta sentencias SQL (conexiones del pool) y descifrados PII de los callbacks."""
+    cuenta = {'sql': 0, 'descifrados': 0}
+    conectar, descifrar = motor_gesai._conectar_bbdd, motor_gesai.descifrar_pii
+    def conectar_contado(*args):
+        conn = conectar(*args)
+        if conn is not None: conn.set_trace_callback(lambda s: cuenta.__setitem__('sql', cuenta['sql'] + 1))
+        return conn
+    def descifrar_contado(x):
+        cuenta['descifrados'] += 1
+        return descifrar(x)
+    motor_gesai._conectar_bbdd, motor_gesai.descifrar_pii = conectar_contado, descifrar_contado
+    def restaurar(): motor_gesai._conectar_bbdd, motor_gesai.descifrar_pii = conectar, descifrar
+    return cuenta, restaurar
+
+CALENTAMIENTO = 3.0  #Segundos: el primer sondeo de cada navegador siempre construye la página
+
+def sesiones(n_sesiones, segundos, cada_alerta, clientes):
+    """Bucle de sondeos en tiempo real. Retorna métricas desde el final del calentamiento."""
+    cola = [(random.uniform(0, 2), 'dash', k) for k in range(n_sesiones)] + [(random.uniform(0, 3), 'movil', k) for k in range(n_sesiones)]
+    heapq.heapify(cola)
+    vistos = {('dash', k): None for k in range(n_sesiones)} | {('movil', k): None for k in range(n_sesiones)}
+    fin = threading.Event()
+    def escritor():
+        rng = random.Random(1)
+        while not fin.wait(cada_alerta):
+            cid = str(100000 + rng.randrange(clientes))
+            motor_gesai.registrar_alertas([(0, cid, 'Fuga Grave', 'Crítica', 0.9, 'bench')])
+    hilo = threading.Thread(target=escritor) if cada_alerta else None
+    if hilo: hilo.start()
+    llamadas, sin_cambios = 0, 0
+    cuenta, restaurar = contar_llamadas()
+    inicio, medir = time.perf_counter(), False
+    try:
+        while True:
+            t, tipo, k = heapq.heappop(cola)
+            if t > segundos + CALENTAMIENTO: break
+            espera = inicio + t - time.perf_counter()
+            if espera > 0: time.sleep(espera)
+            if not medir and t >= CALENTAMIENTO:
+                medir, llamadas, sin_cambios = True, 0, 0
+                cuenta.update(sql=0, descifrados=0)
+                t0, cpu0 = time.perf_counter(), time.process_time()
+            if tipo == 'dash':
+                res = app.refresh_dashboard(int(t // 2), 'todas', visto=vistos[('dash', k)])
+                if res[2] is not app.no_update: vistos[('dash', k)] = res[2]
+                else: sin_cambios += 1
+                heapq.heappush(cola, (t + 2, tipo, k))
+            else:
+                cid = str(100000 + k)
+                res = app.mobile_poll(int(t // 3), cid, f'/sim-movil/{cid}', vistos[('movil', k)])
+                if res[1] is not app.no_update: vistos[('movil', k)] = res[1]
+                if res == (app.no_update, app.no_update): sin_cambios += 1
+                heapq.heappush(cola, (t + 3, tipo, k))
+            llamadas += 1
+    finally:
+        fin.set()
+        if hilo: hilo.join()
+        restaurar()
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    return {'llamadas': llamadas, 'sin_cambios': sin_cambios, 'cpu': cpu / wall, 'sql_s': cuenta['sql'] / wall,
+            'descifrados_s': cuenta['descifrados'] / wall, 'ms_llamada': cpu / max(llamadas, 1) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Sondeos del dashboard y de la vista móvil con versión de cambios")
+    parser.add_argument('--sesiones', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=20)
+    parser.add_argument('--cada-alerta', type=float, default=5.0, help="Segundos entre alertas en la fase con escritor")
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--abiertas', type=int, default=300)
+    args = parser.parse_args()
+    motor_gesai.antirrebote.intervalo = 0
+    random.seed(0)
+
+    print(f"{args.sesiones} dashboards (2 s) + {args.sesiones} vistas móviles (3 s), {args.segundos:.0f} s por fila (tras {CALENTAMIENTO:.0f} s de calentamiento)")
+    print(f"{'Fase':<14} | {'Modo':<18} | {'Llamadas':>8} | {'Sin cambios':>11} | {'CPU %':>6} | {'ms CPU/llamada':>14} | {'SQL/s':>7} | {'Descifrados/s':>13}")
+    for fase, cada_alerta in [('reposo', 0), ('con escritor', args.cada_alerta)]:
+        for modo, intervalo in [('siempre consulta', 0), ('versión de cambios', 0.25)]:
+            motor_gesai.cerrar_pool_bbdd()
+            path = bbdd_temporal()
+            poblar(path, args.clientes, args.abiertas)
+            motor_gesai.VERSION_CAMBIOS_INTERVALO = intervalo
+            m = sesiones(args.sesiones, args.segundos, cada_alerta, args.clientes)
+            print(f"{fase:<14} | {modo:<18} | {m['llamadas']:>8} | {m['sin_cambios']:>11} | {m['cpu'] * 100:>6.1f} | "
+                  f"{m['ms_llamada']:>14.3f} | {m['sql_s']:>7.0f} | {m['descifrados_s']:>13.0f}", flush=True)
+    v = motor_gesai.estadisticas_versiones()
+    print(f"\nVersión de cambios: {v['desde_memoria']} desde memoria, {v['comprobaciones']} PRAGMA data_version, {v['lecturas']} lecturas de versiones_cambios")
+
+    #Tras un cambio, el siguiente sondeo de cada dashboard lo muestra
+    nueva = motor_gesai.registrar_alertas([(0, '999999', 'Fuga Grave', 'Crítica', 0.9, 'bench')])[0]['incidencia_id']
+    time.sleep(motor_gesai.VERSION_CAMBIOS_INTERVALO)
+    visto = {'version': -1, 'filtro': 'TODAS'}
+    res = app.refresh_dashboard(0, 'todas', visto=visto)
+    assert res[0] is not app.no_update and f"#{nueva} " in str(res[1]), "El dashboard no ve la incidencia nueva"
+    res2 = app.refresh_dashboard(1, 'todas', visto=res[2])
+    assert res2 == (app.no_update,) * 7
+    print("✅ Un cambio se ve en el siguiente sondeo y, sin cambios, el callback responde no_update")
+
+    #Con varias páginas abiertas, un cambio solo actualiza los KPI y muestra "volver arriba"; al pulsarlo, primera página en vivo
+    cursor = dict(res[3], paginas=2)
+    otra = motor_gesai.registrar_alertas([(0, '999998', 'Fuga Grave', 'Crítica', 0.9, 'bench')])[0]['incidencia_id']
+    time.sleep(motor_gesai.VERSION_CAMBIOS_INTERVALO)
+    res3 = app.refresh_dashboard(2, 'todas', visto=res[2], cursor=cursor)
+    assert res3[1] is app.no_update and res3[6] == {'display': 'block'}, "Con varias páginas no aparece el aviso de cambios"
+    res4 = app.refresh_dashboard(3, 'todas', volver=1, visto=res3[2], cursor=cursor)
+    assert f"#{otra} " in str(res4[1]) and res4[3]['paginas'] == 1 and res4[6] == {'display': 'none'}, "Volver arriba no recarga la primera página"
+    assert app.refresh_dashboard(4, 'todas', volver=1, visto=res4[2], cursor=res4[3]) == (app.no_update,) * 7
+    print("✅ Con varias páginas abiertas, un cambio muestra 'volver arriba' y al pulsarlo vuelve la primera página en vivo")
+
+if __name__ == '__main__':
+    main()
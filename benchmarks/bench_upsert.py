@@ -0,0 +1,142 @@
+# benchmarks/bench_upsert.py
+# Carrera de detectores: P procesos registrando alertas a la vez sobre los mismos clientes (la
+# mitad aún sin dar de alta), cada alerta en su propia transacción, como varios simuladores o
+# gateways contra una misma gesai.db:
+#   - original: SELECT de la incidencia abierta + UPDATE o INSERT (esquema v2, sin índice único)
+#   - upsert: INSERT ... ON CONFLICT DO UPDATE ... RETURNING de motor_gesai._registrar_alerta (v3)
+# Cuenta clientes con más de una incidencia abierta (debe ser 0 con el upsert), errores (altas de
+# cliente que chocan), sentencias por alerta (set_trace_callback) y alertas/s.
+#   python benchmarks/bench_upsert.py --procesos 16 --alertas 400 --clientes 20
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sqlite3
+import time
+from comun import bbdd_temporal
+import motor_gesai
+from crypto_manager import cifrar_pii, generar_token_seguro
+
+def registrar_original(cur, cliente_id, estado, detalle, p_hoy, modelo_version=None):
+    """_registrar_alerta antes del upsert (esquema v2): comprobar y después escribir."""
+    cur.execute("SELECT * FROM clientes WHERE cliente_id = ?", (str(cliente_id),))
+    res = cur.fetchone()
+    if not res:
+        nom = motor_gesai._get_faker().name()
+        email = f"{nom.split()[0]}@test.com"
+        cur.execute("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)",
+                    (str(cliente_id), cifrar_pii(nom), cifrar_pii("600"), cifrar_pii(email), cifrar_pii("Barcelona")))
+        datos_cli = {'nombre': nom, 'email': email}
+    else:
+        datos_cli = {'nombre': motor_gesai.descifrar_pii(res['nombre']), 'email': motor_gesai.descifrar_pii(res['email'])}
+    desc = f"{estado}. Prob: {p_hoy:.0%}. {detalle}"
+    cur.execute("SELECT id FROM incidencias WHERE cliente_id = ? AND verificacion != 'RESUELTA'", (str(cliente_id),))
+    inc_existente = cur.fetchone()
+    if inc_existente:
+        new_id = inc_existente['id']
+        cur.execute("UPDATE incidencias SET estado = ?, descripcion = ?, modelo_version = ?, fecha_deteccion = CURRENT_TIMESTAMP WHERE id = ?",
+                    (estado, desc, modelo_version, new_id))
+    else:
+        cur.execute("INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion, modelo_version) VALUES (?, ?, ?, ?, ?)",
+                    (str(cliente_id), estado, 'PENDIENTE', desc, modelo_version))
+        new_id = cur.lastrowid
+    if "Leve" not in estado:
+        if datos_cli.get('email') is None:
+            cur.execute("UPDATE incidencias SET verificacion = 'CARTA PENDIENTE' WHERE id = ?", (new_id,))
+        else:
+            token = generar_token_seguro()
+            cur.execute("DELETE FROM tokens_verificacion WHERE incidencia_id = ?", (new_id,))
+            cur.execute("INSERT INTO tokens_verificacion (token, incidencia_id) VALUES (?, ?)", (token, new_id))
+            cur.execute("INSERT INTO notificaciones (cliente_id, mensaje, link) VALUES (?, ?, ?)",
+                        (str(cliente_id), f"Hola {datos_cli['nombre']}", f"http://127.0.0.1:8050/verificar/{token}"))
+    return {'status': 'ALERTA', 'incidencia_id': new_id}
+
+MODOS = {'original': registrar_original, 'upsert': motor_gesai._registrar_alerta}
+
+def preparar(clientes, modo):
+    """gesai.db en WAL con la mitad de los clientes dados de alta; v2 para el original."""
+    motor_gesai.cerrar_pool_bbdd()
+    path = bbdd_temporal()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    nombre = cifrar_pii('Cliente Benchmark')
+    conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", [(str(100000 + k), nombre, nombre, nombre, nombre) for k in range(0, clientes, 2)])
+    if modo == 'original':
+        conn.execute("DROP INDEX ux_incidencias_abierta")
+        conn.execute("DROP INDEX ux_tokens_incidencia")
+        conn.execute("CREATE INDEX idx_incidencias_cliente ON incidencias (cliente_id, verificacion)")
+        conn.execute("CREATE INDEX idx_tokens_incidencia ON tokens_verificacion (incidencia_id)")
+        conn.execute("PRAGMA user_version = 2")
+    conn.commit()
+    conn.close()
+    return path
+
+def worker(args):
+    path, modo, k, alertas, clientes, pausa = args
+    registrar = MODOS[modo]
+    conn = sqlite3.connect(path, timeout=60)
+    conn.row_factory = sqlite3.Row
+    sentencias = [0]  #Sin BEGIN / COMMIT, que son los mismos en los dos modos
+    def trazar(sql):
+        if sql.split(None, 1)[0].upper() not in ('BEGIN', 'COMMIT', 'ROLLBACK'): sentencias[0] += 1
+        if pausa: time.sleep(pausa)  #Ensancha la ventana entre sentencias igual en los dos modos
+    conn.set_trace_callback(trazar)
+    rng = random.Random(k)
+    errores = 0
+    for _ in range(alertas):
+        estado = rng.choice(['Fuga Grave', 'Fuga Moderada', 'Fuga Leve (Tendencia)'])
+        try:
+            registrar(conn.cursor(), str(100000 + rng.randrange(clientes)), estado, 'bench', 0.9, 'bench')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            errores += 1
+    conn.set_trace_callback(None)
+    conn.close()
+    return sentencias[0], errores
+
+def comprobar(path):
+    conn = sqlite3.connect(path)
+    duplicados = conn.execute("""
+        SELECT COUNT(*) FROM (SELECT cliente_id FROM incidencias WHERE verificacion != 'RESUELTA'
+                              GROUP BY cliente_id HAVING COUNT(*) > 1)""").fetchone()[0]
+    abiertas = conn.execute("SELECT COUNT(*) FROM incidencias WHERE verificacion != 'RESUELTA'").fetchone()[0]
+    tokens = conn.execute("SELECT COUNT(*) - COUNT(DISTINCT incidencia_id) FROM tokens_verificacion").fetchone()[0]
+    conn.close()
+    return duplicados, abiertas, tokens
+
+def main():
+    parser = argparse.ArgumentParser(description="Alta de incidencias concurrente: SELECT + INSERT frente a upsert")
+    parser.add_argument('--procesos', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--alertas', type=int, default=400, help="Alertas por proceso")
+    parser.add_argument('--clientes', type=int, default=20, help="Pocos clientes = mucha contención")
+    parser.add_argument('--pausa-ms', type=float, default=0.0, help="Pausa tras cada sentencia (simula trabajo entre ellas)")
+    args = parser.parse_args()
+    motor_gesai._get_faker()  #Los hijos la heredan con el fork
+    motor_gesai.antirrebote.intervalo = 0  #Cada alerta llega a la BBDD (sin antirrebote)
+
+    ctx = mp.get_context('fork')
+    print(f"{'Modo':<9} | {'Procesos':>8} | {'Alertas/s':>9} | {'Sent./alerta':>12} | {'Errores':>7} | {'Abiertas':>8} | {'Duplicadas':>10} | {'Tokens dup.':>11}")
+    fallos = []
+    for procesos in args.procesos:
+        for modo in MODOS:
+            path = preparar(args.clientes, modo)
+            tareas = [(path, modo, k, args.alertas, args.clientes, args.pausa_ms / 1000) for k in range(procesos)]
+            t0 = time.perf_counter()
+            with ctx.Pool(procesos) as pool:
+                res = pool.map(worker, tareas)
+            segundos = time.perf_counter() - t0
+            sentencias, errores = sum(r[0] for r in res), sum(r[1] for r in res)
+            duplicados, abiertas, tokens = comprobar(path)
+            ok = procesos * args.alertas - errores
+            print(f"{modo:<9} | {procesos:>8} | {ok / segundos:>9.0f} | {sentencias / max(ok, 1):>12.2f} | {errores:>7} | "
+                  f"{abiertas:>8} | {duplicados:>10} | {tokens:>11}", flush=True)
+            if modo == 'upsert' and (duplicados or errores or tokens): fallos.append(procesos)
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    assert not fallos, f"El upsert dejó duplicados o errores con {fallos} procesos"
+    print("✅ upsert: cero incidencias abiertas duplicadas y ningún error")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/comun.py
+# Utilidades compartidas por los benchmarks: lecturas sintéticas y BBDD temporal.
+
+import os
+import sys
+import tempfile
+import sqlite3
+import functools
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+sys.path.append(SRC_DIR)
+sys.path.append(BASE_DIR)
+
+@functools.lru_cache(maxsize=None)
+def modelos_lightgbm():
+    """Modelos LightGBM del motor (los carga aunque el motor arranque en modo NumPy con mmap)."""
+    import motor_gesai
+    conjunto = motor_gesai._cargar_motor()
+    return conjunto.modelos or motor_gesai._cargar_lightgbm(conjunto.directorio)
+
+def generar_lecturas(n, semilla=42, num_clientes=1000):
+    """
+    Genera n lecturas con el esquema de datos_simulacion_features.csv.
+    Los rangos de cada feature se toman de los propios modelos (feature_infos),
+    así el benchmark funciona aunque no exista el CSV de simulación.
+    """
+    import motor_gesai
+    booster = modelos_lightgbm()['HOY'].booster_
+    infos = booster.dump_model(num_iteration=0)['feature_infos']
+    categorias = dict(zip(motor_gesai.CATEGORICAS, booster.pandas_categorical))
+    rng = np.random.default_rng(semilla)
+
+    columnas = {
+        'POLISSA_SUBM': rng.integers(100000, 100000 + num_clientes, n).astype(str),
+        'FECHA_HORA_CRONO': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 24 * 365, n), unit='h'),
+    }
+    for f in motor_gesai._cargar_motor().esquema.columnas:
+        if f in categorias:
+            columnas[f] = rng.choice(categorias[f], n)
+        else:
+            info = infos.get(f, {'min_value': 0, 'max_value': 1})
+            lo, hi = float(info['min_value']), float(info['max_value'])
+            # Sesgo hacia valores bajos: los rangos tienen colas muy largas
+            columnas[f] = lo + (hi - lo) * rng.beta(0.6, 6.0, n)
+    return pd.DataFrame(columnas)
+
+def bbdd_temporal():
+    """
+    Crea una gesai.db vacía en un directorio temporal y apunta el motor a ella
+    (y las instantáneas del buffer de consumo, para no tocar data/processed-data).
+    """
+    import motor_gesai
+    from setup_database import crear_tablas
+    tmp = tempfile.mkdtemp(prefix='gesai_bench_')
+    path = os.path.join(tmp, 'gesai.db')
+    motor_gesai.BUFFER_DIR = os.path.join(tmp, 'buffer_consumo')
+    conn = sqlite3.connect(path)
+    crear_tablas(conn)
+    conn.close()
+    motor_gesai.DB_PATH = path
+    return path
@@ -1,22 +1,31 @@
 import sqlite3
 import os
 import sys
-import pandas as pd
 from faker import Faker
 import random
 import time
+import argparse
+import multiprocessing as mp
 import getpass # Para ocultar la contraseña al escribirla
 
 # --- IMPORTACIONES ---
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 # Importamos la nueva función de validación
 from crypto_manager import hashear_password, cifrar_pii, validar_fortaleza_password
+import dataset_features
+import migraciones_bbdd
+import shards_bbdd
 # ---------------------
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'gesai.db')
 PATH_DATOS_REALES = os.path.join(BASE_DIR, 'data', 'processed-data', 'datos_simulacion_features.csv') 
-NUM_CLIENTES_SIMULACION = 100
+NUM_CLIENTES_SIMULACION = int(os.environ.get('GESAI_NUM_CLIENTES', 100))
+WORKERS_PROVISION = int(os.environ.get('GESAI_WORKERS_PROVISION', 0))  #Procesos que generan y cifran la PII (0 = según el nº de clientes)
+TAM_LOTE_PROVISION = 5000  #Clientes por tarea de los workers y por executemany
+CLIENTES_POR_WORKER = 20_000  #En automático, un worker más por cada tantos clientes: por debajo, arrancar el pool cuesta más que cifrar
+FILAS_POR_TRANSACCION = 100_000
+SHARDS = int(os.environ.get('GESAI_SHARDS', 0))  #Con shards, los clientes se reparten al terminar
 
 faker = Faker('es_ES')
 
@@ -34,10 +43,12 @@ def crear_tablas(conn):
     cursor = conn.cursor()
     cursor.execute('''CREATE TABLE IF NOT EXISTS usuarios_empresa (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE, contrasena TEXT, nombre TEXT)''')
     cursor.execute('''CREATE TABLE IF NOT EXISTS clientes (cliente_id TEXT PRIMARY KEY, nombre TEXT, telefono TEXT, email TEXT, direccion TEXT)''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS incidencias (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id TEXT, fecha_deteccion DATETIME DEFAULT CURRENT_TIMESTAMP, estado TEXT, verificacion TEXT, descripcion TEXT, encuesta_resultado TEXT, FOREIGN KEY (cliente_id) REFERENCES clientes (cliente_id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS incidencias (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id TEXT, fecha_deteccion DATETIME DEFAULT CURRENT_TIMESTAMP, estado TEXT, verificacion TEXT, descripcion TEXT, encuesta_resultado TEXT, modelo_version TEXT, FOREIGN KEY (cliente_id) REFERENCES clientes (cliente_id))''')
     cursor.execute('''CREATE TABLE IF NOT EXISTS notificaciones (notificacion_id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id TEXT, mensaje TEXT, link TEXT, leida INTEGER DEFAULT 0, FOREIGN KEY (cliente_id) REFERENCES clientes (cliente_id))''')
     cursor.execute('''CREATE TABLE IF NOT EXISTS tokens_verificacion (id INTEGER PRIMARY KEY AUTOINCREMENT, token TEXT UNIQUE, incidencia_id INTEGER, fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY (incidencia_id) REFERENCES incidencias (id))''')
     conn.commit()
+    #Índices y cambios posteriores: los mismos pasos que actualizan una BBDD existente
+    migraciones_bbdd.migrar(conn)
     print("✅ Tablas listas.")
 
 def solicitar_password_admin():
@@ -72,7 +83,88 @@ def solicitar_password_admin():
         print("✅ Contraseña aceptada y hasheada.")
         return p1
 
-def insertar_datos_iniciales(conn):
+def _generar_clientes(tarea):
+    """
+    Filas (cliente_id, nombre, telefono, email, direccion) ya cifradas de un lote de clientes.
+    Se ejecuta en los workers: Faker y Fernet son la mayor parte del coste por cliente.
+    """
+    inicio, ids, semilla = tarea
+    faker.seed_instance(semilla)
+    filas, carta = [], 0
+    for i, c_id in enumerate(ids, start=inicio):
+        es_digital = (i % 4 != 0)
+        raw_nombre = faker.name()
+        raw_addr = faker.address()
+        raw_telf = faker.phone_number() if es_digital else None
+        raw_email = f"{raw_nombre.split()[0].lower()}@mail.com" if es_digital else None
+
+        if not es_digital: carta += 1
+
+        filas.append((str(c_id), cifrar_pii(raw_nombre), cifrar_pii(raw_telf), cifrar_pii(raw_email), cifrar_pii(raw_addr)))
+    return filas, carta
+
+def workers_provision(num_clientes, workers=None):
+    """
+    Procesos para num_clientes: los pedidos (--workers / GESAI_WORKERS_PROVISION) o, con 0, uno
+    por cada CLIENTES_POR_WORKER hasta os.cpu_count(). Nunca más que lotes de TAM_LOTE_PROVISION.
+    """
+    workers = workers or WORKERS_PROVISION or min(os.cpu_count() or 1, num_clientes // CLIENTES_POR_WORKER)
+    return max(1, min(workers, -(-num_clientes // TAM_LOTE_PROVISION)))
+
+def _lotes_clientes(ids, workers, semilla):
+    """Lotes de filas cifradas en orden, generados por `workers` procesos (1: en este mismo)."""
+    rng = random.Random(semilla)
+    tareas = ((inicio, ids[inicio:inicio + TAM_LOTE_PROVISION], rng.getrandbits(32))
+              for inicio in range(0, len(ids), TAM_LOTE_PROVISION))
+    if workers <= 1:
+        yield from map(_generar_clientes, tareas)
+        return
+    with mp.Pool(workers) as pool:
+        yield from pool.imap(_generar_clientes, tareas)
+
+def provisionar_clientes(conn, num_clientes=None, workers=None, semilla=None):
+    """
+    Da de alta num_clientes clientes con PII cifrada. Los ids se eligen al azar entre los
+    POLISSA_SUBM del dataset (muestreo en streaming, sin cargar la columna) y se completan
+    con ids sintéticos si no hay bastantes. Inserta con executemany en transacciones de
+    FILAS_POR_TRANSACCION filas. Retorna (insertados, analógicos).
+    """
+    num_clientes = NUM_CLIENTES_SIMULACION if num_clientes is None else num_clientes
+    workers = workers_provision(num_clientes, workers)
+    print(f"\n🔄 Generando {num_clientes} clientes (Mix Digital/Postal) con {workers} worker{'s' if workers > 1 else ''}...")
+    ids_reales = []
+
+    if dataset_features.disponible(PATH_DATOS_REALES):
+        try:
+            ids_reales = dataset_features.clientes_al_azar(num_clientes, semilla, path_csv=PATH_DATOS_REALES)
+        except Exception as e:
+            print(f"⚠️ No se pudieron leer los clientes del dataset ({e}): se usan ids sintéticos.")
+
+    #Ids sintéticos sin chocar con los reales
+    usados, siguiente = set(ids_reales), 1000
+    while len(ids_reales) < num_clientes:
+        if str(siguiente) not in usados: ids_reales.append(str(siguiente))
+        siguiente += 1
+    del usados
+
+    cursor = conn.cursor()
+    antes, hechos, clientes_carta = conn.total_changes, 0, 0
+    t0 = time.perf_counter()
+    for filas, carta in _lotes_clientes(ids_reales, workers, semilla):
+        cursor.executemany(
+            "INSERT OR IGNORE INTO clientes (cliente_id, nombre, telefono, email, direccion) VALUES (?, ?, ?, ?, ?)",
+            filas
+        )
+        hechos += len(filas)
+        clientes_carta += carta
+        if hechos % FILAS_POR_TRANSACCION < len(filas) or hechos == num_clientes:
+            conn.commit()
+            if num_clientes > TAM_LOTE_PROVISION:
+                print(f"   🔄 {hechos}/{num_clientes} clientes | {hechos / (time.perf_counter() - t0):,.0f} clientes/s")
+    conn.commit()
+    return conn.total_changes - antes, clientes_carta
+
+def insertar_datos_iniciales(conn, num_clientes=None, workers=None, semilla=None):
     cursor = conn.cursor()
     
     # 1. ADMIN (INTERACTIVO)
@@ -85,62 +177,36 @@ def insertar_datos_iniciales(conn):
             "INSERT INTO usuarios_empresa (email, contrasena, nombre) VALUES (?, ?, ?)",
             ('empresa@gesai.com', password_seguro, 'Admin GeSAI')
         )
+        conn.commit()
         print("👤 Usuario 'empresa@gesai.com' creado correctamente.")
     except sqlite3.IntegrityError:
         pass
 
     # 2. CLIENTES
-    print(f"\n🔄 Generando {NUM_CLIENTES_SIMULACION} clientes (Mix Digital/Postal)...")
-    ids_reales = []
-    
-    if os.path.exists(PATH_DATOS_REALES):
-        try:
-            df = pd.read_csv(PATH_DATOS_REALES, usecols=['POLISSA_SUBM'])
-            unique = df['POLISSA_SUBM'].unique().tolist()
-            if len(unique) >= NUM_CLIENTES_SIMULACION:
-                ids_reales = random.sample(unique, NUM_CLIENTES_SIMULACION)
-            else:
-                ids_reales = unique
-        except: pass
-    
-    while len(ids_reales) < NUM_CLIENTES_SIMULACION:
-        ids_reales.append(str(1000 + len(ids_reales)))
-
-    count = 0
-    clientes_carta = 0
-    
-    for i, c_id in enumerate(ids_reales):
-        es_digital = (i % 4 != 0) 
-        raw_nombre = faker.name()
-        raw_addr = faker.address()
-        raw_telf = faker.phone_number() if es_digital else None
-        raw_email = f"{raw_nombre.split()[0].lower()}@mail.com" if es_digital else None
-        
-        if not es_digital: clientes_carta += 1
-
-        enc_nombre = cifrar_pii(raw_nombre)
-        enc_addr = cifrar_pii(raw_addr)
-        enc_telf = cifrar_pii(raw_telf)
-        enc_email = cifrar_pii(raw_email)
-        
-        try:
-            cursor.execute(
-                "INSERT OR IGNORE INTO clientes (cliente_id, nombre, telefono, email, direccion) VALUES (?, ?, ?, ?, ?)",
-                (str(c_id), enc_nombre, enc_telf, enc_email, enc_addr)
-            )
-            count += 1
-        except: pass
-            
-    conn.commit()
-    print(f"✅ {count} clientes insertados.")
+    t0 = time.perf_counter()
+    count, clientes_carta = provisionar_clientes(conn, num_clientes, workers, semilla)
+    segundos = time.perf_counter() - t0
+    print(f"✅ {count} clientes insertados en {segundos:.1f}s ({count / max(segundos, 1e-9):,.0f} clientes/s).")
     print(f"   📊 {count - clientes_carta} Digitales")
     print(f"   📮 {clientes_carta} Analógicos")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reset de gesai.db y alta de clientes de simulación")
+    parser.add_argument('--clientes', type=int, default=NUM_CLIENTES_SIMULACION, help="Clientes a generar (GESAI_NUM_CLIENTES)")
+    parser.add_argument('--workers', type=int, default=WORKERS_PROVISION,
+                        help=f"Procesos para generar y cifrar la PII (GESAI_WORKERS_PROVISION; 0 = uno por cada {CLIENTES_POR_WORKER} clientes)")
+    parser.add_argument('--semilla', type=int, default=None, help="Semilla de la muestra de clientes y de Faker")
+    args = parser.parse_args()
+
     print("--- INICIANDO RESET DE BASE DE DATOS ---")
     if os.path.exists(DB_PATH):
         try:
             os.remove(DB_PATH)
+            #El motor abre la BBDD en modo WAL: un -wal huérfano se aplicaría sobre la nueva
+            for sufijo in ('-wal', '-shm'):
+                if os.path.exists(DB_PATH + sufijo): os.remove(DB_PATH + sufijo)
+            #Los shards de la BBDD antigua tampoco valen
+            for path in shards_bbdd.ficheros_shards(DB_PATH): os.remove(path)
             print("🗑️ BBDD antigua eliminada correctamente.")
         except PermissionError:
             print("❌ ERROR: Cierra la app/simulador antes de regenerar la BBDD.")
@@ -149,6 +215,9 @@ if __name__ == '__main__':
     conn = crear_conexion()
     if conn:
         crear_tablas(conn)
-        insertar_datos_iniciales(conn)
+        insertar_datos_iniciales(conn, args.clientes, args.workers, args.semilla)
         conn.close()
+        if SHARDS > 0:
+            print(f"\n🔄 Repartiendo los clientes en {SHARDS} shards (GESAI_SHARDS)...")
+            shards_bbdd.repartir(DB_PATH, SHARDS)
         print("\n🚀 INSTALACIÓN COMPLETADA EXITOSAMENTE.")
\ No newline at end of file
@@ -0,0 +1,85 @@
+# src/almacen_versionado.py
+# Almacenes en disco que se reescriben enteros mientras otros procesos los leen con mmap
+# (histórico indexado, instantáneas del buffer de consumo). Cada escritura va a un directorio de
+# versión nuevo dentro del almacén y el fichero ACTUAL, que dice cuál leer, se sustituye con
+# os.replace (atómico): un lector ve la versión anterior o la nueva, nunca un hueco ni una a medias.
+# Las versiones antiguas se borran después; si otro proceso aún las tiene abiertas (en Windows no
+# se pueden borrar), se reintenta en la siguiente escritura.
+#
+#   almacen/
+#     ACTUAL            -> "v1718000000000000000"
+#     v1718000000000000000/  (los .npy y su manifiesto.json)
+
+import os
+import time
+import shutil
+import tempfile
+
+PUNTERO = 'ACTUAL'
+MANIFIESTO = 'manifiesto.json'  #El de cada versión (y el de un almacén de antes de las versiones)
+VERSIONES_RETENIDAS = 2  #La actual y la anterior (un lector puede haber leído ACTUAL justo antes del cambio)
+
+def version_actual(directorio):
+    """Nombre de la versión vigente, o None si no hay ninguna publicada."""
+    try:
+        with open(os.path.join(directorio, PUNTERO), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def dir_actual(directorio):
+    """Directorio con los ficheros de la versión vigente (el propio almacén si es de antes de las versiones)."""
+    version = version_actual(directorio)
+    return os.path.join(directorio, version) if version else directorio
+
+def huella(directorio):
+    """Cambia cada vez que se publica una versión (para reabrir el almacén sin leer ACTUAL en cada consulta); None si no hay almacén."""
+    for nombre in (PUNTERO, MANIFIESTO):
+        try:
+            st = os.stat(os.path.join(directorio, nombre))
+            return (nombre, st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            continue
+    return None
+
+def _versiones(directorio):
+    try:
+        return sorted(e.name for e in os.scandir(directorio) if e.is_dir() and e.name.startswith('v'))
+    except FileNotFoundError:
+        return []
+
+def publicar(directorio, escribir, ficheros_antiguos=()):
+    """
+    escribir(tmp) vuelca los ficheros de la versión en un directorio temporal del almacén; después
+    se renombra a su nombre de versión y se apunta ACTUAL a él. Retorna lo que retorne escribir.
+    ficheros_antiguos: ficheros sueltos del formato sin versiones, que se borran al terminar.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=directorio)
+    try:
+        res = escribir(tmp)
+        version = f"v{time.time_ns()}"
+        while os.path.exists(os.path.join(directorio, version)): version += '_'
+        os.rename(tmp, os.path.join(directorio, version))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    fd, puntero = tempfile.mkstemp(prefix='.ACTUAL-', dir=directorio)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f: f.write(version)
+        os.replace(puntero, os.path.join(directorio, PUNTERO))
+    except BaseException:
+        if os.path.exists(puntero): os.remove(puntero)
+        raise
+    limpiar(directorio, ficheros_antiguos)
+    return res
+
+def limpiar(directorio, ficheros_antiguos=()):
+    """Borra las versiones que ya no se leen (las que no se puedan, en la siguiente publicación)."""
+    vigente = version_actual(directorio)
+    versiones = [v for v in _versiones(directorio) if v != vigente]
+    for v in versiones[:max(len(versiones) - (VERSIONES_RETENIDAS - 1), 0)]:
+        shutil.rmtree(os.path.join(directorio, v), ignore_errors=True)
+    for nombre in ficheros_antiguos:
+        try: os.remove(os.path.join(directorio, nombre))
+        except OSError: pass
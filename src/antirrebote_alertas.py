@@ -0,0 +1,104 @@
+# src/antirrebote_alertas.py
+# Antirrebote de alertas: un cliente con una fuga continua da una alerta por lectura, y cada una
+# reescribía su incidencia abierta y le enviaba otro push. Aquí se recuerda, por cliente, el último
+# estado escrito de su incidencia abierta (clase de severidad, cuándo y qué incidencia) y se decide
+# si la alerta nueva se escribe:
+#   - cliente sin estado recordado o con otra clase de severidad: se escribe y se notifica
+#   - misma clase y ha pasado el intervalo: se refresca la incidencia, sin notificación nueva
+#   - misma clase dentro del intervalo: no se escribe nada
+# La memoria es del proceso y está acotada (LRU), así que no ve lo que cambian otros procesos (la
+# app, otro worker, una edición a mano): antes de omitir una alerta, motor_gesai comprueba en la
+# fila de la incidencia que sigue abierta y con la misma clase, y si no, invalidar() la deja pasar.
+
+import time
+import threading
+from collections import OrderedDict
+
+CLASES_SEVERIDAD = ('Grave', 'Moderada', 'Leve')
+
+def clase_severidad(estado):
+    """'Fuga Grave (En Crecimiento)' -> 'Grave'. Los textos de una misma clase no cuentan como cambio."""
+    for clase in CLASES_SEVERIDAD:
+        if clase in estado: return clase
+    return estado
+
+class AntirreboteAlertas:
+    """
+    intervalo: segundos tras los que una alerta de la misma clase vuelve a escribirse (0 = desactivado).
+    reloj: función de tiempo en segundos (los benchmarks de replay pasan el reloj de los datos).
+    Seguro entre hilos. decidir() reserva la entrada: dos hilos con el mismo cliente no notifican dos veces.
+    """
+
+    def __init__(self, intervalo=21600.0, max_clientes=100_000, reloj=time.monotonic):
+        self.intervalo = float(intervalo)
+        self.max_clientes = int(max_clientes)
+        self.reloj = reloj
+        self._datos = OrderedDict()  #cliente_id -> [clase, instante, incidencia_id]
+        self._lock = threading.Lock()
+        self.escritas = self.refrescadas = self.omitidas = self.expulsiones = self.invalidadas = 0
+
+    @property
+    def activo(self):
+        return self.intervalo > 0 and self.max_clientes > 0
+
+    def decidir(self, cliente_id, estado):
+        """
+        Retorna (escribir, notificar, incidencia_id). Con escribir=False, incidencia_id es la
+        incidencia abierta ya escrita para el cliente.
+        """
+        if not self.activo: return True, True, None
+        clase, ahora = clase_severidad(estado), self.reloj()
+        with self._lock:
+            entrada = self._datos.get(cliente_id)
+            if entrada is not None and entrada[0] == clase:
+                self._datos.move_to_end(cliente_id)
+                if entrada[2] is None:  #Otro hilo la está escribiendo: sin push repetido
+                    self.refrescadas += 1
+                    return True, False, None
+                if ahora - entrada[1] < self.intervalo:
+                    self.omitidas += 1
+                    return False, False, entrada[2]
+                entrada[1] = ahora
+                self.refrescadas += 1
+                return True, False, entrada[2]
+            self._datos[cliente_id] = [clase, ahora, None]
+            self._datos.move_to_end(cliente_id)
+            while len(self._datos) > self.max_clientes:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+            self.escritas += 1
+            return True, True, None
+
+    def anotar(self, cliente_id, incidencia_id):
+        """Incidencia escrita para la alerta que decidir() dejó pasar."""
+        if not self.activo: return
+        with self._lock:
+            entrada = self._datos.get(cliente_id)
+            if entrada is not None: entrada[2] = incidencia_id
+
+    def invalidar(self, cliente_id):
+        """La alerta que decidir() omitió no debía omitirse (la incidencia ya no está como se recordaba)."""
+        if not self.activo: return
+        with self._lock:
+            self._datos.pop(cliente_id, None)
+            self.omitidas -= 1
+            self.invalidadas += 1
+
+    def olvidar(self, cliente_ids):
+        """Tras un rollback: la próxima alerta de estos clientes se escribe entera."""
+        if not self.activo: return
+        with self._lock:
+            for cliente_id in cliente_ids: self._datos.pop(cliente_id, None)
+
+    def vaciar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.escritas + self.refrescadas + self.omitidas
+            return {
+                'clientes': len(self._datos), 'max_clientes': self.max_clientes, 'intervalo': self.intervalo,
+                'escritas': self.escritas, 'refrescadas': self.refrescadas, 'omitidas': self.omitidas,
+                'expulsiones': self.expulsiones, 'invalidadas': self.invalidadas, 'tasa_omitidas': self.omitidas / total if total else 0.0,
+            }
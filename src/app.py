@@ -1,6 +1,6 @@
 # src/app.py
 import dash
-from dash import html, dcc, callback, Input, Output, State, ALL, ctx, no_update
+from dash import html, dcc, callback, Input, Output, State, ALL, ctx, no_update, Patch
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
 import pandas as pd
@@ -10,7 +10,9 @@ import os
 #importar módulos internos
 from motor_gesai import (
     verificar_credenciales,
-    get_lista_incidencias_activas,
+    get_pagina_incidencias,
+    get_resumen_incidencias,
+    version_cambios,
     get_detalles_incidencia,
     get_notificaciones_pendientes_cliente,
     marcar_notificacion_leida,
@@ -63,6 +65,10 @@ def incidencia_card(inc):
         badge_class = 'badge-grave'
     elif 'MODERADA' in st:
         badge_class = 'badge-moderada'
+    else:
+        #Leve o cualquier otro estado: sin esta rama badge_class quedaba sin asignar y la tarjeta
+        #(y con ella todo el listado) fallaba con UnboundLocalError
+        badge_class = 'badge-leve'
 
     return html.Div(
         className='incidencia animated-fade',
@@ -162,6 +168,7 @@ def build_simulador_movil_layout(cliente_id, pathname):
     return html.Div(className='mobile-frame', children=[
         dcc.Store(id='store-cliente-id', data=cliente_id),
         dcc.Interval(id='intervalo-notificaciones-movil', interval=3000, n_intervals=0),
+        dcc.Store(id='store-version-movil'),
         html.Div(className='mobile-screen', children=[
             html.Div(className='mobile-notch'),
             html.Div(className='mobile-header', children=[html.H5(titulo, className='mobile-header-title')]),
@@ -293,12 +300,21 @@ def build_empresa_layout(session_data):
 
         html.Div(className='right-column', children=[
             html.Div(id='modal-detalles'),
-            html.Div(className='card animated-card', children=[html.Div(id='incidencias-container')]),
+            html.Div(className='card animated-card', children=[
+                #Con varias páginas abiertas la lista no se refresca sola: este aviso vuelve a la primera, en vivo
+                html.Button('⬆ Incidencias nuevas o actualizadas · volver arriba', id='btn-volver-arriba', n_clicks=0,
+                            className='btn-nuevas-incidencias', style={'display': 'none'}),
+                html.Div(id='incidencias-container'),
+                #Páginas siguientes: se añaden al hacer scroll (assets/scroll_infinito.js pulsa el botón)
+                html.Div(id='incidencias-mas', children=[]),
+                html.Button('Cargar más', id='btn-cargar-mas', n_clicks=0, className='btn-cargar-mas', style={'display': 'none'})
+            ]),
             html.Div(id='dummy-download-output')  
         ])
     ])
 
-    return html.Div([dcc.Interval(id='intervalo-refresco', interval=2000, n_intervals=0), header, body])
+    return html.Div([dcc.Interval(id='intervalo-refresco', interval=2000, n_intervals=0),
+                     dcc.Store(id='store-version-dashboard'), dcc.Store(id='store-cursor-incidencias'), header, body])
 
 
 
@@ -377,33 +393,37 @@ def display_page(pathname, session_data):
     return build_login_layout()
 
 
+def _estilo_cargar_mas(siguiente):
+    return {'display': 'block'} if siguiente else {'display': 'none'}
+
 @callback(
     [Output('stats-container', 'children'),
-     Output('incidencias-container', 'children')],
+     Output('incidencias-container', 'children'),
+     Output('store-version-dashboard', 'data'),
+     Output('store-cursor-incidencias', 'data'),
+     Output('incidencias-mas', 'children'),
+     Output('btn-cargar-mas', 'style'),
+     Output('btn-volver-arriba', 'style')],
     [Input('intervalo-refresco', 'n_intervals'),
-     Input('store-filtro-activo', 'data')]
+     Input('store-filtro-activo', 'data'),
+     Input('btn-volver-arriba', 'n_clicks')],
+    [State('store-version-dashboard', 'data'),
+     State('store-cursor-incidencias', 'data')]
 )
-def refresh_dashboard(n, filtro):
+def refresh_dashboard(n, filtro, volver=None, visto=None, cursor=None):
     filtro = (filtro or 'todas').upper()
-        
-    #Esta línea es la clave: el "or []" evita que 'todas' sea None
-    todas = get_lista_incidencias_activas('todas') or []
+    #Pulsación de 'volver arriba' aún no atendida (el cursor guarda las ya atendidas)
+    volver_arriba = bool(volver) and volver != (cursor or {}).get('volver', 0)
 
-    def match(i):
-        estado = str(i.get('estado', '')).upper()
-        ver = str(i.get('verificacion', '')).upper()
-        if filtro == 'TODAS':
-            return True
-        if filtro == 'CARTA':
-            return 'CARTA' in ver
-        return filtro in estado
+    #Nada ha cambiado desde lo que ya muestra este navegador: ni consulta ni descifrado
+    version = version_cambios()
+    actual = {'version': version['incidencias'], 'filtro': filtro} if version else None
+    if actual is not None and actual == visto and not volver_arriba:
+        return (no_update,) * 7
 
-    incidencias = [i for i in todas if match(i)]
-
-    total = len(todas)
-    graves = sum('GRAVE' in str(i.get('estado', '')).upper() for i in todas)
-    moderadas = sum('MODERADA' in str(i.get('estado', '')).upper() for i in todas)
-    cartas = sum('CARTA' in str(i.get('verificacion', '')).upper() for i in todas)
+    #KPI de todas las incidencias abiertas (la lista solo trae una página)
+    resumen = get_resumen_incidencias()
+    total, graves, moderadas, cartas = resumen['total'], resumen['graves'], resumen['moderadas'], resumen['cartas']
 
     stats = html.Div(className='kpi-grid', children=[
         kpi_card('Incidencias Activas', total, '📊'),
@@ -412,12 +432,42 @@ def refresh_dashboard(n, filtro):
         kpi_card('Cartas por Enviar', cartas, '📮')
     ])
 
+    #Si el operador ya ha bajado a otras páginas, no le movemos la lista: solo los KPI y el aviso
+    #para volver a la primera página (la lista que ve ya no está al día)
+    if not volver_arriba and cursor and cursor.get('paginas', 1) > 1 and cursor.get('filtro') == filtro:
+        return stats, no_update, actual, no_update, no_update, no_update, {'display': 'block'}
+
+    #Filtro en SQL (clase de severidad o CARTA), primera página
+    pagina = get_pagina_incidencias(filtro)
+    incidencias = pagina['incidencias']
+
     if not incidencias:
         cards = html.Div("No hay incidencias recientes.", className='list-empty')
     else:
         cards = html.Div([incidencia_card(inc) for inc in incidencias])
 
-    return stats, cards
+    cursor = {'filtro': filtro, 'siguiente': pagina['siguiente'], 'paginas': 1, 'volver': volver or 0}
+    return stats, cards, actual, cursor, [], _estilo_cargar_mas(pagina['siguiente']), {'display': 'none'}
+
+
+@callback(
+    Output('incidencias-mas', 'children', allow_duplicate=True),
+    Output('store-cursor-incidencias', 'data', allow_duplicate=True),
+    Output('btn-cargar-mas', 'style', allow_duplicate=True),
+    Input('btn-cargar-mas', 'n_clicks'),
+    State('store-cursor-incidencias', 'data'),
+    prevent_initial_call=True
+)
+def cargar_mas_incidencias(n, cursor):
+    #Página siguiente del listado, a continuación de la última que se ve
+    if not n or not cursor or not cursor.get('siguiente'):
+        raise PreventUpdate
+
+    pagina = get_pagina_incidencias(cursor['filtro'], cursor['siguiente'])
+    mas = Patch()
+    mas.extend([incidencia_card(inc) for inc in pagina['incidencias']])
+    cursor = dict(cursor, siguiente=pagina['siguiente'], paginas=cursor['paginas'] + 1)
+    return mas, cursor, _estilo_cargar_mas(pagina['siguiente'])
 
 
 @callback(
@@ -525,30 +575,38 @@ def handle_details(n_card, n_close):
 
 @callback(
     Output('div-notificaciones-movil', 'children'),
+    Output('store-version-movil', 'data'),
     Input('intervalo-notificaciones-movil', 'n_intervals'),
     State('store-cliente-id', 'data'),
-    State('url', 'pathname')
+    State('url', 'pathname'),
+    State('store-version-movil', 'data')
 )
-def mobile_poll(n, cid, path):
+def mobile_poll(n, cid, path, visto=None):
     if not path or not cid:
-        return no_update
+        return no_update, no_update
         
     #Evitar molestar si el usuario está en flujo de verificación
     if 'verificar' in path or 'confirmacion' in path or 'recomendaciones' in path:
-        return no_update
+        return no_update, no_update
+
+    #Sin notificaciones nuevas en la BBDD desde el último sondeo: no se consulta
+    version = version_cambios()
+    actual = version['notificaciones'] if version else None
+    if actual is not None and actual == visto:
+        return no_update, no_update
     
     #Buscar nuevas notificaciones en backend
     notifs = get_notificaciones_pendientes_cliente(cid)
     
     
     if not notifs:
-        return no_update 
+        return no_update, actual
     
 
     latest_notif = notifs[-1] 
     
     for notif in notifs:
-        marcar_notificacion_leida(notif['notificacion_id'])
+        marcar_notificacion_leida(notif['notificacion_id'], cid)  #Una escritura, en el shard del cliente
     
     #Construimos LA tarjeta (Solo una)
     link = f"/sim-movil/{cid}/verificar/{latest_notif['link'].split('/')[-1]}"
@@ -562,7 +620,8 @@ def mobile_poll(n, cid, path):
     
     #DEVOLVEMOS SOLO ESTA TARJETA
     #Al devolver [card], Dash elimina todo lo que hubiera antes en el div y pone solo este elemento nuevo.
-    return [card]
+    #Marcarlas como leídas sube la versión: el siguiente sondeo vuelve a consultar una vez
+    return [card], actual
 
 @callback(
     [Output('survey-result', 'children'), Output('url', 'pathname', allow_duplicate=True)],
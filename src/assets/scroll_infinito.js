@@ -0,0 +1,47 @@
+// src/assets/scroll_infinito.js
+// Scroll infinito del listado de incidencias: cuando el botón "Cargar más" entra en pantalla se
+// pulsa solo y el callback cargar_mas_incidencias añade la página siguiente. No se vuelve a pulsar
+// hasta que esa página ha llegado (así no se pide dos veces la misma). El aviso "volver arriba"
+// (btn-volver-arriba) sube hasta el principio del listado.
+(function () {
+    var observado = null;
+    var esperando = false;
+
+    var visor = new IntersectionObserver(function (entradas) {
+        entradas.forEach(function (e) {
+            if (e.isIntersecting && !esperando && e.target.style.display !== 'none') {
+                esperando = true;
+                e.target.click();
+            }
+        });
+    }, {rootMargin: '200px'});
+
+    function vigilar(cambios) {
+        var boton = document.getElementById('btn-cargar-mas');
+        var llegada = (cambios || []).some(function (c) {
+            return c.target.id === 'incidencias-mas' || c.target === boton || c.target.id === 'incidencias-container';
+        });
+        if (llegada) esperando = false;
+        //Volver a observar hace que el visor compruebe si el botón sigue a la vista
+        if (boton !== observado || llegada) {
+            if (observado) visor.unobserve(observado);
+            if (boton) visor.observe(boton);
+            observado = boton;
+        }
+    }
+
+    function iniciar() {
+        new MutationObserver(vigilar).observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['style']});
+        vigilar();
+    }
+
+    //"Volver arriba": el callback recarga la primera página; aquí solo se sube hasta el listado
+    document.addEventListener('click', function (e) {
+        if (e.target.id !== 'btn-volver-arriba') return;
+        var lista = document.getElementById('incidencias-container');
+        if (lista) lista.scrollIntoView({behavior: 'smooth', block: 'start'});
+    });
+
+    if (document.body) iniciar();
+    else document.addEventListener('DOMContentLoaded', iniciar);
+})();
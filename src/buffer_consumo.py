@@ -0,0 +1,198 @@
+# src/buffer_consumo.py
+# Histórico reciente por cliente en memoria, alimentado por el propio stream de lecturas:
+# cada lectura puntuada se anota (FECHA_HORA_CRONO, CONSUMO_REAL) en la fila del cliente
+# de dos matrices NumPy preasignadas (max_clientes x 720). Se vuelca a disco cada cierto
+# tiempo para que la app (otro proceso) y los reinicios lo vean.
+#
+# Memoria fija por cliente: 720 x (8 B fecha int64 + 8 B consumo float64) + 16 B de contadores
+# = 11 536 B, más ~150 B de la entrada del diccionario -> ~11.4 KB. Con 10 000 clientes, ~112 MB
+# como máximo; las matrices se reservan con np.zeros y solo ocupan RSS las filas ya usadas.
+
+import os
+import json
+import time
+import threading
+import numpy as np
+import almacen_versionado
+
+HORAS = 720
+_SIN_FECHA = np.iinfo(np.int64).min
+ARRAYS = ['clientes', 'n', 'actividad', 'fechas', 'consumo']
+
+def bytes_por_cliente(horas=HORAS):
+    return horas * (8 + 8) + 8 + 8
+
+class BufferConsumo:
+    """
+    Las últimas `horas` lecturas de cada cliente por FECHA: una lectura repetida (misma fecha)
+    sustituye a la anterior y, con la fila llena, la más antigua deja sitio a una más reciente.
+    Con todas las filas ocupadas, un cliente nuevo expulsa al de actividad más antigua.
+    Seguro entre hilos.
+    """
+
+    def __init__(self, max_clientes=10_000, horas=HORAS):
+        self.max_clientes, self.horas = int(max_clientes), int(horas)
+        self.fechas = np.zeros((self.max_clientes, self.horas), dtype=np.int64)  #ns desde epoch
+        self.consumo = np.zeros((self.max_clientes, self.horas), dtype=np.float64)
+        self.n = np.zeros(self.max_clientes, dtype=np.int64)
+        self.actividad = np.zeros(self.max_clientes, dtype=np.float64)  #time.time() de la última lectura
+        self._filas = {}  #cliente_id -> fila
+        self._cliente_de = [None] * self.max_clientes  #fila -> cliente_id
+        self._ultima = [0] * self.max_clientes  #Fecha más reciente de cada fila (stream en orden: sin buscar repetidas)
+        self._libres = list(range(self.max_clientes - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.lecturas = self.expulsiones = 0
+
+    @property
+    def activo(self):
+        return self.max_clientes > 0
+
+    def __len__(self):
+        return len(self._filas)
+
+    def _fila(self, cliente_id):
+        fila = self._filas.get(cliente_id)
+        if fila is not None: return fila
+        if self._libres:
+            fila = self._libres.pop()
+        else:
+            #Todas las filas ocupadas: sale el cliente con la lectura más antigua
+            fila = int(np.argmin(self.actividad))
+            del self._filas[self._cliente_de[fila]]
+            self.expulsiones += 1
+        self._filas[cliente_id] = fila
+        self._cliente_de[fila] = cliente_id
+        self._ultima[fila] = _SIN_FECHA
+        self.n[fila] = 0
+        return fila
+
+    def _anotar(self, cliente_id, fecha, consumo, ahora):
+        fila = self._fila(cliente_id)
+        n = int(self.n[fila])
+        fechas = self.fechas[fila]
+        if fecha <= self._ultima[fila] and (iguales := np.flatnonzero(fechas[:n] == fecha)).size:
+            i = int(iguales[0])
+        elif n < self.horas:
+            i = n
+            self.n[fila] = n + 1
+        else:
+            i = int(np.argmin(fechas))
+            if fecha < fechas[i]:  #Más antigua que todo lo guardado: no entra
+                self.actividad[fila] = ahora
+                return
+        fechas[i] = fecha
+        if fecha > self._ultima[fila]: self._ultima[fila] = fecha
+        self.consumo[fila, i] = consumo
+        self.actividad[fila] = ahora
+        self.lecturas += 1
+
+    def anotar(self, cliente_id, fecha, consumo, ahora=None):
+        """fecha en ns desde epoch (int). Lecturas sin consumo se ignoran."""
+        if not self.activo or consumo != consumo: return
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            self._anotar(str(cliente_id), int(fecha), float(consumo), ahora)
+
+    def anotar_lote(self, clientes, fechas, consumos, ahora=None):
+        """Arrays paralelos (cliente_id, fecha ns, consumo) en orden de llegada."""
+        if not self.activo: return
+        ahora = time.time() if ahora is None else ahora
+        consumos = np.asarray(consumos, dtype=np.float64)
+        validas = ~np.isnan(consumos)
+        #tolist(): tipos de Python, más rápidos en el bucle que los escalares de NumPy
+        clientes = np.asarray(clientes)[validas].astype(str).tolist()
+        fechas = np.asarray(fechas, dtype=np.int64)[validas].tolist()
+        with self._lock:
+            for c, f, v in zip(clientes, fechas, consumos[validas].tolist()):
+                self._anotar(c, f, v, ahora)
+
+    def consultar(self, cliente_id, horas=HORAS):
+        """Últimas `horas` lecturas en orden cronológico (fechas datetime64[ns], consumo), o None si no está."""
+        with self._lock:
+            fila = self._filas.get(str(cliente_id))
+            if fila is None: return None
+            n = int(self.n[fila])
+            fechas, consumo = self.fechas[fila, :n].copy(), self.consumo[fila, :n].copy()
+        orden = np.argsort(fechas, kind='stable')[-horas:]
+        return fechas[orden].view('datetime64[ns]'), consumo[orden]
+
+    def expulsar_inactivos(self, segundos, ahora=None):
+        """Libera los clientes sin lecturas en los últimos `segundos`. Retorna cuántos."""
+        limite = (time.time() if ahora is None else ahora) - segundos
+        with self._lock:
+            inactivos = [(c, f) for c, f in self._filas.items() if self.actividad[f] < limite]
+            for c, f in inactivos:
+                del self._filas[c]
+                self._libres.append(f)
+            self.expulsiones += len(inactivos)
+        return len(inactivos)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'clientes': len(self._filas), 'max_clientes': self.max_clientes, 'horas': self.horas,
+                'lecturas': self.lecturas, 'expulsiones': self.expulsiones,
+                'bytes_por_cliente': bytes_por_cliente(self.horas),
+                'mb_maximo': self.max_clientes * bytes_por_cliente(self.horas) / 2**20,
+            }
+
+    #INSTANTÁNEAS
+    def guardar(self, directorio):
+        """
+        Vuelca los clientes en memoria (ordenados por cliente_id) como una versión nueva de la
+        instantánea (almacen_versionado): los lectores nunca ven una a medias.
+        """
+        with self._lock:
+            clientes = np.array(sorted(self._filas), dtype=str)
+            filas = np.array([self._filas[c] for c in clientes], dtype=np.int64)
+            datos = {'clientes': clientes, 'n': self.n[filas], 'actividad': self.actividad[filas],
+                     'fechas': self.fechas[filas], 'consumo': self.consumo[filas]}
+        def escribir(tmp):
+            for nombre in ARRAYS: np.save(os.path.join(tmp, f'{nombre}.npy'), datos[nombre])
+            with open(os.path.join(tmp, 'manifiesto.json'), 'w', encoding='utf-8') as f:
+                json.dump({'horas': self.horas, 'clientes': int(len(clientes)), 'guardado': time.time()}, f)
+        almacen_versionado.publicar(directorio, escribir, [f'{n}.npy' for n in ARRAYS] + ['manifiesto.json'])
+        return len(clientes)
+
+    def restaurar(self, instantanea):
+        """Carga una Instantanea en memoria (p.ej. al arrancar). Retorna los clientes restaurados."""
+        if instantanea.horas != self.horas: return 0
+        #Los más activos primero: si no caben todos, se quedan fuera los inactivos
+        orden = np.argsort(-instantanea.actividad, kind='stable')[:self.max_clientes]
+        with self._lock:
+            for k in orden:
+                fila = self._fila(str(instantanea.clientes[k]))
+                n = int(instantanea.n[k])
+                self.fechas[fila, :n] = instantanea.fechas[k, :n]
+                self.consumo[fila, :n] = instantanea.consumo[k, :n]
+                self.n[fila] = n
+                self.actividad[fila] = instantanea.actividad[k]
+                if n: self._ultima[fila] = int(self.fechas[fila, :n].max())
+        return len(orden)
+
+class Instantanea:
+    """Instantánea en disco abierta con mmap (solo lectura): lo que ve la app."""
+
+    def __init__(self, directorio):
+        directorio = almacen_versionado.dir_actual(directorio)
+        with open(os.path.join(directorio, 'manifiesto.json'), encoding='utf-8') as f:
+            self.manifiesto = json.load(f)
+        self.horas = self.manifiesto['horas']
+        for nombre in ARRAYS:
+            setattr(self, nombre, np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode='r'))
+
+    def consultar(self, cliente_id, horas=HORAS):
+        cliente_id = str(cliente_id)
+        i = int(np.searchsorted(self.clientes, cliente_id))
+        if i == len(self.clientes) or self.clientes[i] != cliente_id: return None
+        n = int(self.n[i])
+        fechas, consumo = np.array(self.fechas[i, :n]), np.array(self.consumo[i, :n])
+        orden = np.argsort(fechas, kind='stable')[-horas:]
+        return fechas[orden].view('datetime64[ns]'), consumo[orden]
+
+def abrir(directorio):
+    """Abre la instantánea, o None si no existe."""
+    try:
+        return Instantanea(directorio)
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,73 @@
+# src/cache_predicciones.py
+# Caché LRU + TTL acotada para las predicciones de los tres horizontes.
+# La clave es una huella (blake2b, 16 bytes) de la fila de features ya codificada,
+# junto con la versión de modelos que la puntuó.
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+def huella_fila(fila, version):
+    """Huella de la fila codificada (float64 contigua) + versión de modelos."""
+    return (version, hashlib.blake2b(fila.tobytes(), digest_size=16).digest())
+
+class CachePredicciones:
+    """
+    Diccionario LRU con caducidad por entrada y tamaño máximo fijo (memoria acotada).
+    Segura entre hilos. Cuenta aciertos, fallos, expulsiones (por LRU) y caducadas (por TTL).
+    """
+
+    def __init__(self, max_entradas=50_000, ttl=3600.0):
+        self.max_entradas = int(max_entradas)
+        self.ttl = float(ttl)
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = self.expulsiones = self.caducadas = 0
+
+    @property
+    def activa(self):
+        return self.max_entradas > 0
+
+    def obtener(self, clave):
+        """Valor cacheado o None (fallo)."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            valor, expira = entrada
+            if expira < ahora:
+                del self._datos[clave]
+                self.caducadas += 1
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        if not self.activa: return
+        expira = time.monotonic() + self.ttl
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def vaciar(self):
+        """Invalida todo (p.ej. tras recargar modelos). Los contadores se conservan."""
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos), 'max_entradas': self.max_entradas, 'ttl': self.ttl,
+                'aciertos': self.aciertos, 'fallos': self.fallos,
+                'expulsiones': self.expulsiones, 'caducadas': self.caducadas,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
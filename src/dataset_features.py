@@ -0,0 +1,565 @@
+# src/dataset_features.py
+# Cargador único de datos_simulacion_features: un fichero Arrow IPC (Feather v2, sin comprimir)
+# con tipos compactos que se abre con mmap, de modo que simulador, motor y setup comparten las
+# mismas páginas y cada uno lee solo las columnas que necesita. El CSV sigue siendo el formato
+# de importación:
+#   python src/dataset_features.py importar [--csv ruta] [--destino ruta] [--memoria-mb 256]
+#   python src/dataset_features.py info
+#
+# Para datasets que no caben en memoria (los 75M de lecturas de telemetría), la importación
+# y las lecturas en streaming (iterar_lotes, iterar_cronologico, muestra, lecturas_aleatorias) trabajan por bloques
+# con un techo de memoria (GESAI_MEMORIA_LECTOR_MB): nunca hay más de un bloque en memoria.
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+#CONFIG
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+PATH_CSV = os.path.join(BASE_DIR, 'data', 'processed-data', 'datos_simulacion_features.csv')
+PATH_ARROW = os.path.join(BASE_DIR, 'data', 'processed-data', 'datos_simulacion_features.arrow')
+COL_CLIENTE = 'POLISSA_SUBM'
+COL_FECHA = 'FECHA_HORA_CRONO'
+MEMORIA_LECTOR_MB = float(os.environ.get('GESAI_MEMORIA_LECTOR_MB', 256))  #Techo de memoria de las lecturas por bloques
+_avisado = False
+
+def huella_csv(path_csv=None):
+    st = os.stat(path_csv or PATH_CSV)
+    return [st.st_size, st.st_mtime_ns]
+
+#IMPORTACIÓN CSV -> ARROW
+def _leer_csv(path_csv, columnas=None):
+    """CSV -> pyarrow.Table con POLISSA_SUBM como texto y las fechas en ns (como pd.to_datetime)."""
+    opciones = pa_csv.ConvertOptions(column_types={COL_CLIENTE: pa.string()}, include_columns=columnas)
+    tabla = pa_csv.read_csv(path_csv, convert_options=opciones)
+    for i, campo in enumerate(tabla.schema):
+        if pa.types.is_timestamp(campo.type) and campo.type.unit != 'ns':
+            tabla = tabla.set_column(i, campo.name, pc.cast(tabla.column(i), pa.timestamp('ns', campo.type.tz)))
+    return tabla
+
+def _compactar(tabla):
+    """
+    Tipos compactos sin pérdida: texto -> diccionario (POLISSA_SUBM, US_AIGUA_SUBM, TIPO_DIA...),
+    float64 -> float32 solo si todos los valores se representan igual, enteros al menor tipo que cabe.
+    """
+    columnas = []
+    for nombre, col in zip(tabla.column_names, tabla.columns):
+        t = col.type
+        if pa.types.is_string(t) or pa.types.is_large_string(t):
+            if nombre == COL_FECHA:
+                try: col = pc.cast(col, pa.timestamp('ns'))
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError): col = col.dictionary_encode()
+            else:
+                col = col.dictionary_encode().unify_dictionaries()
+                n = len(col.chunk(0).dictionary) if col.num_chunks else 0
+                indices = pa.int8() if n <= 127 else pa.int16() if n <= 32767 else pa.int32()
+                col = col.cast(pa.dictionary(indices, pa.string()))
+        elif pa.types.is_float64(t):
+            v = col.to_numpy(zero_copy_only=False)
+            if np.array_equal(v.astype(np.float32).astype(np.float64), v, equal_nan=True):
+                col = pc.cast(col, pa.float32())
+        elif pa.types.is_integer(t) and col.null_count == 0 and len(col):
+            v = col.to_numpy()
+            for destino in (np.int8, np.int16, np.int32):
+                info = np.iinfo(destino)
+                if v.min() >= info.min and v.max() <= info.max:
+                    col = pc.cast(col, pa.from_numpy_dtype(destino))
+                    break
+        columnas.append(col)
+    return pa.table(columnas, names=tabla.column_names)
+
+#IMPORTACIÓN POR BLOQUES (memoria acotada)
+def _bloque_csv(memoria_mb):
+    """Bytes de CSV por bloque: el texto, sus columnas parseadas, convertidas y en pandas caben en el techo."""
+    return max(1 << 20, int(memoria_mb * 2**20 / 12))
+
+def _cabecera_csv(path_csv):
+    with open(path_csv, newline='', encoding='utf-8') as f: return next(csv.reader(f))
+
+def _trozos_csv(path_csv, memoria_mb):
+    """
+    El CSV (sin la cabecera) en trozos de texto que acaban en fin de línea, sin copiarlos.
+    Se lee a mano: el lector en streaming de pyarrow lee por delante sin límite si el consumidor
+    es más lento, y la memoria crecía con el tamaño del fichero. (Supone, como los CSV que escribe
+    pandas con estos datos, que ningún campo lleva saltos de línea.)
+    """
+    tam = _bloque_csv(memoria_mb)
+    with open(path_csv, 'rb') as f:
+        f.readline()
+        resto = b''
+        while datos := f.read(tam):
+            datos = resto + datos
+            corte = datos.rfind(b'\n') + 1
+            resto = datos[corte:]
+            if corte: yield memoryview(datos)[:corte]
+        if resto.strip(): yield memoryview(resto)
+
+def _abrir_csv(path_csv, memoria_mb, tipos=None, columnas=None):
+    """
+    RecordBatches del CSV, un trozo de texto en memoria cada vez. tipos=None lee todo como texto;
+    en cualquier caso los vacíos y 'NaN' son nulos, como en pd.read_csv.
+    """
+    nombres = _cabecera_csv(path_csv)
+    if tipos is None: tipos = {c: pa.string() for c in nombres}
+    conversion = pa_csv.ConvertOptions(column_types=tipos, include_columns=columnas, strings_can_be_null=True)
+    for trozo in _trozos_csv(path_csv, memoria_mb):
+        lectura = pa_csv.ReadOptions(column_names=nombres, block_size=len(trozo) + 1, use_threads=False)
+        yield from pa_csv.read_csv(pa.py_buffer(trozo), read_options=lectura, convert_options=conversion).to_batches()
+
+_CONVERSIONES = [('entero', pa.int64()), ('real', pa.float64()), ('fecha', pa.timestamp('ns'))]
+
+def _tipo_bloque(col, actual=None):
+    """
+    (tipo, valores convertidos) de una columna de texto: entero, real, fecha o texto.
+    Se empieza por el tipo que ya tiene la columna (los bloques anteriores): no hace falta uno menor.
+    """
+    if actual == 'texto': return 'texto', col
+    inicio = [t for t, _ in _CONVERSIONES].index(actual) if actual else 0
+    for tipo, destino in _CONVERSIONES[inicio:]:
+        try:
+            #Un cast que falla recorre toda la columna (~1 µs por valor): antes se prueba con unos pocos
+            pc.cast(col.slice(0, 1024), destino)
+            return tipo, pc.cast(col, destino)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return 'texto', col
+
+def _promocionar(actual, tipo):
+    """Tipo que admite los dos, como la inferencia de pa_csv.read_csv sobre el CSV entero."""
+    if actual is None or actual == tipo: return tipo
+    return 'real' if {actual, tipo} <= {'entero', 'real'} else 'texto'
+
+def _tipo_final(c):
+    if c['tipo'] is None: return pa.null()  #Columna vacía
+    if c['tipo'] == 'entero':
+        if c['nulos']: return pa.int64()
+        for t in (np.int8, np.int16, np.int32):
+            if c['min'] >= np.iinfo(t).min and c['max'] <= np.iinfo(t).max: return pa.from_numpy_dtype(t)
+        return pa.int64()
+    if c['tipo'] == 'real': return pa.float32() if c['exacta32'] else pa.float64()
+    if c['tipo'] == 'fecha': return pa.timestamp('ns')
+    if c['valores'] is None: return pa.string()  #Numérica con texto a partir de algún bloque: sin diccionario
+    n = len(c['valores'])
+    return pa.dictionary(pa.int8() if n <= 127 else pa.int16() if n <= 32767 else pa.int32(), pa.string())
+
+def importar_csv(path_csv=None, destino=None, memoria_mb=None):
+    """
+    Convierte el CSV al fichero Arrow leyendo por bloques: la memoria queda acotada por memoria_mb
+    sea cual sea el tamaño del CSV. Primera pasada: tipo de cada columna con todos los bloques y
+    lo necesario para compactarla con el criterio de _compactar (float32 si todos los valores caben
+    exactos, enteros al menor tipo, diccionario común en las de texto). Segunda pasada: convierte
+    cada bloque y lo añade al fichero.
+    Se escribe a un temporal y se renombra (atómico): los procesos que ya lo tengan abierto siguen
+    leyendo la versión anterior. Retorna la tabla escrita, mapeada.
+    """
+    path_csv, destino = path_csv or PATH_CSV, destino or PATH_ARROW
+    memoria_mb = memoria_mb or MEMORIA_LECTOR_MB
+
+    #1ª pasada
+    info = {}
+    for lote in _abrir_csv(path_csv, memoria_mb):
+        for nombre, col in zip(lote.schema.names, lote.columns):
+            c = info.setdefault(nombre, {'tipo': None, 'nulos': 0, 'min': None, 'max': None, 'exacta32': True, 'valores': {}})
+            c['nulos'] += col.null_count
+            if col.null_count == len(col): continue
+            tipo, v = ('texto', col) if nombre == COL_CLIENTE else _tipo_bloque(col, c['tipo'])
+            c['tipo'] = _promocionar(c['tipo'], tipo)
+            if c['tipo'] != 'texto': c['valores'] = None  #Solo las de texto desde el principio llevan diccionario
+            if tipo == 'entero':
+                minmax = pc.min_max(v)
+                c['min'] = minmax['min'].as_py() if c['min'] is None else min(c['min'], minmax['min'].as_py())
+                c['max'] = minmax['max'].as_py() if c['max'] is None else max(c['max'], minmax['max'].as_py())
+            if tipo in ('entero', 'real') and c['exacta32']:
+                x = pc.cast(v, pa.float64()).to_numpy(zero_copy_only=False)
+                c['exacta32'] = np.array_equal(x.astype(np.float32).astype(np.float64), x, equal_nan=True)
+            if c['valores'] is not None:  #En orden de aparición, como dictionary_encode
+                c['valores'].update(dict.fromkeys(pc.unique(col.drop_null()).to_pylist()))
+    if not info:
+        raise ValueError(f"CSV vacío: {path_csv}")
+    esquema = pa.schema([pa.field(n, _tipo_final(c)) for n, c in info.items()],
+                        metadata={b'gesai_origen': json.dumps({'huella': huella_csv(path_csv)}).encode()})
+    diccionarios = {n: pa.array(list(c['valores']), type=pa.string()) for n, c in info.items()
+                    if pa.types.is_dictionary(esquema.field(n).type)}
+
+    #La 2ª pasada ya lee cada columna con su tipo ancho y solo estrecha
+    lectura = {n: dict(_CONVERSIONES).get(c['tipo'], pa.string()) for n, c in info.items()}
+
+    def convertir(lote):
+        columnas = []
+        for campo, col in zip(esquema, lote.columns):
+            t = campo.type
+            if pa.types.is_dictionary(t):
+                dic = diccionarios[campo.name]
+                col = pa.DictionaryArray.from_arrays(pc.index_in(col, value_set=dic).cast(t.index_type), dic)
+            elif pa.types.is_null(t):
+                col = pa.nulls(len(col))
+            elif col.type != t:
+                col = pc.cast(col, t)
+            columnas.append(col)
+        return pa.RecordBatch.from_arrays(columnas, schema=esquema)
+
+    #2ª pasada
+    tmp = f"{destino}.tmp-{os.getpid()}"
+    try:
+        #Arrow IPC (Feather v2) sin comprimir: se puede mapear
+        with pa.OSFile(tmp, 'wb') as f, pa.ipc.new_file(f, esquema) as escritor:
+            for lote in _abrir_csv(path_csv, memoria_mb, lectura):
+                escritor.write_batch(convertir(lote))
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    return feather.read_table(destino, memory_map=True)
+
+#LECTURA
+def _arrow_vigente(path_arrow, path_csv):
+    """El fichero Arrow existe y corresponde al CSV actual (si el CSV no existe, vale)."""
+    global _avisado
+    if not os.path.exists(path_arrow): return False
+    if not os.path.exists(path_csv): return True
+    try:
+        meta = feather.read_table(path_arrow, columns=[], memory_map=True).schema.metadata or {}
+        vigente = json.loads(meta.get(b'gesai_origen', b'{}')).get('huella') == huella_csv(path_csv)
+    except (OSError, ValueError, pa.ArrowInvalid):
+        vigente = False
+    if not vigente and not _avisado:
+        print("⚠️ datos_simulacion_features.arrow es anterior al CSV: se lee el CSV. "
+              "Actualízalo con 'python src/dataset_features.py importar'.")
+        _avisado = True
+    return vigente
+
+def disponible(path_csv=None, path_arrow=None):
+    return os.path.exists(path_arrow or PATH_ARROW) or os.path.exists(path_csv or PATH_CSV)
+
+def tabla_mapeada(columnas=None, path_csv=None, path_arrow=None):
+    """Tabla del Arrow mapeado (acceso aleatorio sin cargar nada en memoria), o None si no está al día."""
+    path_csv, path_arrow = path_csv or PATH_CSV, path_arrow or PATH_ARROW
+    if not _arrow_vigente(path_arrow, path_csv): return None
+    return feather.read_table(path_arrow, columns=columnas, memory_map=True)
+
+def _filtrar(tabla, clientes=None, desde=None, hasta=None):
+    mascara = None
+    if clientes is not None:
+        valores = pa.array([str(c) for c in clientes], type=pa.string())
+        cliente = tabla.column(COL_CLIENTE)
+        if pa.types.is_dictionary(cliente.type): cliente = cliente.cast(pa.string())
+        mascara = pc.is_in(cliente, value_set=valores)
+    fecha = tabla.column(COL_FECHA) if COL_FECHA in tabla.column_names else None
+    for limite, comparar in ((desde, pc.greater_equal), (hasta, pc.less_equal)):
+        if limite is None or fecha is None or not pa.types.is_timestamp(fecha.type): continue
+        m = pc.fill_null(comparar(fecha, pa.scalar(pd.Timestamp(limite).as_unit('ns'), type=fecha.type)), False)
+        mascara = m if mascara is None else pc.and_(mascara, m)
+    return tabla if mascara is None else tabla.filter(mascara)
+
+def cargar_tabla(columnas=None, clientes=None, path_csv=None, path_arrow=None, desde=None, hasta=None):
+    """
+    pyarrow.Table con las columnas pedidas (todas si None), opcionalmente solo de esos clientes
+    y de FECHA_HORA_CRONO en [desde, hasta]. Desde el Arrow mapeado no se copia nada hasta que
+    se filtra o se convierte. None si no hay datos.
+    """
+    path_csv, path_arrow = path_csv or PATH_CSV, path_arrow or PATH_ARROW
+    tabla = tabla_mapeada(columnas, path_csv, path_arrow)
+    if tabla is None and os.path.exists(path_csv):
+        tabla = _compactar(_leer_csv(path_csv, columnas))  #Mismos tipos que desde el Arrow
+    if tabla is None: return None
+    return _filtrar(tabla, clientes, desde, hasta)
+
+def cargar(columnas=None, clientes=None, path_csv=None, path_arrow=None, desde=None, hasta=None):
+    """
+    DataFrame de datos_simulacion_features (Arrow si está al día, si no el CSV).
+    POLISSA_SUBM y las columnas de texto llegan como category. None si no hay datos.
+    """
+    tabla = cargar_tabla(columnas, clientes, path_csv, path_arrow, desde, hasta)
+    if tabla is None: return None
+    #split_blocks: no consolida columnas en bloques 2D, evita copias innecesarias
+    return tabla.to_pandas(split_blocks=True)
+
+#LECTURA EN STREAMING (memoria acotada)
+def filas_en_memoria(bytes_fila, memoria_mb=None):
+    """Filas que caben en el techo de memoria, contando la tabla Arrow y su copia en pandas."""
+    return max(1, int((memoria_mb or MEMORIA_LECTOR_MB) * 2**20 / (2 * max(bytes_fila, 1))))
+
+def _bytes_fila(tabla):
+    return tabla.nbytes / max(tabla.num_rows, 1)
+
+def _bloques_csv(path_csv, columnas, memoria_mb):
+    """
+    Bloques del CSV (sin Arrow importado) como pyarrow.Table. Tipos del primer bloque, con los
+    enteros y las columnas vacías como float64 para que un bloque posterior con decimales no falle.
+    """
+    tipos, primero = {}, next(_abrir_csv(path_csv, memoria_mb, {COL_CLIENTE: pa.string()}, columnas), None)
+    if primero is None: return
+    for campo in primero.schema:
+        t = campo.type
+        tipos[campo.name] = pa.float64() if pa.types.is_integer(t) or pa.types.is_null(t) else \
+            pa.timestamp('ns') if pa.types.is_timestamp(t) else t
+    for lote in _abrir_csv(path_csv, memoria_mb, tipos, columnas):
+        yield pa.Table.from_batches([lote])
+
+def iterar_lotes(columnas=None, filas=None, memoria_mb=None, path_csv=None, path_arrow=None):
+    """
+    DataFrames consecutivos con todo el dataset en el orden del fichero, sin tenerlo nunca entero
+    en memoria: `filas` por lote (por defecto, las que caben en memoria_mb). Desde el Arrow mapeado
+    cada lote es un trozo sin copia hasta la conversión a pandas; sin él, se lee el CSV por bloques.
+    """
+    path_csv = path_csv or PATH_CSV
+    tabla = tabla_mapeada(columnas, path_csv, path_arrow)
+    if tabla is not None:
+        filas = filas or filas_en_memoria(_bytes_fila(tabla), memoria_mb)
+        for inicio in range(0, tabla.num_rows, filas):
+            yield tabla.slice(inicio, filas).to_pandas(split_blocks=True)
+        return
+    if not os.path.exists(path_csv): return
+    for bloque in _bloques_csv(path_csv, columnas, memoria_mb or MEMORIA_LECTOR_MB):
+        for inicio in range(0, bloque.num_rows, filas or bloque.num_rows):
+            yield bloque.slice(inicio, filas or bloque.num_rows).to_pandas(split_blocks=True)
+
+def tomar(tabla, indices):
+    """
+    Filas `indices` de la tabla (mapeada o en memoria) como pyarrow.Table, agrupadas por trozo en el
+    orden del fichero. Table.take concatena primero cada columna entera (copiaría el dataset):
+    aquí cada trozo toma solo sus filas.
+    """
+    lotes = tabla.to_batches()
+    limites = np.cumsum([l.num_rows for l in lotes])
+    indices = np.sort(np.asarray(indices, dtype=np.int64))
+    trozo = np.searchsorted(limites, indices, side='right')
+    cortes = np.flatnonzero(np.diff(trozo)) + 1
+    partes = [lotes[t[0]].take(pa.array(i - (limites[t[0]] - lotes[t[0]].num_rows)))
+              for i, t in zip(np.split(indices, cortes), np.split(trozo, cortes)) if len(i)]
+    return pa.Table.from_batches(partes, schema=tabla.schema)
+
+def _reservorio(k, rng, columnas, memoria_mb, path_csv):
+    """
+    Muestra uniforme de k filas del CSV en una sola pasada (algoritmo R, vectorizado por bloque).
+    Con k=None (o más de las que caben), tantas como quepan en memoria_mb.
+    """
+    reserva, vistas = None, 0
+    for bloque in _bloques_csv(path_csv, columnas, memoria_mb):
+        if not vistas:  #Un cuarto del techo: al sustituir filas, take copia la reserva, y luego va a pandas
+            k = min(k or np.iinfo(np.int64).max, filas_en_memoria(_bytes_fila(bloque), memoria_mb / 4))
+        m = bloque.num_rows
+        posiciones = np.arange(vistas, vistas + m)
+        #La fila t entra en la plaza t mientras hay sitio; después, en la plaza j ~ U[0, t] si j < k
+        plazas = np.where(posiciones < k, posiciones, (rng.random(m) * (posiciones + 1)).astype(np.int64))
+        entran = np.flatnonzero(plazas < k)
+        vistas += m
+        if not len(entran): continue
+        #Si dos filas del bloque caen en la misma plaza gana la última, como en el recorrido fila a fila
+        plazas_unicas, ultima = np.unique(plazas[entran][::-1], return_index=True)
+        filas_bloque = entran[::-1][ultima]
+        actuales = 0 if reserva is None else reserva.num_rows
+        indices = np.arange(max(actuales, int(plazas_unicas[-1]) + 1))
+        indices[plazas_unicas] = actuales + filas_bloque
+        reserva = (bloque if reserva is None else pa.concat_tables([reserva, bloque])).take(indices)
+    return reserva
+
+def muestra(k, semilla=None, columnas=None, memoria_mb=None, path_csv=None, path_arrow=None):
+    """
+    DataFrame con k filas al azar sin reemplazo (como mucho las que caben en memoria_mb; con
+    k=None, esas).
+    Con el Arrow mapeado se eligen k índices y solo se leen esas filas (en el orden del fichero);
+    sin él, muestreo de reservorio en una pasada por el CSV. None si no hay datos.
+    """
+    path_csv = path_csv or PATH_CSV
+    rng = np.random.default_rng(semilla)
+    tabla = tabla_mapeada(columnas, path_csv, path_arrow)
+    if tabla is not None:
+        k = min(k or tabla.num_rows, tabla.num_rows, filas_en_memoria(_bytes_fila(tabla), memoria_mb))
+        return tomar(tabla, rng.choice(tabla.num_rows, k, replace=False)).to_pandas(split_blocks=True)
+    if not os.path.exists(path_csv): return None
+    reserva = _reservorio(k, rng, columnas, memoria_mb or MEMORIA_LECTOR_MB, path_csv)
+    return None if reserva is None else reserva.to_pandas(split_blocks=True)
+
+def lecturas_aleatorias(tam_lote, semilla=None, columnas=None, memoria_mb=None, path_csv=None, path_arrow=None):
+    """
+    Generador infinito de lotes de tam_lote filas al azar con reemplazo (como random.choice sobre
+    todo el dataset, en el orden del fichero dentro de cada lote). Con el Arrow mapeado cada lote
+    lee solo sus filas; sin él, se sortea sobre
+    una muestra de reservorio que cabe en memoria_mb y que se renueva (otra pasada por el CSV)
+    cada vez que se han servido tantas lecturas como tiene.
+    """
+    path_csv = path_csv or PATH_CSV
+    rng = np.random.default_rng(semilla)
+    tabla = tabla_mapeada(columnas, path_csv, path_arrow)
+    if tabla is not None:
+        while tabla.num_rows:
+            yield tomar(tabla, rng.integers(0, tabla.num_rows, tam_lote)).to_pandas(split_blocks=True)
+        return
+    if not os.path.exists(path_csv): return
+    while True:
+        reserva = _reservorio(None, rng, columnas, memoria_mb or MEMORIA_LECTOR_MB, path_csv)
+        if reserva is None or not reserva.num_rows: return
+        for _ in range(max(1, reserva.num_rows // tam_lote)):
+            yield tomar(reserva, rng.integers(0, reserva.num_rows, tam_lote)).to_pandas(split_blocks=True)
+
+def clientes_al_azar(k, semilla=None, memoria_mb=None, path_csv=None, path_arrow=None):
+    """
+    Lista de hasta k POLISSA_SUBM distintos al azar (en orden aleatorio), en una pasada por bloques
+    y sin reunir la columna entera: cada cliente recibe una prioridad pseudoaleatoria (hash con
+    clave de la semilla) y se quedan los k de prioridad más baja. Un cliente repetido tiene siempre
+    la misma prioridad, así que cada distinto cuenta una vez. Memoria O(k), ~80 B por cliente.
+    """
+    path_csv = path_csv or PATH_CSV
+    clave = f'{np.random.default_rng(semilla).integers(2**63):016x}'
+    tabla = tabla_mapeada([COL_CLIENTE], path_csv, path_arrow)
+    if tabla is not None:
+        bloques = tabla.to_batches()
+    elif os.path.exists(path_csv):
+        bloques = (b for t in _bloques_csv(path_csv, [COL_CLIENTE], memoria_mb or MEMORIA_LECTOR_MB) for b in t.to_batches())
+    else:
+        return []
+    ids, prioridad = np.empty(0, dtype=object), np.empty(0, dtype=np.uint64)
+    for bloque in bloques:
+        for inicio in range(0, bloque.num_rows, 1 << 16):  #Trozos de 64k filas: acota los str de Python vivos
+            col = pc.unique(bloque.column(0).slice(inicio, 1 << 16))
+            if pa.types.is_dictionary(col.type): col = col.dictionary_decode()
+            nuevos = col.drop_null().cast(pa.string()).to_numpy(zero_copy_only=False)
+            p = pd.util.hash_array(nuevos, hash_key=clave, categorize=False)
+            if len(ids) >= k:  #Llena: solo entran los que mejoran la peor prioridad guardada
+                mejoran = p < prioridad[-1]
+                nuevos, p = nuevos[mejoran], p[mejoran]
+                if not len(p): continue
+            ids, prioridad = np.concatenate([ids, nuevos]), np.concatenate([prioridad, p])
+            orden = np.argsort(prioridad, kind='stable')
+            ids, prioridad = ids[orden], prioridad[orden]
+            #Mismo cliente, misma prioridad: las repeticiones quedan contiguas
+            repetido = np.zeros(len(ids), dtype=bool)
+            repetido[1:] = (prioridad[1:] == prioridad[:-1]) & (ids[1:] == ids[:-1])
+            ids, prioridad = ids[~repetido][:k], prioridad[~repetido][:k]
+    return ids.tolist()
+
+#LECTURA EN ORDEN CRONOLÓGICO (replay, memoria acotada)
+def _claves_cronologicas(trozos, clientes, desde, hasta):
+    """
+    Posición en el fichero, fecha (ns) y rango de la póliza en orden de texto de las lecturas de
+    [desde, hasta] y de esos clientes, a partir de trozos (DataFrames) con solo la fecha y la póliza.
+    ~20 B por lectura: las pólizas se guardan como códigos y su texto una vez por cliente.
+    """
+    clientes = {str(c) for c in clientes} if clientes else None
+    filas, fechas, codigos, mapa = [], [], [], {}
+    inicio = sin_fecha = 0
+    for trozo in trozos:
+        fecha = pd.to_datetime(trozo[COL_FECHA], errors='coerce')
+        cliente = trozo[COL_CLIENTE].astype(str)
+        valido = fecha.notna().to_numpy()
+        sin_fecha += int((~valido).sum())
+        if desde is not None: valido &= (fecha >= pd.Timestamp(desde)).to_numpy()
+        if hasta is not None: valido &= (fecha <= pd.Timestamp(hasta)).to_numpy()
+        if clientes is not None: valido &= cliente.isin(clientes).to_numpy()
+        cat = pd.Categorical(cliente[valido])
+        globales = np.array([mapa.setdefault(c, len(mapa)) for c in cat.categories], dtype=np.int32)
+        filas.append(inicio + np.flatnonzero(valido))
+        fechas.append(fecha[valido].to_numpy(dtype='datetime64[ns]').view(np.int64))
+        codigos.append(globales[cat.codes] if len(globales) else np.empty(0, dtype=np.int32))
+        inicio += len(trozo)
+    if sin_fecha: print(f"⚠️ {sin_fecha} lecturas sin {COL_FECHA} válida descartadas.")
+    if not filas: return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+    rango = np.empty(len(mapa), dtype=np.int32)
+    rango[np.argsort(np.array(list(mapa), dtype=object), kind='stable')] = np.arange(len(mapa), dtype=np.int32)
+    codigos = np.concatenate(codigos)
+    return np.concatenate(filas), np.concatenate(fechas), rango[codigos] if len(codigos) else codigos
+
+def _filas_csv(path_csv, posiciones, memoria_mb):
+    """Filas `posiciones` (ordenadas) del CSV en una pasada por bloques, parando tras la última."""
+    partes, inicio = [], 0
+    for bloque in _bloques_csv(path_csv, None, memoria_mb):
+        fin = inicio + bloque.num_rows
+        a, b = np.searchsorted(posiciones, [inicio, fin])
+        if b > a: partes.append(bloque.take(pa.array(posiciones[a:b] - inicio)))
+        inicio = fin
+        if b == len(posiciones): break
+    return pa.concat_tables(partes)
+
+def iterar_cronologico(datos=None, clientes=None, desde=None, hasta=None, filas=None, memoria_mb=None, path_csv=None, path_arrow=None):
+    """
+    (fechas, DataFrame) con las lecturas de FECHA_HORA_CRONO en [desde, hasta] (y de esos clientes)
+    en orden cronológico, con empates por póliza y posición en el fichero, en ventanas de instantes
+    completos de unas `filas` lecturas (por defecto, las que caben en memoria_mb). fechas es el
+    datetime64[ns] de cada fila. Primero se leen y ordenan solo la fecha y la póliza del rango; cada
+    ventana toma después solo sus filas: de datos (un DataFrame ya en memoria), del Arrow mapeado,
+    o sin él con una pasada por bloques del CSV. Las lecturas sin fecha válida se descartan.
+    """
+    path_csv, memoria_mb = path_csv or PATH_CSV, memoria_mb or MEMORIA_LECTOR_MB
+    tabla = None
+    if datos is not None:
+        trozos, bytes_fila = [datos[[COL_FECHA, COL_CLIENTE]]], datos.memory_usage(deep=False).sum() / max(len(datos), 1)
+    else:
+        tabla = tabla_mapeada(None, path_csv, path_arrow)
+        if tabla is not None:
+            trozos, bytes_fila = (b.to_pandas() for b in tabla.select([COL_FECHA, COL_CLIENTE]).to_batches()), _bytes_fila(tabla)
+        elif os.path.exists(path_csv):
+            primero = next(_bloques_csv(path_csv, None, memoria_mb), None)
+            if primero is None: return
+            trozos = (t.to_pandas() for t in _bloques_csv(path_csv, [COL_FECHA, COL_CLIENTE], memoria_mb))
+            bytes_fila = _bytes_fila(primero)
+            del primero
+        else:
+            return
+    posiciones, fechas, clave_cliente = _claves_cronologicas(trozos, clientes, desde, hasta)
+    if not len(posiciones): return
+    orden = np.lexsort((posiciones, clave_cliente, fechas))
+    posiciones, fechas = posiciones[orden], fechas[orden]
+    del clave_cliente, orden
+
+    #Fronteras entre instantes: una ventana nunca parte un instante (se puntúa junto)
+    fronteras = np.append(np.flatnonzero(fechas[1:] != fechas[:-1]) + 1, len(fechas))
+    filas = filas or filas_en_memoria(bytes_fila, memoria_mb)
+    a = 0
+    while a < len(fechas):
+        b = fronteras[np.searchsorted(fronteras, a + filas, side='right') - 1]
+        if b <= a: b = fronteras[np.searchsorted(fronteras, a, side='right')]
+        pos = posiciones[a:b]
+        if datos is not None:
+            ventana = datos.iloc[pos]
+        else:
+            ordenadas = np.sort(pos)
+            leidas = tomar(tabla, ordenadas) if tabla is not None else _filas_csv(path_csv, ordenadas, memoria_mb)
+            ventana = leidas.to_pandas(split_blocks=True).iloc[np.searchsorted(ordenadas, pos)]
+        yield fechas[a:b].view('datetime64[ns]'), ventana.reset_index(drop=True)
+        a = b
+
+def num_filas(path_csv=None, path_arrow=None):
+    """Filas del dataset (del Arrow sin leer datos; del CSV contando líneas por bloques)."""
+    path_csv = path_csv or PATH_CSV
+    tabla = tabla_mapeada([], path_csv, path_arrow)
+    if tabla is not None: return tabla.num_rows
+    if not os.path.exists(path_csv): return 0
+    #La última línea puede no acabar en salto de línea
+    return sum(bytes(trozo).count(b'\n') + (bytes(trozo[-1:]) != b'\n') for trozo in _trozos_csv(path_csv, MEMORIA_LECTOR_MB))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dataset columnar de datos_simulacion_features")
+    sub = parser.add_subparsers(dest='accion', required=True)
+    p_imp = sub.add_parser('importar', help="Convierte el CSV al fichero Arrow")
+    p_imp.add_argument('--csv', default=PATH_CSV)
+    p_imp.add_argument('--destino', default=PATH_ARROW)
+    p_imp.add_argument('--memoria-mb', type=float, default=None, help=f"Techo de memoria de la importación (defecto {MEMORIA_LECTOR_MB:g})")
+    sub.add_parser('info', help="Columnas, tipos y tamaño del fichero Arrow")
+    args = parser.parse_args()
+
+    if args.accion == 'importar':
+        if not os.path.exists(args.csv):
+            print(f"❌ No se encuentra el CSV: {args.csv}")
+            sys.exit(1)
+        t0 = time.perf_counter()
+        tabla = importar_csv(args.csv, args.destino, args.memoria_mb)
+        print(f"✅ {tabla.num_rows} filas importadas en {time.perf_counter() - t0:.1f}s: "
+              f"CSV {os.path.getsize(args.csv) / 2**20:.0f} MB -> Arrow {os.path.getsize(args.destino) / 2**20:.0f} MB")
+    else:
+        if not os.path.exists(PATH_ARROW):
+            print(f"❌ No existe {PATH_ARROW}")
+            sys.exit(1)
+        tabla = feather.read_table(PATH_ARROW, memory_map=True)
+        print(f"{tabla.num_rows} filas, {os.path.getsize(PATH_ARROW) / 2**20:.0f} MB")
+        for campo in tabla.schema: print(f"  {campo.name:<32} {campo.type}")
@@ -0,0 +1,135 @@
+# src/escritor_alertas.py
+# Escritor único de alertas con group commit: un hilo dedicado saca las alertas de una cola y las
+# guarda en grupos, una transacción (un commit, un fsync con synchronous=FULL) por grupo en vez de
+# una por alerta. Un grupo son las alertas que se han acumulado en la cola mientras se confirmaba el
+# anterior, hasta max_grupo: sin ráfaga cada alerta va sola y sin esperas; en una ráfaga los grupos
+# crecen solos. Con max_espera > 0, además se espera hasta ese tiempo a que lleguen más.
+# Quien envía recibe un concurrent.futures.Future con el resultado de la alerta (incluye
+# 'incidencia_id').
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+_FIN = object()
+
+class EscritorAlertas:
+    """
+    conectar(): conexión SQLite propia del hilo escritor (se abre en el hilo).
+    registrar(cursor, alerta): aplica una alerta sin commit y retorna su resultado.
+    deshacer(alertas): opcional, avisa de las alertas de una transacción deshecha.
+    Si un grupo falla, se deshace y se reintenta alerta a alerta: solo fallan los futures
+    de las alertas que fallan por sí solas.
+    """
+
+    def __init__(self, conectar, registrar, max_grupo=256, max_espera=0.0, nombre='gesai-escritor-alertas', deshacer=None):
+        self.conectar = conectar
+        self.registrar = registrar
+        self.deshacer = deshacer
+        self.max_grupo = max(1, int(max_grupo))
+        self.max_espera = float(max_espera)
+        self._cola = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self.alertas = self.commits = self.errores = self.reintentos = self.grupo_max = 0
+        self.t_commit = 0.0
+        self.inicio = time.perf_counter()
+        self.pid = os.getpid()  #Tras un fork el hilo no existe en el hijo
+        self._hilo = threading.Thread(target=self._bucle, name=nombre, daemon=True)
+        self._hilo.start()
+
+    @property
+    def vivo(self):
+        return self._hilo.is_alive()
+
+    def enviar(self, alerta):
+        futuro = Future()
+        self._cola.put((alerta, futuro))
+        return futuro
+
+    def enviar_varias(self, alertas):
+        return [self.enviar(a) for a in alertas]
+
+    def _grupo(self, primero):
+        grupo = [primero]
+        limite = time.monotonic() + self.max_espera
+        while len(grupo) < self.max_grupo:
+            try:
+                #Lo que ya está en cola entra sin esperar; después, como mucho hasta el límite
+                item = self._cola.get_nowait()
+            except queue.Empty:
+                restante = limite - time.monotonic()
+                if restante <= 0: break
+                try: item = self._cola.get(timeout=restante)
+                except queue.Empty: break
+            if item is _FIN:
+                self._cola.put(_FIN)
+                break
+            grupo.append(item)
+        return grupo
+
+    def _aplicar(self, conn, grupo):
+        cur = conn.cursor()
+        resultados = [self.registrar(cur, alerta) for alerta, _ in grupo]
+        t0 = time.perf_counter()
+        conn.commit()
+        with self._lock:
+            self.t_commit += time.perf_counter() - t0
+            self.commits += 1
+        return resultados
+
+    def _rollback(self, conn, grupo):
+        conn.rollback()
+        if self.deshacer: self.deshacer([alerta for alerta, _ in grupo])
+
+    def _bucle(self):
+        try:
+            conn, error = self.conectar(), None
+        except Exception as e:  #Shard que falta, BBDD bloqueada al migrar...
+            conn, error = None, e
+        if conn is None:  #Sin BBDD: cada alerta falla en vez de dejar a quien espera colgado
+            while (item := self._cola.get()) is not _FIN:
+                item[1].set_exception(RuntimeError(f"Sin conexión a la BBDD{f': {error}' if error else ''}"))
+            return
+        try:
+            while True:
+                item = self._cola.get()
+                if item is _FIN: return
+                grupo = self._grupo(item)
+                try:
+                    resultados = self._aplicar(conn, grupo)
+                except Exception:
+                    self._rollback(conn, grupo)
+                    with self._lock: self.reintentos += 1
+                    resultados = []
+                    for alerta, futuro in grupo:
+                        try:
+                            resultados.extend(self._aplicar(conn, [(alerta, futuro)]))
+                        except Exception as e:
+                            self._rollback(conn, [(alerta, futuro)])
+                            with self._lock: self.errores += 1
+                            futuro.set_exception(e)
+                            resultados.append(None)
+                for (_, futuro), res in zip(grupo, resultados):
+                    if res is not None: futuro.set_result(res)
+                with self._lock:
+                    self.alertas += len(grupo)
+                    self.grupo_max = max(self.grupo_max, len(grupo))
+        finally:
+            conn.close()
+
+    def cerrar(self, timeout=None):
+        """Termina de escribir lo encolado y para el hilo."""
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        with self._lock:
+            segundos = max(time.perf_counter() - self.inicio, 1e-9)
+            return {
+                'alertas': self.alertas, 'commits': self.commits, 'errores': self.errores, 'reintentos': self.reintentos,
+                'grupo_medio': self.alertas / self.commits if self.commits else 0.0, 'grupo_max': self.grupo_max,
+                'alertas_s': self.alertas / segundos, 'commits_s': self.commits / segundos,
+                'ms_por_commit': self.t_commit / self.commits * 1000 if self.commits else 0.0,
+            }
@@ -0,0 +1,251 @@
+# src/evaluador_arboles.py
+# Evaluador NumPy de los boosters LightGBM (sin pasar por el wrapper ctypes).
+
+import numpy as np
+
+#Tipos de columna derivada (cómo se trata el valor original antes de comparar)
+COL_NUM = 0          # NaN -> 0.0 (missing_type None)
+COL_ZERO_IZQ = 1     # 0 / NaN -> -inf (missing_type Zero, default izquierda)
+COL_ZERO_DER = 2     # 0 / NaN -> +inf (missing_type Zero, default derecha)
+COL_NAN_IZQ = 3      # NaN -> -inf (missing_type NaN, default izquierda)
+COL_NAN_DER = 4      # NaN -> +inf (missing_type NaN, default derecha)
+COL_CAT = 5          # 0.0 si la categoría está en el bitset (va a la izquierda), 1.0 si no
+
+K_ZERO_THRESHOLD = 1e-35  #Mismo umbral que LightGBM (kZeroThreshold)
+TAM_BLOQUE = 64           #Filas por bloque (la matriz de decisiones es num_nodos x bloque)
+
+CAMPOS = ['col_origen', 'col_tipo', 'col_cat_inicio', 'col_cat_len', 'cat_bits',
+          'feature', 'umbral', 'mascara', 'hoja_inicio', 'valor', 'arbol_inicio', 'meta']
+
+
+class ModeloCompilado:
+    """
+    Árboles de varios boosters aplanados en arrays contiguos (esquema tipo QuickScorer).
+
+    Cada split de LightGBM (numérico con su missing_type o categórico con su bitset)
+    se reescribe como `x'[feature] <= umbral` sobre una columna derivada x'.
+    Los nodos internos de cada árbol ocupan P posiciones consecutivas (con relleno):
+    - feature, umbral: split de cada nodo (relleno: umbral +inf, siempre "izquierda").
+    - mascara: bits de las hojas que siguen siendo alcanzables si el nodo va a la DERECHA
+      (se apagan las hojas de su subárbol izquierdo). La hoja de salida es el bit más
+      bajo que sobrevive al AND de todas las máscaras del árbol.
+    - hoja_inicio / valor: valores de hoja de cada árbol, en orden izquierda-derecha.
+    - arbol_inicio: rango de árboles de cada booster (horizonte).
+    - col_*: definición de las columnas derivadas a partir de las features originales.
+    Así toda la evaluación son operaciones NumPy sobre arrays contiguos, sin traversal.
+    """
+
+    def __init__(self, arrays, horizontes):
+        for k in CAMPOS: setattr(self, k, arrays[k])
+        self.horizontes = list(horizontes)
+        self.num_features = int(self.meta[0])
+        self.nodos_por_arbol = int(self.meta[1])
+        self.sigmoid = float(self.meta[2])
+        self.num_arboles = len(self.hoja_inicio)
+        self._todo_unos = self.mascara.dtype.type(np.iinfo(self.mascara.dtype).max)
+        self._grupos = [(t, np.flatnonzero(self.col_tipo == t)) for t in np.unique(self.col_tipo)]
+
+    def arrays(self):
+        """Diccionario nombre -> array (formato de volcado a disco)."""
+        return {k: getattr(self, k) for k in CAMPOS}
+
+    def _columnas_derivadas(self, X):
+        """Matriz (num_columnas_derivadas, n) sobre la que se evalúan todos los nodos."""
+        Xd = np.empty((len(self.col_origen), len(X)), dtype=np.float64)
+        for tipo, cols in self._grupos:
+            x = X[:, self.col_origen[cols]].T
+            es_nan = np.isnan(x)
+            if tipo == COL_CAT:
+                valido = ~es_nan & (x >= 0)
+                cint = np.trunc(np.where(valido, np.minimum(x, 2**31), 0)).astype(np.int64)
+                palabra = cint // 32
+                valido &= palabra < self.col_cat_len[cols, None]
+                bits = self.cat_bits[self.col_cat_inicio[cols, None] + np.where(valido, palabra, 0)]
+                dentro = valido & (((bits >> (cint % 32).astype(np.uint32)) & 1) == 1)
+                Xd[cols] = np.where(dentro, 0.0, 1.0)
+            elif tipo in (COL_NAN_IZQ, COL_NAN_DER):
+                Xd[cols] = np.where(es_nan, -np.inf if tipo == COL_NAN_IZQ else np.inf, x)
+            else:
+                v = np.where(es_nan, 0.0, x)
+                if tipo != COL_NUM:
+                    v = np.where(np.abs(v) <= K_ZERO_THRESHOLD, -np.inf if tipo == COL_ZERO_IZQ else np.inf, v)
+                Xd[cols] = v
+        return Xd
+
+    def _hojas(self, X):
+        """Valor de la hoja de salida de cada fila en cada árbol: (num_arboles, n)."""
+        n = len(X)
+        Xd = self._columnas_derivadas(X)
+        izquierda = Xd[self.feature] <= self.umbral[:, None]
+        #Nodo a la izquierda -> no apaga nada (todo unos); a la derecha -> su máscara
+        M = self.mascara[:, None] | np.negative(izquierda.astype(self.mascara.dtype))
+        V = np.bitwise_and.reduce(M.reshape(self.num_arboles, self.nodos_por_arbol, n), axis=1)
+        bit_bajo = V & (~V + self.mascara.dtype.type(1))
+        idx = np.frexp(bit_bajo.astype(np.float64))[1] - 1
+        return self.valor[self.hoja_inicio[:, None] + idx]
+
+    def predecir_raw(self, X):
+        """Score bruto (num_horizontes, n) sumando las hojas árbol a árbol."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1: X = X[None, :]
+        if X.shape[1] != self.num_features:
+            raise ValueError(f"Se esperaban {self.num_features} features, llegan {X.shape[1]}")
+        salida = np.empty((len(self.horizontes), len(X)), dtype=np.float64)
+        for ini in range(0, len(X), TAM_BLOQUE):
+            valores = self._hojas(X[ini:ini + TAM_BLOQUE])
+            #cumsum acumula en orden secuencial, igual que LightGBM (sum() usaría suma por pares)
+            for h in range(len(self.horizontes)):
+                salida[h, ini:ini + valores.shape[1]] = np.cumsum(valores[self.arbol_inicio[h]:self.arbol_inicio[h + 1]], axis=0)[-1]
+        return salida
+
+    def predecir(self, X):
+        """Probabilidad de la clase positiva (num_horizontes, n), como predict_proba[:, 1]."""
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * self.predecir_raw(X)))
+
+
+def _bitset(categorias):
+    """Bitset uint32 (como Common::ConstructBitset) de una lista de categorías."""
+    bits = np.zeros(max(categorias) // 32 + 1, dtype=np.uint32)
+    for c in categorias: bits[c // 32] |= np.uint32(1 << (c % 32))
+    return bits
+
+
+def compilar_boosters(boosters, horizontes):
+    """
+    Lee dump_model() de cada booster y aplana todos sus árboles en un ModeloCompilado.
+    Los boosters deben ser binarios con salida sigmoide, mismas features y <= 64 hojas por árbol.
+    """
+    columnas = {}            # (feature, tipo, categorías) -> índice de columna derivada
+    col_cat = []             # bitsets de las columnas categóricas
+    arboles = []             # por árbol: (lista de nodos (col, umbral, hojas_izq), valores de hoja)
+    arbol_inicio = [0]
+    sigmoid, num_features = None, None
+
+    def columna(f, tipo, cats=()):
+        clave = (f, tipo, cats)
+        if clave not in columnas:
+            columnas[clave] = len(columnas)
+            col_cat.append(_bitset(list(cats)) if tipo == COL_CAT else None)
+        return columnas[clave]
+
+    def aplanar(nodo, nodos, hojas):
+        """Recorre en profundidad (izquierda primero); devuelve las hojas del subárbol."""
+        if 'split_feature' not in nodo:
+            hojas.append(float(nodo.get('leaf_value', 0.0)))
+            return [len(hojas) - 1]
+        f = int(nodo['split_feature'])
+        izq_defecto = bool(nodo['default_left'])
+        if nodo['decision_type'] == '==':
+            cats = tuple(sorted(int(c) for c in str(nodo['threshold']).split('||')))
+            col, thr = columna(f, COL_CAT, cats), 0.5
+        else:
+            tipo = {'None': COL_NUM,
+                    'Zero': COL_ZERO_IZQ if izq_defecto else COL_ZERO_DER,
+                    'NaN': COL_NAN_IZQ if izq_defecto else COL_NAN_DER}[nodo['missing_type']]
+            col, thr = columna(f, tipo), float(nodo['threshold'])
+        registro = [col, thr, None]
+        nodos.append(registro)
+        izq = aplanar(nodo['left_child'], nodos, hojas)
+        der = aplanar(nodo['right_child'], nodos, hojas)
+        registro[2] = izq
+        return izq + der
+
+    for booster in boosters:
+        modelo = booster.dump_model()
+        objetivo = modelo['objective'].split()
+        if objetivo[0] != 'binary' or modelo['num_tree_per_iteration'] != 1:
+            raise ValueError(f"Objetivo no soportado: {modelo['objective']}")
+        s = float(dict(p.split(':') for p in objetivo[1:]).get('sigmoid', 1.0))
+        if sigmoid not in (None, s) or num_features not in (None, modelo['max_feature_idx'] + 1):
+            raise ValueError("Los boosters no comparten sigmoid / número de features")
+        sigmoid, num_features = s, modelo['max_feature_idx'] + 1
+        for arbol in modelo['tree_info']:
+            nodos, hojas = [], []
+            aplanar(arbol['tree_structure'], nodos, hojas)
+            arboles.append((nodos, hojas))
+        arbol_inicio.append(len(arboles))
+
+    max_hojas = max(len(h) for _, h in arboles)
+    if max_hojas > 64:
+        raise ValueError(f"Árboles de {max_hojas} hojas: el evaluador admite hasta 64")
+    dtype = np.uint32 if max_hojas <= 32 else np.uint64
+    todo_unos = int(np.iinfo(dtype).max)
+    P = max(1, max(len(n) for n, _ in arboles))
+    T = len(arboles)
+
+    feature = np.zeros((T, P), dtype=np.int64)
+    umbral = np.full((T, P), np.inf)
+    mascara = np.full((T, P), todo_unos, dtype=dtype)
+    hoja_inicio, valor = np.zeros(T, dtype=np.int64), []
+    for t, (nodos, hojas) in enumerate(arboles):
+        for k, (col, thr, hojas_izq) in enumerate(nodos):
+            feature[t, k], umbral[t, k] = col, thr
+            mascara[t, k] = todo_unos & ~sum(1 << h for h in hojas_izq)
+        hoja_inicio[t] = len(valor)
+        valor.extend(hojas)
+
+    specs = sorted(columnas.items(), key=lambda kv: kv[1])
+    cat_inicio, cat_len, bits = [], [], []
+    for _, k in specs:
+        b = col_cat[k] if col_cat[k] is not None else np.zeros(0, dtype=np.uint32)
+        cat_inicio.append(sum(len(x) for x in bits)); cat_len.append(len(b)); bits.append(b)
+
+    arrays = {
+        'col_origen': np.array([c[0] for c, _ in specs], dtype=np.int64),
+        'col_tipo': np.array([c[1] for c, _ in specs], dtype=np.int8),
+        'col_cat_inicio': np.array(cat_inicio, dtype=np.int64),
+        'col_cat_len': np.array(cat_len, dtype=np.int64),
+        'cat_bits': np.concatenate(bits + [np.zeros(1, dtype=np.uint32)]),
+        'feature': feature.ravel(),
+        'umbral': umbral.ravel(),
+        'mascara': mascara.ravel(),
+        'hoja_inicio': hoja_inicio,
+        'valor': np.array(valor, dtype=np.float64),
+        'arbol_inicio': np.array(arbol_inicio, dtype=np.int64),
+        'meta': np.array([num_features, P, sigmoid], dtype=np.float64),
+    }
+    return ModeloCompilado(arrays, horizontes)
+
+
+def comprobar_equivalencia(compilado, boosters, X):
+    """
+    Compara el evaluador NumPy con Booster.predict (== predict_proba[:, 1]).
+    Retorna la diferencia absoluta máxima entre ambas probabilidades.
+    """
+    referencia = np.vstack([b.predict(X, raw_score=False) for b in boosters])
+    return float(np.max(np.abs(compilado.predecir(X) - referencia)))
+
+
+def guardar_compilado(compilado, directorio, extra=None):
+    """
+    Vuelca los arrays del ModeloCompilado como .npy (uno por campo) + compilado.json.
+    Se escribe en un directorio temporal y se renombra, para que ningún worker lea
+    un volcado a medias.
+    """
+    import json, os, shutil, tempfile
+    padre = os.path.dirname(os.path.abspath(directorio))
+    os.makedirs(padre, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.compilado-', dir=padre)
+    try:
+        for k, v in compilado.arrays().items():
+            np.save(os.path.join(tmp, f'{k}.npy'), np.ascontiguousarray(v))
+        with open(os.path.join(tmp, 'compilado.json'), 'w', encoding='utf-8') as f:
+            json.dump({'horizontes': compilado.horizontes, **(extra or {})}, f, ensure_ascii=False)
+        if os.path.exists(directorio): shutil.rmtree(directorio)
+        os.rename(tmp, directorio)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def cargar_compilado(directorio, mmap=True):
+    """
+    Carga un volcado de guardar_compilado. Con mmap=True los arrays son mapas de
+    memoria de solo lectura: los workers comparten las mismas páginas del fichero.
+    Retorna (ModeloCompilado, metadatos extra del json).
+    """
+    import json, os
+    with open(os.path.join(directorio, 'compilado.json'), encoding='utf-8') as f:
+        extra = json.load(f)
+    arrays = {k: np.load(os.path.join(directorio, f'{k}.npy'), mmap_mode='r' if mmap else None) for k in CAMPOS}
+    return ModeloCompilado(arrays, extra.pop('horizontes')), extra
@@ -0,0 +1,189 @@
+# src/gateway_ingesta.py
+# Pasarela de ingesta: servidor asyncio TCP que recibe lecturas de contadores en NDJSON
+# (una lectura JSON por línea, esquema de datos_simulacion_features.csv), las agrupa en
+# micro-lotes por tamaño o plazo, las puntúa con el motor y confirma cada línea.
+#   python src/gateway_ingesta.py --puerto 8765 --lote 500 --espera-ms 20
+#   --crudas: lecturas sin lags ni medias móviles; el motor de features en streaming las calcula.
+#
+# Respuesta: una línea JSON por lectura y en el mismo orden, {"n": nº de línea, "status", "message"},
+# enviada cuando la alerta (si la hay) ya está guardada en la BBDD.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from motor_gesai import evaluar_lote, evaluar_crudas, registrar_alertas, iniciar_buffer_consumo, _cargar_motor
+
+#CONFIG
+GATEWAY_HOST = os.environ.get('GESAI_GATEWAY_HOST', '127.0.0.1')
+GATEWAY_PUERTO = int(os.environ.get('GESAI_GATEWAY_PUERTO', 8765))
+TAM_LOTE = 500  #Lecturas máximas por micro-lote
+ESPERA_LOTE_MS = 20  #Plazo máximo desde la primera lectura del lote
+MAX_COLA = 10_000  #Lecturas pendientes de puntuar (backpressure hacia los clientes)
+MAX_ESCRITURAS_EN_VUELO = 4  #Lotes puntuados esperando al escritor
+MAX_LINEA = 1 << 20
+COL_CLIENTE = 'POLISSA_SUBM'
+
+class GatewayIngesta:
+    """
+    Un lector por conexión mete (lectura, futuro) en una cola acotada; una sola tarea
+    forma los micro-lotes y los puntúa en un hilo, y las alertas se escriben en otro
+    hilo (escritor único de SQLite) mientras se puntúa el lote siguiente.
+    """
+
+    def __init__(self, tam_lote=TAM_LOTE, espera_ms=ESPERA_LOTE_MS, max_cola=MAX_COLA, crudas=False):
+        self.tam_lote = tam_lote
+        self.crudas = crudas
+        self.espera = espera_ms / 1000
+        self.cola = asyncio.Queue(maxsize=max_cola)
+        self._puntuador = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gesai-puntuador')
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gesai-escritor')
+        self._escrituras = asyncio.Semaphore(MAX_ESCRITURAS_EN_VUELO)
+        self._en_vuelo = set()  #asyncio solo guarda referencias débiles a las tareas
+        self.lecturas = self.lotes = self.alertas = self.errores = 0
+
+    #MICRO-LOTES
+    async def _siguiente_lote(self):
+        """Espera la primera lectura y junta más hasta tam_lote o hasta agotar el plazo."""
+        lote = [await self.cola.get()]
+        limite = time.monotonic() + self.espera
+        while len(lote) < self.tam_lote:
+            #Primero lo que ya está en cola, sin ceder el bucle
+            while len(lote) < self.tam_lote and not self.cola.empty():
+                lote.append(self.cola.get_nowait())
+            restante = limite - time.monotonic()
+            if len(lote) >= self.tam_lote or restante <= 0: break
+            try: lote.append(await asyncio.wait_for(self.cola.get(), restante))
+            except asyncio.TimeoutError: break
+        return lote
+
+    def _puntuar(self, lecturas):
+        df = pd.DataFrame.from_records(lecturas)
+        if self.crudas: return evaluar_crudas(df, COL_CLIENTE)
+        conjunto = _cargar_motor()
+        #Columnas ausentes: NaN (numéricas -> 0, categóricas -> desconocida), como en _codificar_lote
+        if conjunto: df = df.reindex(columns=[COL_CLIENTE, *conjunto.esquema.columnas])
+        return evaluar_lote(df, COL_CLIENTE)
+
+    async def _procesar_lotes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = await self._siguiente_lote()
+            try:
+                resultados, alertas = await loop.run_in_executor(self._puntuador, self._puntuar, [l for l, _ in lote])
+            except Exception as e:
+                print(f"⚠️ Error puntuando lote: {e}")
+                self._resolver(lote, [{'status': 'ERROR', 'message': str(e)}] * len(lote))
+                continue
+            self.lotes += 1
+            self.lecturas += len(lote)
+            await self._escrituras.acquire()
+            tarea = asyncio.create_task(self._escribir(lote, resultados, alertas))
+            self._en_vuelo.add(tarea)
+            tarea.add_done_callback(self._en_vuelo.discard)
+
+    async def _escribir(self, lote, resultados, alertas):
+        try:
+            if alertas:
+                res = await asyncio.get_running_loop().run_in_executor(self._escritor, registrar_alertas, alertas)
+                for alerta, r in zip(alertas, res): resultados[alerta[0]] = r
+                self.alertas += len(alertas)
+        except Exception as e:
+            print(f"⚠️ Error guardando alertas: {e}")
+            for alerta in alertas: resultados[alerta[0]] = {'status': 'ERROR', 'message': str(e)}
+        finally:
+            self._escrituras.release()
+        self._resolver(lote, resultados)
+
+    @staticmethod
+    def _resolver(lote, resultados):
+        for (_, fut), r in zip(lote, resultados):
+            if not fut.done(): fut.set_result(r)
+
+    #CONEXIONES
+    async def _atender(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        pendientes = asyncio.Queue(maxsize=2 * self.tam_lote)  #Acks en orden de llegada
+        respondedor = asyncio.create_task(self._responder(writer, pendientes))
+        n = 0
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea: break
+                if not linea.strip(): continue
+                n += 1
+                fut = loop.create_future()
+                try:
+                    lectura = json.loads(linea)
+                    if not isinstance(lectura, dict): raise ValueError("se esperaba un objeto JSON")
+                    if lectura.get(COL_CLIENTE) is None: raise ValueError(f"falta {COL_CLIENTE}")
+                except ValueError as e:
+                    self.errores += 1
+                    fut.set_result({'status': 'ERROR', 'message': f'Lectura inválida: {e}'})
+                else:
+                    #Cola llena -> dejamos de leer el socket y el cliente nota la presión
+                    await self.cola.put((lectura, fut))
+                await pendientes.put((n, fut))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            print(f"⚠️ Conexión cerrada: {e}")
+        finally:
+            await pendientes.put(None)
+            await respondedor
+
+    @staticmethod
+    async def _responder(writer, pendientes):
+        try:
+            while (item := await pendientes.get()) is not None:
+                n, fut = item
+                writer.write((json.dumps({'n': n, **await fut}, ensure_ascii=False) + '\n').encode())
+                if pendientes.empty(): await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _informar(self, cada=5.0):
+        previas = 0
+        while True:
+            await asyncio.sleep(cada)
+            if self.lecturas != previas:
+                print(f"📥 {(self.lecturas - previas) / cada:8.0f} lecturas/s | lotes {self.lotes} "
+                      f"(media {self.lecturas / max(self.lotes, 1):.0f}) | alertas {self.alertas} | cola {self.cola.qsize()}")
+                previas = self.lecturas
+
+    async def servir(self, host=GATEWAY_HOST, puerto=GATEWAY_PUERTO, listo=None, informar=True):
+        #Modelos cargados antes de aceptar conexiones: la primera lectura no paga la carga
+        await asyncio.get_running_loop().run_in_executor(self._puntuador, _cargar_motor)
+        iniciar_buffer_consumo()
+        servidor = await asyncio.start_server(self._atender, host, puerto, limit=MAX_LINEA)
+        tareas = [asyncio.create_task(self._procesar_lotes())]
+        if informar: tareas.append(asyncio.create_task(self._informar()))
+        print(f"✅ Gateway de ingesta escuchando en {host}:{servidor.sockets[0].getsockname()[1]} "
+              f"(lote {self.tam_lote} / {self.espera * 1000:.0f} ms{', lecturas crudas' if self.crudas else ''})")
+        if listo is not None: listo(servidor.sockets[0].getsockname()[1])
+        try:
+            async with servidor: await servidor.serve_forever()
+        finally:
+            for t in tareas: t.cancel()
+            #Las escrituras ya lanzadas terminan: sus alertas se guardan y sus futures se resuelven
+            if self._en_vuelo: await asyncio.gather(*self._en_vuelo, return_exceptions=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="GeSAI: gateway de ingesta NDJSON con micro-lotes")
+    parser.add_argument('--host', default=GATEWAY_HOST)
+    parser.add_argument('--puerto', type=int, default=GATEWAY_PUERTO)
+    parser.add_argument('--lote', type=int, default=TAM_LOTE)
+    parser.add_argument('--espera-ms', type=float, default=ESPERA_LOTE_MS)
+    parser.add_argument('--max-cola', type=int, default=MAX_COLA)
+    parser.add_argument('--crudas', action='store_true', help="Calcular lags y medias móviles de cada cliente en streaming")
+    args = parser.parse_args()
+    try:
+        asyncio.run(GatewayIngesta(args.lote, args.espera_ms, args.max_cola, args.crudas).servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        print("\n🛑 Gateway detenido.")
@@ -0,0 +1,104 @@
+# src/historico_clientes.py
+# Histórico de consumo indexado por cliente: las lecturas (POLISSA_SUBM, FECHA_HORA_CRONO,
+# CONSUMO_REAL) del dataset de simulación se ordenan por cliente y fecha y se guardan como .npy
+# con un índice de clientes ordenado + offsets. Una consulta es una búsqueda binaria sobre
+# arrays con mmap: no se escanea el CSV.
+#   python src/historico_clientes.py construir [--csv ruta] [--destino dir]
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import dataset_features
+import almacen_versionado
+
+#CONFIG
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+PATH_DATOS_SIMULACION = os.path.join(BASE_DIR, 'data', 'processed-data', 'datos_simulacion_features.csv')
+HISTORICO_DIR = os.path.join(BASE_DIR, 'data', 'processed-data', 'historico_clientes')
+HORAS_HISTORICO = 720
+ARRAYS = ['clientes', 'offsets', 'fechas', 'consumo']
+
+def construir(path_csv=None, destino=None, tam_trozo=1_000_000):
+    """
+    Convierte el dataset en el almacén indexado (solo las 3 columnas, por trozos; del Arrow
+    mapeado si está al día con el CSV). Cada construcción es una versión nueva del almacén
+    (almacen_versionado): los lectores nunca ven uno a medias. Retorna (filas, clientes).
+    """
+    path_csv, destino = path_csv or PATH_DATOS_SIMULACION, destino or HISTORICO_DIR
+    tabla = dataset_features.cargar_tabla(['POLISSA_SUBM', 'FECHA_HORA_CRONO', 'CONSUMO_REAL'], path_csv=path_csv)
+    if tabla is None: raise FileNotFoundError(path_csv)
+    clientes, fechas, consumos = [], [], []
+    for lote in tabla.to_batches(max_chunksize=tam_trozo):
+        t = lote.to_pandas()
+        f = pd.to_datetime(t['FECHA_HORA_CRONO'], errors='coerce')
+        ok = f.notna().to_numpy()
+        clientes.append(t['POLISSA_SUBM'].astype(str).to_numpy(dtype=str)[ok])
+        fechas.append(f.to_numpy(dtype='datetime64[ns]')[ok].view(np.int64))
+        consumos.append(pd.to_numeric(t['CONSUMO_REAL'], errors='coerce').to_numpy(dtype=np.float64)[ok])
+    clientes, fechas, consumos = np.concatenate(clientes), np.concatenate(fechas), np.concatenate(consumos)
+
+    orden = np.lexsort((fechas, clientes))  #Por cliente y, dentro de cada uno, por fecha (estable)
+    clientes, fechas, consumos = clientes[orden], fechas[orden], consumos[orden]
+    unicos, inicios = np.unique(clientes, return_index=True)
+    offsets = np.append(inicios, len(clientes)).astype(np.int64)
+    del clientes, orden
+
+    def escribir(tmp):
+        for nombre, arr in zip(ARRAYS, (unicos, offsets, fechas, consumos)):
+            np.save(os.path.join(tmp, f'{nombre}.npy'), arr)
+        with open(os.path.join(tmp, 'manifiesto.json'), 'w', encoding='utf-8') as f:
+            json.dump({'origen': os.path.abspath(path_csv), 'huella': dataset_features.huella_csv(path_csv) if os.path.exists(path_csv) else None,
+                       'filas': int(len(fechas)), 'clientes': int(len(unicos))}, f)
+    almacen_versionado.publicar(destino, escribir, [f'{n}.npy' for n in ARRAYS] + ['manifiesto.json'])
+    return len(fechas), len(unicos)
+
+class HistoricoClientes:
+    """Almacén abierto con mmap (solo lectura). Las páginas se comparten entre procesos."""
+
+    def __init__(self, directorio=None):
+        directorio = almacen_versionado.dir_actual(directorio or HISTORICO_DIR)
+        with open(os.path.join(directorio, 'manifiesto.json'), encoding='utf-8') as f:
+            self.manifiesto = json.load(f)
+        for nombre in ARRAYS:
+            setattr(self, nombre, np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode='r'))
+
+    def vigente(self, path_csv):
+        """False si el CSV de origen ha cambiado desde la construcción (si no existe, el almacén vale)."""
+        return not os.path.exists(path_csv) or dataset_features.huella_csv(path_csv) == self.manifiesto['huella']
+
+    def consultar(self, cliente_id, horas=HORAS_HISTORICO):
+        """Últimas `horas` lecturas del cliente en orden cronológico: (fechas datetime64[ns], consumo)."""
+        cliente_id = str(cliente_id)
+        i = int(np.searchsorted(self.clientes, cliente_id))
+        if i == len(self.clientes) or self.clientes[i] != cliente_id:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty(0)
+        inicio, fin = int(self.offsets[i]), int(self.offsets[i + 1])
+        inicio = max(inicio, fin - horas)
+        return np.array(self.fechas[inicio:fin]).view('datetime64[ns]'), np.array(self.consumo[inicio:fin])
+
+def abrir(directorio=None):
+    """Abre el almacén, o None si no se ha construido."""
+    try:
+        return HistoricoClientes(directorio)
+    except (OSError, ValueError, KeyError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Histórico de consumo indexado por cliente")
+    sub = parser.add_subparsers(dest='accion', required=True)
+    p_con = sub.add_parser('construir', help="Construye / refresca el almacén a partir del CSV")
+    p_con.add_argument('--csv', default=PATH_DATOS_SIMULACION)
+    p_con.add_argument('--destino', default=HISTORICO_DIR)
+    args = parser.parse_args()
+
+    if not dataset_features.disponible(args.csv):
+        print(f"❌ No se encuentra el dataset: {args.csv}")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    filas, clientes = construir(args.csv, args.destino)
+    print(f"✅ Histórico construido en {args.destino}: {filas} lecturas de {clientes} clientes ({time.perf_counter() - t0:.1f}s)")
@@ -0,0 +1,192 @@
+# src/migraciones_bbdd.py
+# Migraciones versionadas de gesai.db: actualizan una BBDD existente en su sitio, sin borrarla.
+# La versión del esquema se guarda en PRAGMA user_version; cada migración se aplica una sola vez,
+# en orden y en su propia transacción (BEGIN IMMEDIATE: si la app y el simulador arrancan a la vez,
+# el segundo espera y ve la versión ya subida).
+#   python src/migraciones_bbdd.py [--bbdd gesai.db] [--estado]
+# Para cambiar el esquema: añadir una entrada al final de MIGRACIONES (nunca editar una ya publicada).
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DB_PATH = os.path.join(BASE_DIR, 'gesai.db')
+
+def _columna_modelo_version(conn):
+    columnas = {r[1] for r in conn.execute("PRAGMA table_info(incidencias)")}
+    if 'modelo_version' not in columnas:
+        conn.execute("ALTER TABLE incidencias ADD COLUMN modelo_version TEXT")
+
+def _una_incidencia_abierta(conn):
+    """
+    Una sola incidencia abierta (no RESUELTA) por cliente, garantizada por el esquema.
+    Las duplicadas que dejó la carrera SELECT + INSERT se cierran antes de crear el índice único:
+    se queda abierta la más reciente y las demás pasan a RESUELTA (sin token, para que un enlace
+    antiguo no las reabra).
+    """
+    abierta_reciente = "(SELECT MAX(j.id) FROM incidencias j WHERE j.cliente_id = incidencias.cliente_id AND j.verificacion != 'RESUELTA')"
+    duplicadas = [r[0] for r in conn.execute(
+        f"SELECT id FROM incidencias WHERE verificacion != 'RESUELTA' AND id < {abierta_reciente}")]
+    if duplicadas:
+        conn.execute(f"""
+            UPDATE incidencias SET verificacion = 'RESUELTA', descripcion = descripcion || ' [Duplicada de #' || {abierta_reciente} || ']'
+            WHERE verificacion != 'RESUELTA' AND id < {abierta_reciente}
+        """)
+        conn.executemany("DELETE FROM tokens_verificacion WHERE incidencia_id = ?", [(i,) for i in duplicadas])
+    columnas = {r[1] for r in conn.execute("PRAGMA table_info(incidencias)")}
+    if 'actualizaciones' not in columnas:
+        conn.execute("ALTER TABLE incidencias ADD COLUMN actualizaciones INTEGER DEFAULT 0")
+    #Lo usa el ON CONFLICT de _registrar_alerta; sustituye al índice (cliente_id, verificacion)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_incidencias_abierta ON incidencias (cliente_id) WHERE verificacion != 'RESUELTA'")
+    conn.execute("DROP INDEX IF EXISTS idx_incidencias_cliente")
+    #Un token por incidencia (el último): el token se renueva con ON CONFLICT en vez de DELETE + INSERT
+    conn.execute("""
+        DELETE FROM tokens_verificacion WHERE incidencia_id IS NOT NULL
+        AND id NOT IN (SELECT MAX(id) FROM tokens_verificacion WHERE incidencia_id IS NOT NULL GROUP BY incidencia_id)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_tokens_incidencia ON tokens_verificacion (incidencia_id)")
+    conn.execute("DROP INDEX IF EXISTS idx_tokens_incidencia")
+    if duplicadas: print(f"⚠️ {len(duplicadas)} incidencias abiertas duplicadas marcadas como RESUELTA")
+
+def _clase_sql(fila=None):
+    """Clase de severidad de estado (la misma que antirrebote_alertas.clase_severidad)."""
+    estado = f"{fila}.estado" if fila else "estado"
+    return (f"CASE WHEN {estado} LIKE '%Grave%' THEN 'Grave' WHEN {estado} LIKE '%Moderada%' THEN 'Moderada' "
+            f"WHEN {estado} LIKE '%Leve%' THEN 'Leve' ELSE COALESCE({estado}, '') END")
+
+def _sumar_resumen(fila, delta):
+    return (f"INSERT INTO resumen_incidencias (clase, verificacion, total) VALUES ({_clase_sql(fila)}, COALESCE({fila}.verificacion, ''), {delta}) "
+            f"ON CONFLICT (clase, verificacion) DO UPDATE SET total = total + ({delta});")
+
+def _resumen_incidencias(conn):
+    """
+    Recuento de incidencias por clase de severidad y estado de verificación, mantenido por
+    triggers en la misma transacción que cada escritura: los KPI del dashboard salen de una
+    lectura de pocas filas, sea cual sea el número de incidencias.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_incidencias (
+            clase TEXT NOT NULL, verificacion TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (clase, verificacion)) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM resumen_incidencias")
+    conn.execute(f"""
+        INSERT INTO resumen_incidencias (clase, verificacion, total)
+        SELECT {_clase_sql('incidencias')}, COALESCE(verificacion, ''), COUNT(*) FROM incidencias GROUP BY 1, 2
+    """)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_resumen_alta AFTER INSERT ON incidencias BEGIN {_sumar_resumen('NEW', 1)} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_resumen_baja AFTER DELETE ON incidencias BEGIN {_sumar_resumen('OLD', -1)} END")
+    #Solo si cambia la clase o la verificación: refrescar la descripción o la fecha no toca el resumen
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_cambio AFTER UPDATE OF estado, verificacion ON incidencias
+        WHEN {_clase_sql('OLD')} IS NOT {_clase_sql('NEW')} OR OLD.verificacion IS NOT NEW.verificacion
+        BEGIN {_sumar_resumen('OLD', -1)} {_sumar_resumen('NEW', 1)} END
+    """)
+
+def _versiones_cambios(conn):
+    """
+    Contador de cambios por ámbito (incidencias, notificaciones) que sube con cada alta,
+    modificación o borrado: el dashboard y la vista móvil solo consultan cuando se ha movido.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS versiones_cambios (ambito TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID")
+    for tabla in ('incidencias', 'notificaciones'):
+        conn.execute("INSERT OR IGNORE INTO versiones_cambios (ambito, version) VALUES (?, 0)", (tabla,))
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_version_{tabla}_{evento.lower()} AFTER {evento} ON {tabla}
+                BEGIN UPDATE versiones_cambios SET version = version + 1 WHERE ambito = '{tabla}'; END
+            """)
+
+def _paginacion_incidencias(conn):
+    """
+    Listado paginado por (fecha_deteccion, id) con los filtros del dashboard en SQL: columna
+    virtual incidencias.clase (no ocupa espacio en la tabla) y un índice parcial por filtro, así
+    cada página es un salto en el índice sea cual sea el número de incidencias.
+    """
+    columnas = {r[1] for r in conn.execute("PRAGMA table_xinfo(incidencias)")}
+    if 'clase' not in columnas:
+        conn.execute(f"ALTER TABLE incidencias ADD COLUMN clase TEXT GENERATED ALWAYS AS ({_clase_sql()}) VIRTUAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_incidencias_clase_fecha ON incidencias (clase, fecha_deteccion) WHERE verificacion != 'RESUELTA'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_incidencias_verificacion_fecha ON incidencias (verificacion, fecha_deteccion) WHERE verificacion != 'RESUELTA'")
+
+#(versión, descripción, lista de sentencias SQL o función(conn))
+MIGRACIONES = [
+    (1, "incidencias.modelo_version: versión de modelos que detectó la alerta", _columna_modelo_version),
+    (2, "Índices de las consultas calientes del motor y del dashboard", [
+        #_registrar_alerta: incidencia abierta del cliente (cubre la consulta: id es el rowid)
+        "CREATE INDEX IF NOT EXISTS idx_incidencias_cliente ON incidencias (cliente_id, verificacion)",
+        #Dashboard: últimas incidencias no resueltas; parcial, solo contiene las abiertas
+        "CREATE INDEX IF NOT EXISTS idx_incidencias_activas_fecha ON incidencias (fecha_deteccion) WHERE verificacion != 'RESUELTA'",
+        #Vista móvil: notificaciones pendientes del cliente
+        "CREATE INDEX IF NOT EXISTS idx_notificaciones_cliente ON notificaciones (cliente_id, leida)",
+        #_registrar_alerta: DELETE del token anterior de la incidencia
+        "CREATE INDEX IF NOT EXISTS idx_tokens_incidencia ON tokens_verificacion (incidencia_id)",
+    ]),
+    (3, "Una incidencia abierta por cliente (índice único parcial) y un token por incidencia", _una_incidencia_abierta),
+    (4, "resumen_incidencias: recuento por clase y verificación mantenido por triggers", _resumen_incidencias),
+    (5, "versiones_cambios: contador de cambios de incidencias y notificaciones", _versiones_cambios),
+    (6, "Listado paginado: incidencias.clase (virtual) e índices por clase y verificación", _paginacion_incidencias),
+]
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+def version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _tiene_tablas(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'incidencias'").fetchone() is not None
+
+def pendientes(conn):
+    v = version(conn)
+    return [m for m in MIGRACIONES if m[0] > v]
+
+def migrar(conn, verbose=False):
+    """
+    Aplica las migraciones pendientes. Retorna las versiones aplicadas. Una BBDD sin tablas
+    (aún no creada por setup_database) no se toca.
+    """
+    if not _tiene_tablas(conn) or not pendientes(conn): return []
+    if conn.in_transaction: conn.commit()
+    aplicadas = []
+    for num, descripcion, pasos in MIGRACIONES:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version(conn) >= num:  #Otro proceso la aplicó mientras esperábamos
+                conn.rollback()
+                continue
+            t0 = time.perf_counter()
+            if callable(pasos): pasos(conn)
+            else:
+                for sql in pasos: conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(num)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        aplicadas.append(num)
+        if verbose: print(f"   ✅ Migración {num}: {descripcion} ({time.perf_counter() - t0:.2f}s)")
+    return aplicadas
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de gesai.db")
+    parser.add_argument('--bbdd', default=DB_PATH)
+    parser.add_argument('--estado', action='store_true', help="Solo muestra la versión y lo pendiente")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bbdd):
+        print(f"❌ No existe {args.bbdd} (créala con setup_database.py)")
+        sys.exit(1)
+    conn = sqlite3.connect(args.bbdd)
+    print(f"📊 {args.bbdd}: esquema v{version(conn)} (última v{VERSION_ACTUAL})")
+    faltan = pendientes(conn)
+    for num, descripcion, _ in faltan: print(f"   ⏳ {num}: {descripcion}")
+    if not faltan:
+        print("✅ Esquema al día.")
+    elif not args.estado:
+        print("🔄 Migrando...")
+        migrar(conn, verbose=True)
+        print(f"✅ Esquema en v{version(conn)}.")
+    conn.close()
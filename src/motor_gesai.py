@@ -4,11 +4,27 @@ import sqlite3
 import os
 import time
 import random
+import heapq
+import itertools
 import pandas as pd
 import numpy as np
-import joblib
-from faker import Faker
-from reports_manager import generar_carta_postal_pdf, generar_informe_tecnico_pdf
+import threading
+import atexit
+from dataclasses import dataclass
+from evaluador_arboles import compilar_boosters, guardar_compilado, cargar_compilado
+import registro_modelos
+import historico_clientes
+import almacen_versionado
+import dataset_features
+from cache_predicciones import CachePredicciones, huella_fila
+from antirrebote_alertas import AntirreboteAlertas, CLASES_SEVERIDAD, clase_severidad
+from versiones_cambios import VersionesCambios
+import shards_bbdd
+import buffer_consumo
+import features_online
+import pool_bbdd
+import migraciones_bbdd
+from escritor_alertas import EscritorAlertas
 import json
 
 #GESTOR DE CRIPTO
@@ -24,6 +40,12 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.dirname(CURRENT_DIR) #Raíz del proyecto
 DB_PATH = os.path.join(BASE_DIR, 'gesai.db')
 MODELOS_DIR = os.path.join(BASE_DIR, 'data', 'processed-data')
+#Artefactos .npy de los árboles compilados (se cargan con mmap, compartidos entre workers)
+COMPILADOS_DIR = os.path.join(MODELOS_DIR, 'modelos_compilados')
+#Motor de inferencia: 'lightgbm' (Booster.predict) o 'numpy' (árboles compilados, evaluador_arboles)
+MOTOR_INFERENCIA = os.environ.get('GESAI_MOTOR_INFERENCIA', 'lightgbm')
+#Parámetros extra de Booster.predict (los workers del modo pool fijan num_threads=1: un hilo por proceso)
+PARAMETROS_PREDICCION = {}
 
 #Umbrales
 UMBRAL_SEGURIDAD = 0.30
@@ -32,57 +54,500 @@ UMBRAL_CRITICO = 0.85
 TENDENCIA_RAPIDA = 0.05
 TENDENCIA_ESTRUCTURAL = 0.15
 
+#Los umbrales de un manifiesto del registro sustituyen a estos valores por defecto
+UMBRALES_BASE = {
+    'UMBRAL_SEGURIDAD': UMBRAL_SEGURIDAD, 'UMBRAL_ALERTA': UMBRAL_ALERTA, 'UMBRAL_CRITICO': UMBRAL_CRITICO,
+    'TENDENCIA_RAPIDA': TENDENCIA_RAPIDA, 'TENDENCIA_ESTRUCTURAL': TENDENCIA_ESTRUCTURAL,
+}
+#Segundos entre comprobaciones del registro de modelos (0 = sin recarga en caliente)
+INTERVALO_RECARGA = float(os.environ.get('GESAI_INTERVALO_RECARGA', 30))
+VERSION_BASE = 'base'  #Modelos sueltos de MODELOS_DIR, cuando el registro está vacío
+#Caché de predicciones de lecturas individuales (GESAI_CACHE_MAX=0 la desactiva)
+CACHE_MAX_ENTRADAS = int(os.environ.get('GESAI_CACHE_MAX', 50_000))
+CACHE_TTL = float(os.environ.get('GESAI_CACHE_TTL', 3600))
+#Histórico reciente por cliente alimentado por las lecturas puntuadas (GESAI_BUFFER_MAX_CLIENTES=0 lo desactiva)
+BUFFER_DIR = os.path.join(MODELOS_DIR, 'buffer_consumo')
+BUFFER_MAX_CLIENTES = int(os.environ.get('GESAI_BUFFER_MAX_CLIENTES', 10_000))  #~11.4 KB por cliente
+BUFFER_INTERVALO_VOLCADO = float(os.environ.get('GESAI_BUFFER_VOLCADO', 60))  #Segundos (0 = sin volcado)
+BUFFER_INACTIVIDAD = float(os.environ.get('GESAI_BUFFER_INACTIVIDAD', 7 * 24 * 3600))  #Expulsión por inactividad
+#Features de lecturas crudas (lags y ventana de 168 h) calculadas en streaming por cliente
+FEATURES_MAX_CLIENTES = int(os.environ.get('GESAI_FEATURES_MAX_CLIENTES', 50_000))  #~3 KB por cliente
+#Pool de conexiones SQLite (GESAI_BBDD_POOL=0: una conexión nueva por llamada, como antes)
+BBDD_POOL = int(os.environ.get('GESAI_BBDD_POOL', 8))  #Conexiones libres que se mantienen abiertas
+BBDD_PRAGMAS = {
+    'foreign_keys': 1,
+    'journal_mode': 'WAL',  #La app lee mientras el simulador escribe
+    'synchronous': os.environ.get('GESAI_BBDD_SYNCHRONOUS', 'NORMAL'),  #En WAL solo se pierde la última transacción ante un corte de luz
+    'cache_size': -int(float(os.environ.get('GESAI_BBDD_CACHE_MB', 16)) * 1024),  #KiB por conexión
+    'mmap_size': int(float(os.environ.get('GESAI_BBDD_MMAP_MB', 256)) * 2**20),
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+#Group commit de alertas: un hilo escritor las guarda en grupos de hasta GESAI_GRUPO_COMMIT
+#(0 = una transacción por llamada, como antes). Un grupo son las alertas que llegan mientras se
+#confirma el anterior; GESAI_GRUPO_ESPERA_MS > 0 espera además a que se junten más (discos lentos)
+GRUPO_COMMIT = int(os.environ.get('GESAI_GRUPO_COMMIT', 0))
+GRUPO_ESPERA = float(os.environ.get('GESAI_GRUPO_ESPERA_MS', 0)) / 1000
+#Segundos que se espera como mucho a que el escritor confirme una alerta (un escritor caído no cuelga a nadie)
+ESPERA_ESCRITOR = float(os.environ.get('GESAI_ESPERA_ESCRITOR_S', 30))
+#Antirrebote (opcional): con GESAI_ANTIRREBOTE_S > 0 (p. ej. 21600, 6 h) una incidencia abierta solo se reescribe
+#si cambia la clase de severidad o tras ese intervalo, y el push solo si cambia la clase (0 = cada alerta, como antes)
+ANTIRREBOTE_INTERVALO = float(os.environ.get('GESAI_ANTIRREBOTE_S', 0))
+ANTIRREBOTE_MAX_CLIENTES = int(os.environ.get('GESAI_ANTIRREBOTE_MAX_CLIENTES', 100_000))  #~200 B por cliente
+#Los sondeos del dashboard y de la vista móvil comparan la versión de cambios de la BBDD, comprobada
+#como mucho cada GESAI_VERSION_CAMBIOS_MS para todas las sesiones (0 = consultan siempre, como antes)
+VERSION_CAMBIOS_INTERVALO = float(os.environ.get('GESAI_VERSION_CAMBIOS_MS', 250)) / 1000
+#Incidencias por página del listado del dashboard (más al hacer scroll)
+TAM_PAGINA_INCIDENCIAS = int(os.environ.get('GESAI_TAM_PAGINA', 50))
+#Clientes, incidencias, notificaciones y tokens repartidos en GESAI_SHARDS ficheros por hash de
+#cliente_id, un escritor por shard (0 = todo en gesai.db, como antes). Los crea shards_bbdd.py
+SHARDS = int(os.environ.get('GESAI_SHARDS', 0))
 
-import warnings
-from sklearn.exceptions import InconsistentVersionWarning
-warnings.filterwarnings("ignore", category=InconsistentVersionWarning) #Silenciar warnings versiones sklearn
+faker = None  #Faker se crea al primer cliente nuevo (import lento)
+conjunto_activo = None  #ConjuntoModelos en uso; se sustituye entero al recargar
+_motor_cargado = False
+_lock_motor = threading.Lock()
+_lock_recarga = threading.Lock()
+_versiones_fallidas = set()
+_hilo_vigilante = None
+cache_predicciones = CachePredicciones(CACHE_MAX_ENTRADAS, CACHE_TTL)
+antirrebote = AntirreboteAlertas(ANTIRREBOTE_INTERVALO, ANTIRREBOTE_MAX_CLIENTES)
+buffer_lecturas = buffer_consumo.BufferConsumo(BUFFER_MAX_CLIENTES)
+motor_features = features_online.MotorFeatures(FEATURES_MAX_CLIENTES)
+_hilo_volcado = None
+HORIZONTES = ['HOY', 'MANANA', '7DIAS']
+CATEGORICAS = ['US_AIGUA_SUBM', 'TIPO_DIA']
 
-faker = Faker('es_ES')
-modelos_ia = {}
-features_modelo = []
+@dataclass(frozen=True)
+class EsquemaFeatures:
+    """
+    Esquema de entrada de los modelos, compilado una vez al arrancar.
+    - columnas: orden exacto de features del booster.
+    - numericas: pares (posición, columna).
+    - categoricas: ternas (posición, columna, {categoría: código}) según pandas_categorical.
+    """
+    columnas: tuple
+    numericas: tuple
+    categoricas: tuple
+
+def _compilar_esquema(columnas, categorias):
+    """
+    Construye el EsquemaFeatures a partir de los nombres de features del booster
+    y sus categorías de entrenamiento (booster.pandas_categorical).
+    """
+    columnas = tuple(columnas)
+    cols_cat = [c for c in columnas if c in CATEGORICAS]
+    categorias = categorias or []
+    if len(categorias) != len(cols_cat):
+        raise ValueError(f"pandas_categorical no cuadra con {cols_cat}")
+    mapas = dict(zip(cols_cat, categorias))
+    return EsquemaFeatures(
+        columnas=columnas,
+        numericas=tuple((j, c) for j, c in enumerate(columnas) if c not in mapas),
+        categoricas=tuple((j, c, {v: float(k) for k, v in enumerate(mapas[c])}) for j, c in enumerate(columnas) if c in mapas),
+    )
+
+_bbdd_preparadas = set()
+
+def _preparar_bbdd(conn, path=None):
+    """Lleva una gesai.db (o un shard) antigua a la última versión del esquema (una vez por fichero)."""
+    path = path or DB_PATH
+    if path in _bbdd_preparadas: return
+    migraciones_bbdd.migrar(conn)
+    _bbdd_preparadas.add(path)
 
-def _conectar_bbdd():
+def _paths_datos():
+    """Ficheros con los datos de clientes: los shards, o gesai.db sin sharding."""
+    return shards_bbdd.paths_shards(DB_PATH, SHARDS) if SHARDS > 0 else (DB_PATH,)
+
+def _path_cliente(cliente_id):
+    """Fichero con los datos de un cliente (el de su shard)."""
+    if SHARDS <= 0: return DB_PATH
+    return shards_bbdd.paths_shards(DB_PATH, SHARDS)[shards_bbdd.shard_de(cliente_id, SHARDS)]
+
+_pools = {}  #path -> PoolConexiones (los benchmarks cambian DB_PATH en caliente)
+_lock_pools = threading.Lock()
+
+def _pool_bbdd(path=None):
+    path = path or DB_PATH
+    pool = _pools.get(path)
+    if pool is None or pool.pid != os.getpid():  #Tras un fork, las conexiones del padre no se tocan
+        with _lock_pools:
+            pool = _pools.get(path)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[path] = pool_bbdd.PoolConexiones(path, BBDD_POOL, BBDD_PRAGMAS,
+                                                              preparar=lambda conn: _preparar_bbdd(conn, path))
+    return pool
+
+def _comprobar_shard(path):
+    """Un shard que no existe no se crea vacío (sqlite3.connect lo haría)."""
+    if path != DB_PATH and not os.path.exists(path):
+        raise FileNotFoundError(f"Falta el shard {path} (créalos con: python src/shards_bbdd.py --shards {SHARDS})")
+
+def _conectar_bbdd(path=None):
+    """
+    Conexión del pool a path (gesai.db por defecto; los datos de un cliente, en _path_cliente);
+    conn.close() la devuelve. Con BBDD_POOL=0, conexión nueva cada vez.
+    """
+    path = path or DB_PATH
     try:
-        #Usamos la ruta DB_PATH
-        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _comprobar_shard(path)
+        if BBDD_POOL > 0: return _pool_bbdd(path).obtener()
+        #Usamos la ruta DB_PATH (o la del shard)
+        conn = sqlite3.connect(path, check_same_thread=False)
         conn.execute("PRAGMA foreign_keys = 1")
         conn.row_factory = sqlite3.Row 
+        _preparar_bbdd(conn, path)
         return conn
     except Exception as e:
         print(f"❌ Error conectando a BBDD: {e}")
         return None
 
+def _conexion_propia(path=None):
+    """Conexión fuera del pool, para un hilo que la tiene toda su vida (escritor, versiones de cambios)."""
+    path = path or DB_PATH
+    if BBDD_POOL <= 0: return _conectar_bbdd(path)
+    _comprobar_shard(path)
+    return _pool_bbdd(path)._abrir()
+
+def estadisticas_bbdd():
+    pool = _pools.get(DB_PATH)
+    return pool.estadisticas() if pool else {}
+
+def cerrar_pool_bbdd():
+    with _lock_pools:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if pool.pid == os.getpid(): pool.cerrar()
+
+atexit.register(cerrar_pool_bbdd)
+
+@dataclass(frozen=True)
+class ConjuntoModelos:
+    """
+    Versión de modelos lista para puntuar: los tres horizontes, su esquema y sus umbrales.
+    Es inmutable: cada detección toma `conjunto_activo` una vez al empezar y la recarga
+    publica un objeto nuevo con una sola asignación, así ninguna lectura se puntúa con
+    modelos de dos versiones distintas.
+    """
+    version: str
+    directorio: str
+    esquema: EsquemaFeatures
+    umbrales: dict
+    modelos: dict = None  #horizonte -> LGBMClassifier (None si solo hay árboles compilados)
+    compilado: object = None
+
+    def predecir(self, X):
+        """Probabilidades de fuga (3, n) para HOY / MANANA / 7DIAS sobre la matriz codificada."""
+        if self.compilado is not None: return self.compilado.predecir(X)
+        return np.vstack([self.modelos[h].booster_.predict(X, raw_score=False, **PARAMETROS_PREDICCION) for h in HORIZONTES])
+
 #INICIALIZACIÓN
+def _huella_modelos(directorio):
+    """Tamaño y mtime de los .joblib: si cambian, los artefactos compilados están obsoletos."""
+    huella = {}
+    for h in HORIZONTES:
+        st = os.stat(registro_modelos.fichero_modelo(directorio, h))
+        huella[h] = [st.st_size, st.st_mtime_ns]
+    return huella
+
+def _cargar_compilados(directorio, destino):
+    """Carga con mmap los árboles compilados si existen y corresponden a los .joblib actuales."""
+    try:
+        compilado, extra = cargar_compilado(destino, mmap=True)
+        if extra.get('huella') != _huella_modelos(directorio): return None, None
+        return compilado, _compilar_esquema(extra['columnas'], extra['categorias'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def _cargar_lightgbm(directorio):
+    """Carga los tres .joblib (importa joblib / sklearn / LightGBM solo aquí)."""
+    import joblib
+    import warnings
+    from sklearn.exceptions import InconsistentVersionWarning
+    warnings.filterwarnings("ignore", category=InconsistentVersionWarning) #Silenciar warnings versiones sklearn
+    return {h: joblib.load(registro_modelos.fichero_modelo(directorio, h)) for h in HORIZONTES}
+
+def _compilar_y_guardar(modelos, esquema, directorio, destino):
+    """Compila los boosters para el motor NumPy y vuelca los arrays para los siguientes workers."""
+    try:
+        compilado = compilar_boosters([modelos[h].booster_ for h in HORIZONTES], HORIZONTES)
+        print(f"✅ Árboles compilados para NumPy ({compilado.num_arboles} árboles).")
+    except Exception as e:
+        print(f"⚠️ ERROR compilando árboles: {e}. Se usa LightGBM.")
+        return None
+    try:
+        categorias = {c: list(mapa) for _, c, mapa in esquema.categoricas}
+        guardar_compilado(compilado, destino, {
+            'huella': _huella_modelos(directorio), 'columnas': list(esquema.columnas), 'categorias': categorias,
+        })
+        compilado, _ = cargar_compilado(destino, mmap=True)
+    except OSError as e:
+        print(f"⚠️ No se pudieron guardar los árboles compilados: {e}")
+    return compilado
+
+def _cargar_conjunto(version):
+    """
+    Carga y calienta una versión del registro (None = modelos base de MODELOS_DIR).
+    Lanza excepción si la versión no es válida; no toca el conjunto activo.
+    """
+    if version is None:
+        directorio, nombre, umbrales, features = MODELOS_DIR, VERSION_BASE, {}, None
+    else:
+        manifiesto = registro_modelos.leer_manifiesto(version)
+        directorio, nombre = registro_modelos.dir_version(version), version
+        umbrales, features = manifiesto.get('umbrales') or {}, manifiesto['features']
+    umbrales = {**UMBRALES_BASE, **{k: float(v) for k, v in umbrales.items() if k in UMBRALES_BASE}}
+    destino = os.path.join(COMPILADOS_DIR, nombre)
+
+    #Motor NumPy con artefactos ya compilados: ni joblib ni LightGBM
+    compilado, esquema = _cargar_compilados(directorio, destino) if MOTOR_INFERENCIA == 'numpy' else (None, None)
+    if compilado is not None:
+        conjunto = ConjuntoModelos(nombre, directorio, esquema, umbrales, compilado=compilado)
+    else:
+        modelos = _cargar_lightgbm(directorio)
+        booster = modelos['HOY'].booster_
+        esquema = _compilar_esquema(booster.feature_name(), booster.pandas_categorical)
+        compilado = _compilar_y_guardar(modelos, esquema, directorio, destino) if MOTOR_INFERENCIA == 'numpy' else None
+        conjunto = ConjuntoModelos(nombre, directorio, esquema, umbrales, modelos, compilado)
+
+    if features is not None and list(conjunto.esquema.columnas) != list(features):
+        raise ValueError(f"Las features de {nombre} no coinciden con su manifiesto")
+    #Calentamiento: la primera predicción se paga aquí y no en la primera lectura
+    conjunto.predecir(np.zeros((1, len(conjunto.esquema.columnas))))
+    return conjunto
+
 def inicializar_motor():
-    global modelos_ia, features_modelo
+    global conjunto_activo, _motor_cargado
     print("--- INICIALIZANDO MOTOR GeSAI (MODO SEGURO + ANTI-DUPLICADOS) ---")
     try:
-        modelos_ia['HOY'] = joblib.load(os.path.join(MODELOS_DIR, 'lgbm_model_TARGET_HOY.joblib'))
-        modelos_ia['MANANA'] = joblib.load(os.path.join(MODELOS_DIR, 'lgbm_model_TARGET_MANANA.joblib'))
-        modelos_ia['7DIAS'] = joblib.load(os.path.join(MODELOS_DIR, 'lgbm_model_TARGET_7DIAS.joblib'))
-        features_modelo = modelos_ia['HOY'].booster_.feature_name()
-        print("✅ Modelos LightGBM cargados.")
+        version = registro_modelos.ultima_version()
+        try:
+            conjunto_activo = _cargar_conjunto(version)
+        except Exception as e:
+            if version is None: raise
+            print(f"⚠️ Versión {version} del registro descartada: {e}. Se usan los modelos base.")
+            _versiones_fallidas.add(version)
+            conjunto_activo = _cargar_conjunto(None)
+        origen = "árboles compilados" if conjunto_activo.compilado is not None else "LightGBM"
+        print(f"✅ Modelos {conjunto_activo.version} cargados ({origen}).")
     except Exception as e:
         print(f"⚠️ ERROR modelos: {e}. Fallback activo.")
-        modelos_ia = None
+        conjunto_activo = None
+    finally:
+        _motor_cargado = True
+    if INTERVALO_RECARGA > 0: iniciar_vigilante_modelos()
 
-inicializar_motor()
+def _cargar_motor():
+    """
+    Carga perezosa de los modelos (primera predicción), segura entre hilos.
+    Retorna el ConjuntoModelos activo, o None si se usa el fallback.
+    """
+    if not _motor_cargado:
+        with _lock_motor:
+            if not _motor_cargado: inicializar_motor()
+    return conjunto_activo
+
+#RECARGA EN CALIENTE
+def recargar_modelos(version=None):
+    """
+    Carga y calienta la versión indicada (o la última del registro) en el hilo que llama
+    y la activa con una sola asignación. Las detecciones en curso terminan con el
+    conjunto que tomaron al empezar. Retorna la versión activa tras la llamada.
+    """
+    global conjunto_activo
+    with _lock_recarga:
+        version = version or registro_modelos.ultima_version()
+        actual = conjunto_activo.version if conjunto_activo else None
+        if version is None or version == actual or version in _versiones_fallidas: return actual
+        try:
+            nuevo = _cargar_conjunto(version)
+        except Exception as e:
+            _versiones_fallidas.add(version)
+            print(f"⚠️ Versión {version} del registro descartada: {e}")
+            return actual
+        conjunto_activo = nuevo
+        #La versión forma parte de la clave; vaciar solo libera la memoria de la versión anterior
+        cache_predicciones.vaciar()
+        print(f"🔄 Modelos {actual} -> {version}")
+        return version
+
+def _vigilar_registro(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try: recargar_modelos()
+        except Exception as e: print(f"⚠️ Error vigilando el registro de modelos: {e}")
+
+def iniciar_vigilante_modelos(intervalo=None):
+    """Hilo daemon que comprueba el registro cada `intervalo` segundos y recarga si hay versión nueva."""
+    global _hilo_vigilante
+    with _lock_recarga:
+        if _hilo_vigilante is not None and _hilo_vigilante.is_alive(): return
+        _hilo_vigilante = threading.Thread(target=_vigilar_registro, args=(intervalo or INTERVALO_RECARGA,),
+                                           name='gesai-vigilante-modelos', daemon=True)
+        _hilo_vigilante.start()
+
+def _get_faker():
+    global faker
+    if faker is None:
+        from faker import Faker
+        faker = Faker('es_ES')
+    return faker
+
+#BUFFER DE CONSUMO (stream -> histórico reciente)
+def _fecha_ns(valor):
+    """FECHA_HORA_CRONO de una lectura en ns; si falta o no se entiende, la hora actual."""
+    try:
+        ns = int(pd.Timestamp(valor).value) if isinstance(valor, (pd.Timestamp, np.datetime64)) \
+            else int(np.datetime64(valor, 'ns').astype(np.int64))
+        if ns != np.iinfo(np.int64).min: return ns
+    except (TypeError, ValueError):
+        pass
+    return time.time_ns()
+
+def _anotar_lectura(cliente_id, lectura):
+    if not buffer_lecturas.activo: return
+    try: consumo = float(lectura['CONSUMO_REAL'])
+    except (KeyError, TypeError, ValueError): return
+    buffer_lecturas.anotar(cliente_id, _fecha_ns(lectura.get('FECHA_HORA_CRONO')), consumo)
+
+def lecturas_consumo(df, col_cliente='POLISSA_SUBM'):
+    """(clientes, fechas ns, consumos) de un lote, para anotar_lecturas (p.ej. desde otro proceso)."""
+    if 'CONSUMO_REAL' not in df: return None
+    consumos = pd.to_numeric(df['CONSUMO_REAL'], errors='coerce').to_numpy(dtype=np.float64)
+    if 'FECHA_HORA_CRONO' in df:
+        fechas = pd.to_datetime(df['FECHA_HORA_CRONO'], errors='coerce').to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+        fechas[fechas == np.iinfo(np.int64).min] = time.time_ns()
+    else:
+        fechas = np.full(len(df), time.time_ns(), dtype=np.int64)
+    return df[col_cliente].astype(str).to_numpy(), fechas, consumos
 
-def _aplicar_reglas(p_hoy, p_manana, p_7dias):
+def anotar_lecturas(lecturas):
+    if lecturas is not None and buffer_lecturas.activo: buffer_lecturas.anotar_lote(*lecturas)
+
+def guardar_buffer():
+    """Vuelca el buffer a BUFFER_DIR (lo lee la app). Retorna los clientes guardados."""
+    if not buffer_lecturas.activo or not len(buffer_lecturas): return 0
+    try:
+        return buffer_lecturas.guardar(BUFFER_DIR)
+    except OSError as e:
+        print(f"⚠️ Error guardando el buffer de consumo: {e}")
+        return 0
+
+def _volcar_buffer(intervalo):
+    while True:
+        time.sleep(intervalo)
+        buffer_lecturas.expulsar_inactivos(BUFFER_INACTIVIDAD)
+        guardar_buffer()
+
+def iniciar_buffer_consumo(intervalo=None):
+    """
+    Para el proceso que puntúa el stream (simulador, gateway): recupera la última instantánea,
+    vuelca el buffer cada `intervalo` segundos en un hilo daemon y una última vez al salir.
+    """
+    global _hilo_volcado
+    if not buffer_lecturas.activo: return
+    intervalo = intervalo or BUFFER_INTERVALO_VOLCADO
+    with _lock_recarga:
+        if _hilo_volcado is not None: return
+        instantanea = buffer_consumo.abrir(BUFFER_DIR)
+        if instantanea is not None and not len(buffer_lecturas):
+            n = buffer_lecturas.restaurar(instantanea)
+            if n: print(f"🔄 Buffer de consumo restaurado: {n} clientes.")
+        atexit.register(guardar_buffer)
+        _hilo_volcado = threading.Thread(target=_volcar_buffer, args=(intervalo,), name='gesai-volcado-buffer', daemon=True)
+        if intervalo > 0: _hilo_volcado.start()
+
+def _aplicar_reglas(p_hoy, p_manana, p_7dias, umbrales=UMBRALES_BASE):
+    u = umbrales
     delta_corto = p_manana - p_hoy
     delta_largo = p_7dias - p_hoy
     
-    if p_hoy < UMBRAL_SEGURIDAD: return "No Fuga", ""
-    if p_hoy < UMBRAL_ALERTA:
-        if delta_largo > TENDENCIA_ESTRUCTURAL: return "Fuga Leve (Tendencia)", f"Tendencia +{delta_largo:.1%}"
+    if p_hoy < u['UMBRAL_SEGURIDAD']: return "No Fuga", ""
+    if p_hoy < u['UMBRAL_ALERTA']:
+        if delta_largo > u['TENDENCIA_ESTRUCTURAL']: return "Fuga Leve (Tendencia)", f"Tendencia +{delta_largo:.1%}"
         return "No Fuga", "Riesgo bajo"
-    if p_hoy < UMBRAL_CRITICO:
-        if delta_corto > TENDENCIA_RAPIDA or delta_largo > TENDENCIA_ESTRUCTURAL: return "Fuga Grave (En Crecimiento)", "Crecimiento rápido"
+    if p_hoy < u['UMBRAL_CRITICO']:
+        if delta_corto > u['TENDENCIA_RAPIDA'] or delta_largo > u['TENDENCIA_ESTRUCTURAL']: return "Fuga Grave (En Crecimiento)", "Crecimiento rápido"
         return "Fuga Moderada", "Estable"
     return "Fuga Grave", "Crítica"
 
 
 #OBTENCIÓN DE HISTÓRICO REAL
+_historico = None
+_aviso_historico = False
+
+def _abrir_historico(path_datos):
+    """Almacén indexado por cliente (historico_clientes), reabierto si se ha reconstruido."""
+    global _historico, _aviso_historico
+    huella = almacen_versionado.huella(historico_clientes.HISTORICO_DIR)
+    if huella is None: return None
+    if _historico is None or _historico[0] != huella:
+        hist = historico_clientes.abrir()
+        if hist is None: return None
+        _historico = (huella, hist)
+    hist = _historico[1]
+    if not hist.vigente(path_datos):
+        if not _aviso_historico:
+            print("⚠️ El histórico indexado es anterior al CSV: se lee el CSV. Actualízalo con "
+                  "'python src/historico_clientes.py construir'.")
+            _aviso_historico = True
+        return None
+    return hist
+
+_instantanea = None
+
+def _abrir_instantanea():
+    """Última instantánea del buffer de consumo en disco, reabierta cuando se vuelve a volcar."""
+    global _instantanea
+    huella = almacen_versionado.huella(BUFFER_DIR)
+    if huella is None: return None
+    if _instantanea is None or _instantanea[0] != huella:
+        inst = buffer_consumo.abrir(BUFFER_DIR)
+        if inst is None: return None
+        _instantanea = (huella, inst)
+    return _instantanea[1]
+
+def _consumo_reciente(cliente_id):
+    """(fechas, consumo) del buffer de este proceso o, si no tiene al cliente, de la instantánea en disco."""
+    reciente = buffer_lecturas.consultar(cliente_id) if buffer_lecturas.activo else None
+    if reciente is None:
+        inst = _abrir_instantanea()
+        if inst is not None: reciente = inst.consultar(cliente_id)
+    return reciente
+
+def _historico_cliente(cliente_id, path_datos):
+    """
+    Últimas 720 lecturas (FECHA_HORA, CONSUMO_REAL) del cliente en orden cronológico.
+    Primero el buffer de consumo (lecturas ya vistas por el motor); si no llega a 720, se
+    completa con el disco, y ante la misma FECHA_HORA gana el buffer.
+    """
+    horas = historico_clientes.HORAS_HISTORICO
+    reciente = _consumo_reciente(cliente_id)
+    if reciente is not None and len(reciente[0]) >= horas:
+        return pd.DataFrame({'FECHA_HORA': reciente[0], 'CONSUMO_REAL': reciente[1]})
+    disco = _historico_disco(cliente_id, path_datos)
+    if reciente is None or not len(reciente[0]): return disco
+    df = pd.concat([disco, pd.DataFrame({'FECHA_HORA': reciente[0], 'CONSUMO_REAL': reciente[1]})], ignore_index=True)
+    df = df.drop_duplicates('FECHA_HORA', keep='last').sort_values('FECHA_HORA', kind='mergesort')
+    return df.tail(horas).reset_index(drop=True)
+
+def _historico_disco(cliente_id, path_datos):
+    """Almacén indexado si existe y está al día; si no, recorre el dataset (dataset_features)."""
+    hist = _abrir_historico(path_datos)
+    if hist is not None:
+        fechas, consumo = hist.consultar(cliente_id, historico_clientes.HORAS_HISTORICO)
+        return pd.DataFrame({'FECHA_HORA': fechas, 'CONSUMO_REAL': consumo})
+
+    #Filtrado poliza (en Arrow, antes de pasar a pandas)
+    df_real = dataset_features.cargar(['POLISSA_SUBM', 'FECHA_HORA_CRONO', 'CONSUMO_REAL'], clientes=[cliente_id], path_csv=path_datos)
+    if df_real is None or df_real.empty: return pd.DataFrame()
+
+    df_real['FECHA_HORA'] = pd.to_datetime(df_real['FECHA_HORA_CRONO'], errors='coerce')
+    df_real = df_real.sort_values('FECHA_HORA')
+    return df_real.tail(720)[['FECHA_HORA', 'CONSUMO_REAL']].copy()
+
 def get_consumo_historico(cliente_id, es_fuga=False):
     """
     Recupera historial REAL.
@@ -96,36 +561,21 @@ def get_consumo_historico(cliente_id, es_fuga=False):
     random.seed(str(cliente_id))
     
     try:
-        if os.path.exists(path_datos):
-            df = pd.read_csv(path_datos, usecols=['POLISSA_SUBM', 'FECHA_HORA_CRONO', 'CONSUMO_REAL'], dtype={'POLISSA_SUBM': str})
-            
-            #Filtrado poliza
-            df_real = df[df['POLISSA_SUBM'] == str(cliente_id)].copy()
+        df_final = _historico_cliente(cliente_id, path_datos)
             
-            if df_real.empty:
-                #Sin datos
-                return pd.DataFrame() 
-
+        if not df_final.empty:
             
-            df_real['FECHA_HORA'] = pd.to_datetime(df_real['FECHA_HORA_CRONO'], errors='coerce')
-            df_real = df_real.sort_values('FECHA_HORA')
+            ultimo = df_final['FECHA_HORA'].max()
+            df_final['FECHA_HORA'] += (pd.Timestamp.now() - ultimo)
             
             
-            df_final = df_real.tail(720)[['FECHA_HORA', 'CONSUMO_REAL']].copy()
-            
-            if not df_final.empty:
-                
-                ultimo = df_final['FECHA_HORA'].max()
-                df_final['FECHA_HORA'] += (pd.Timestamp.now() - ultimo)
-                
-                
-                if es_fuga:
-                    puntos = len(df_final)
-                    duracion = min(random.randint(48, 120), puntos)
-                    extra = np.linspace(10, 200, duracion)
-                    df_final.iloc[-duracion:, 1] += extra
-
-                return df_final
+            if es_fuga:
+                puntos = len(df_final)
+                duracion = min(random.randint(48, 120), puntos)
+                extra = np.linspace(10, 200, duracion)
+                df_final.iloc[-duracion:, 1] += extra
+
+            return df_final
 
     except Exception as e:
         print(f"⚠️ Error CSV: {e}")
@@ -133,117 +583,411 @@ def get_consumo_historico(cliente_id, es_fuga=False):
     return pd.DataFrame()
 
 #DETECCIÓN SIMULADA
-def ejecutar_deteccion_simulada(cliente_id: str, datos_externos: pd.Series = None) -> dict:
-    X_input = None
-    origen_datos = "Simulado"
+def estadisticas_cache():
+    """Contadores de la caché de predicciones (aciertos, fallos, expulsiones, caducadas...)."""
+    return cache_predicciones.estadisticas()
+
+def estadisticas_antirrebote():
+    """Alertas escritas, refrescadas (sin push) y omitidas por el antirrebote."""
+    return antirrebote.estadisticas()
+
+def _predecir_lectura(conjunto, lectura):
+    """(p_hoy, p_manana, p_7dias) de una lectura, pasando por la caché si está activa."""
+    fila = _codificar_lectura(lectura, conjunto.esquema)
+    if not cache_predicciones.activa:
+        return tuple(conjunto.predecir(fila)[:, 0])
+    clave = huella_fila(fila, conjunto.version)
+    probs = cache_predicciones.obtener(clave)
+    if probs is None:
+        probs = tuple(conjunto.predecir(fila)[:, 0])
+        cache_predicciones.guardar(clave, probs)
+    return probs
+
+_buffers = threading.local()
+
+def _codificar_lectura(lectura, esquema):
+    """
+    Codifica una lectura (dict / pd.Series) directamente en una fila float64
+    preasignada, con el mismo resultado que el camino pandas + LightGBM:
+    numéricas con to_numeric(errors='coerce').fillna(0) y categóricas con
+    el código de entrenamiento (NaN si la categoría es desconocida).
+    """
+    fila = getattr(_buffers, 'fila', None)
+    if fila is None or fila.shape[1] != len(esquema.columnas):
+        fila = _buffers.fila = np.empty((1, len(esquema.columnas)), dtype=np.float64)
+    x = fila[0]
+    for j, c in esquema.numericas:
+        try: v = float(lectura[c])
+        except (TypeError, ValueError): v = 0.0
+        x[j] = 0.0 if v != v else v
+    for j, c, mapa in esquema.categoricas:
+        try: x[j] = mapa.get(lectura[c], np.nan)
+        except TypeError: x[j] = np.nan
+    return fila
+
+def _codificar_lote(df, esquema):
+    """Versión vectorizada de _codificar_lectura para un DataFrame de lecturas."""
+    X = np.empty((len(df), len(esquema.columnas)), dtype=np.float64)
+    for j, c in esquema.numericas:
+        X[:, j] = pd.to_numeric(df[c], errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+    for j, c, mapa in esquema.categoricas:
+        codigos = pd.Categorical(df[c], categories=list(mapa)).codes.astype(np.float64)
+        codigos[codigos < 0] = np.nan
+        X[:, j] = codigos
+    return X
+
+def _registrar_alerta(cur, cliente_id, estado, detalle, p_hoy, modelo_version=None):
+    """
+    Persiste una alerta (cliente, incidencia, token y notificación) sobre el cursor dado,
+    anotando la versión de modelos que la ha detectado.
+    No hace commit: lo decide quien llama (lectura individual o lote).
+    Si la incidencia abierta del cliente ya está escrita con la misma clase de severidad
+    (antirrebote), no escribe nada; si solo ha pasado el intervalo, la refresca sin push nuevo.
+    """
+    escribir, notificar, inc_id = antirrebote.decidir(str(cliente_id), estado)
+    if not escribir:
+        #La memoria del antirrebote es de este proceso: la fila dice si la incidencia sigue abierta y con esa clase
+        fila = cur.execute("SELECT estado, verificacion FROM incidencias WHERE id = ?", (inc_id,)).fetchone()
+        if fila and fila[1] != 'RESUELTA' and clase_severidad(fila[0]) == clase_severidad(estado):
+            return {'status': 'ALERTA', 'message': f"{estado} (Sin cambios) - Agrupada", 'incidencia_id': inc_id}
+        antirrebote.invalidar(str(cliente_id))
+        escribir, notificar, inc_id = antirrebote.decidir(str(cliente_id), estado)
+
+    cur.execute("SELECT * FROM clientes WHERE cliente_id = ?", (str(cliente_id),))
+    res = cur.fetchone()
     
-    # 1. Preparar Datos
-    if datos_externos is not None and modelos_ia:
-        try:
-            fila = pd.DataFrame([datos_externos])
-            cols_validas = [c for c in features_modelo if c in fila.columns]
-            X_input = fila[cols_validas].copy()
-            CAT = ['US_AIGUA_SUBM', 'TIPO_DIA']
-            for c in X_input.columns:
-                if c in CAT: X_input[c] = X_input[c].astype('category')
-                else: X_input[c] = pd.to_numeric(X_input[c], errors='coerce').fillna(0.0)
-            origen_datos = "Lectura Real IoT"
-        except: X_input = None
+    datos_cli = {}
+    if not res:
+        
+        nom = _get_faker().name()
+        email = f"{nom.split()[0]}@test.com"
+        
+        ### SEGURIDAD: Ciframos antes de guardar ###
+        #Otro worker puede darlo de alta a la vez: si gana él, usamos sus datos
+        cur.execute(
+            "INSERT INTO clientes VALUES (?, ?, ?, ?, ?) ON CONFLICT (cliente_id) DO NOTHING", 
+            (str(cliente_id), cifrar_pii(nom), cifrar_pii("600"), cifrar_pii(email), cifrar_pii("Barcelona"))
+        )
+        if cur.rowcount == 0:
+            cur.execute("SELECT * FROM clientes WHERE cliente_id = ?", (str(cliente_id),))
+            res = cur.fetchone()
+        else:
+            datos_cli = {'nombre': nom, 'email': email, 'direccion': "Barcelona"}
+    if res:
+        #Cliente existente: Desciframos para uso interno
+        datos_cli = dict(res)
+        ### SEGURIDAD: Desciframos ###
+        datos_cli['email'] = descifrar_pii(datos_cli['email'])
+        datos_cli['nombre'] = descifrar_pii(datos_cli['nombre'])
+
+    desc = f"{estado}. Prob: {p_hoy:.0%}. {detalle}"
+
+    #Solo enviamos si es nueva o si ha empeorado a Grave
+    tiene_email = (datos_cli.get('email') is not None)
+    avisar = "Leve" not in estado
+    carta = avisar and not tiene_email
+
+    #Una sola incidencia NO resuelta por cliente (índice único parcial ux_incidencias_abierta):
+    #se crea o se actualiza en una sentencia, sin carrera entre workers
+    cur.execute("""
+        INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion, modelo_version)
+        VALUES (?, ?, CASE WHEN ? THEN 'CARTA PENDIENTE' ELSE 'PENDIENTE' END, ?, ?)
+        ON CONFLICT (cliente_id) WHERE verificacion != 'RESUELTA' DO UPDATE
+        SET estado = excluded.estado, descripcion = excluded.descripcion, modelo_version = excluded.modelo_version,
+            fecha_deteccion = CURRENT_TIMESTAMP, actualizaciones = actualizaciones + 1,
+            verificacion = CASE WHEN ? THEN 'CARTA PENDIENTE' ELSE verificacion END
+        RETURNING id, actualizaciones
+    """, (str(cliente_id), estado, carta, desc, modelo_version, carta))
+    new_id, actualizaciones = cur.fetchone()
+    msg_accion = "(Actualizada)" if actualizaciones else "(Nueva)"
+    antirrebote.anotar(str(cliente_id), new_id)
+    
+    msg_extra = ""
     
-    # 2. Predicción
-    if modelos_ia and X_input is not None:
+    if avisar and not notificar and actualizaciones:
+        msg_extra = "Ya notificada"
+    elif avisar:
+        if carta:
+            msg_extra = "Carta Pendiente"
+        else:
+            token = generar_token_seguro() 
+            link = f"http://127.0.0.1:8050/verificar/{token}"
+            msg = f"Hola {datos_cli['nombre']}, alerta GeSAI: {estado}."
+            
+            #El token nuevo sustituye al anterior de la incidencia (ux_tokens_incidencia)
+            cur.execute("""
+                INSERT INTO tokens_verificacion (token, incidencia_id) VALUES (?, ?)
+                ON CONFLICT (incidencia_id) DO UPDATE SET token = excluded.token, fecha_creacion = CURRENT_TIMESTAMP
+            """, (token, new_id))
+            cur.execute("INSERT INTO notificaciones (cliente_id, mensaje, link) VALUES (?, ?, ?)", (str(cliente_id), msg, link))
+            msg_extra = "Push Enviado"
+
+    return {'status': 'ALERTA', 'message': f"{estado} {msg_accion} - {msg_extra}", 'incidencia_id': new_id}
+
+def ejecutar_deteccion_simulada(cliente_id: str, datos_externos: pd.Series = None) -> dict:
+    # 1-2. Preparar Datos + Predicción (esquema precompilado, sin pasar por pandas)
+    #El conjunto se toma una sola vez: una recarga en paralelo no afecta a esta lectura
+    conjunto = _cargar_motor()
+    if datos_externos is not None: _anotar_lectura(cliente_id, datos_externos)
+    if datos_externos is not None and conjunto:
         try:
-            p_hoy = modelos_ia['HOY'].predict_proba(X_input, raw_score=False)[:, 1][0]
-            p_man = modelos_ia['MANANA'].predict_proba(X_input, raw_score=False)[:, 1][0]
-            p_7d = modelos_ia['7DIAS'].predict_proba(X_input, raw_score=False)[:, 1][0]
+            p_hoy, p_man, p_7d = _predecir_lectura(conjunto, datos_externos)
         except: p_hoy, p_man, p_7d = 0.1, 0.1, 0.1
     else:
         # Fallback aleatorio
         p_hoy = random.random()
         p_man, p_7d = p_hoy, p_hoy
+    version = conjunto.version if conjunto else None
 
     # 3. Clasificación
-    estado, detalle = _aplicar_reglas(p_hoy, p_man, p_7d)
+    estado, detalle = _aplicar_reglas(p_hoy, p_man, p_7d, conjunto.umbrales if conjunto else UMBRALES_BASE)
     
     if "No Fuga" in estado: 
         return {'status': 'OK', 'message': f'Lectura normal ({p_hoy:.1%})'}
 
     # 4. BBDD (Gestión Segura + Anti-Duplicados)
-    conn = _conectar_bbdd()
+    return guardar_alerta(cliente_id, estado, detalle, p_hoy, version)
+
+def guardar_alerta(cliente_id, estado, detalle, p_hoy, version=None):
+    """Persiste una alerta y espera a que esté confirmada (en el grupo del escritor o en su propia transacción)."""
+    escritor = escritor_alertas(_path_cliente(cliente_id))
+    if escritor:
+        try: return escritor.enviar((None, cliente_id, estado, detalle, p_hoy, version)).result(ESPERA_ESCRITOR)
+        except Exception as e: return {'status': 'ERROR', 'message': str(e) or type(e).__name__}
+    conn = _conectar_bbdd(_path_cliente(cliente_id))
     if not conn: return {'status': 'ERROR'}
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM clientes WHERE cliente_id = ?", (str(cliente_id),))
-        res = cur.fetchone()
-        
-        datos_cli = {}
-        if not res:
-            
-            nom = faker.name()
-            email = f"{nom.split()[0]}@test.com"
-            
-            ### SEGURIDAD: Ciframos antes de guardar ###
-            cur.execute(
-                "INSERT INTO clientes VALUES (?, ?, ?, ?, ?)", 
-                (str(cliente_id), cifrar_pii(nom), cifrar_pii("600"), cifrar_pii(email), cifrar_pii("Barcelona"))
-            )
-            datos_cli = {'nombre': nom, 'email': email, 'direccion': "Barcelona"}
-        else:
-            #Cliente existente: Desciframos para uso interno
-            datos_cli = dict(res)
-            ### SEGURIDAD: Desciframos ###
-            datos_cli['email'] = descifrar_pii(datos_cli['email'])
-            datos_cli['nombre'] = descifrar_pii(datos_cli['nombre'])
+        res = _registrar_alerta(conn.cursor(), cliente_id, estado, detalle, p_hoy, version)
+        conn.commit()
+        return res
+    except Exception:
+        antirrebote.olvidar([str(cliente_id)])
+        raise
+    finally:
+        conn.close()
 
-        desc = f"{estado}. Prob: {p_hoy:.0%}. {detalle}"
+#DETECCIÓN POR LOTES
+def _aplicar_reglas_lote(p_hoy, p_manana, p_7dias, umbrales=UMBRALES_BASE):
+    """
+    Versión vectorizada de _aplicar_reglas sobre arrays de probabilidades.
+    Devuelve dos arrays (estado, detalle) con los mismos textos que la versión escalar.
+    """
+    u = umbrales
+    p_hoy, p_manana, p_7dias = (np.asarray(p, dtype=float) for p in (p_hoy, p_manana, p_7dias))
+    delta_corto = p_manana - p_hoy
+    delta_largo = p_7dias - p_hoy
 
-        #Buscamos si ya existe una incidencia NO resuelta para este cliente
-        cur.execute("SELECT id FROM incidencias WHERE cliente_id = ? AND verificacion != 'RESUELTA'", (str(cliente_id),))
-        inc_existente = cur.fetchone()
-        
-        new_id = None
-        msg_accion = ""
-        
-        if inc_existente:
-            
-            new_id = inc_existente['id']
-            cur.execute("""
-                UPDATE incidencias 
-                SET estado = ?, descripcion = ?, fecha_deteccion = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            """, (estado, desc, new_id))
-            msg_accion = "(Actualizada)"
-        else:
-           
-            cur.execute("INSERT INTO incidencias (cliente_id, estado, verificacion, descripcion) VALUES (?, ?, ?, ?)",
-                        (str(cliente_id), estado, 'PENDIENTE', desc))
-            new_id = cur.lastrowid
-            msg_accion = "(Nueva)"
+    bajo = p_hoy < u['UMBRAL_SEGURIDAD']
+    medio = ~bajo & (p_hoy < u['UMBRAL_ALERTA'])
+    alto = ~bajo & ~medio & (p_hoy < u['UMBRAL_CRITICO'])
+    tendencia = delta_largo > u['TENDENCIA_ESTRUCTURAL']
+    crecimiento = (delta_corto > u['TENDENCIA_RAPIDA']) | tendencia
 
-        
-        #Solo enviamos si es nueva o si ha empeorado a Grave
-        tiene_email = (datos_cli.get('email') is not None)
-        msg_extra = ""
-        
-        if "Leve" not in estado:
-            if not tiene_email:
-                
-                cur.execute("UPDATE incidencias SET verificacion = 'CARTA PENDIENTE' WHERE id = ?", (new_id,))
-                msg_extra = "Carta Pendiente"
-            else:
-                token = generar_token_seguro() 
-                link = f"http://127.0.0.1:8050/verificar/{token}"
-                msg = f"Hola {datos_cli['nombre']}, alerta GeSAI: {estado}."
-                
-                cur.execute("DELETE FROM tokens_verificacion WHERE incidencia_id = ?", (new_id,))
-                cur.execute("INSERT INTO tokens_verificacion (token, incidencia_id) VALUES (?, ?)", (token, new_id))
-                cur.execute("INSERT INTO notificaciones (cliente_id, mensaje, link) VALUES (?, ?, ?)", (str(cliente_id), msg, link))
-                msg_extra = "Push Enviado"
+    condiciones = [bajo, medio & tendencia, medio, alto & crecimiento, alto]
+    estados = np.select(condiciones, ["No Fuga", "Fuga Leve (Tendencia)", "No Fuga", "Fuga Grave (En Crecimiento)", "Fuga Moderada"], default="Fuga Grave").astype(object)
+    detalles = np.select(condiciones, ["", "", "Riesgo bajo", "Crecimiento rápido", "Estable"], default="Crítica").astype(object)
 
-        conn.commit()
-        return {'status': 'ALERTA', 'message': f"{estado} {msg_accion} - {msg_extra}"}
-    finally:
-        conn.close()
+    #El detalle de tendencia lleva el delta formateado, solo para esas filas
+    idx_tendencia = np.flatnonzero(medio & tendencia)
+    detalles[idx_tendencia] = [f"Tendencia +{d:.1%}" for d in delta_largo[idx_tendencia]]
+    return estados, detalles
+
+def evaluar_lote(df: pd.DataFrame, col_cliente='POLISSA_SUBM', anotar=True):
+    """
+    Predicción + reglas de un lote, sin tocar la BBDD (lo usan los workers del simulador).
+    Retorna (resultados, alertas): resultados 'OK' por fila (None en las alertas) y la lista
+    de alertas (fila, cliente_id, estado, detalle, p_hoy, modelo_version) para registrar_alertas.
+    anotar=False no pasa las lecturas al buffer de consumo (lo hace quien llama, p.ej. el proceso padre).
+    """
+    n = len(df)
+    if n == 0: return [], []
+    if anotar and buffer_lecturas.activo: anotar_lecturas(lecturas_consumo(df, col_cliente))
+
+    # 1-2. Preparar Datos (una sola matriz) + Predicción (cada modelo una vez sobre el lote)
+    #Todo el lote se puntúa con el mismo conjunto de modelos
+    conjunto = _cargar_motor()
+    if conjunto:
+        try:
+            p_hoy, p_man, p_7d = conjunto.predecir(_codificar_lote(df, conjunto.esquema))
+        except: p_hoy = p_man = p_7d = np.full(n, 0.1)
+    else:
+        # Fallback aleatorio
+        p_hoy = np.array([random.random() for _ in range(n)])
+        p_man, p_7d = p_hoy, p_hoy
+    version = conjunto.version if conjunto else None
+
+    # 3. Clasificación vectorizada
+    estados, detalles = _aplicar_reglas_lote(p_hoy, p_man, p_7d, conjunto.umbrales if conjunto else UMBRALES_BASE)
+    es_alerta = np.array(["No Fuga" not in e for e in estados], dtype=bool)
+
+    resultados = [None if a else {'status': 'OK', 'message': f'Lectura normal ({p:.1%})'} for p, a in zip(p_hoy, es_alerta)]
+    clientes = df[col_cliente].astype(str).to_numpy()
+    alertas = [(int(i), clientes[i], estados[i], detalles[i], float(p_hoy[i]), version) for i in np.flatnonzero(es_alerta)]
+    return resultados, alertas
+
+def evaluar_crudas(df: pd.DataFrame, col_cliente='POLISSA_SUBM', anotar=True):
+    """
+    Como evaluar_lote, para lecturas crudas (sin lags ni medias móviles): motor_features calcula
+    las features temporales de cada cliente con su estado en streaming, y luego se puntúa.
+    Las lecturas descartadas (fecha repetida o anterior a la última del cliente) devuelven ERROR.
+    """
+    if len(df) == 0: return [], []
+    completo, aplicadas = motor_features.completar_lote(df, col_cliente)
+    if aplicadas.all(): return evaluar_lote(completo, col_cliente, anotar)
+    posiciones = np.flatnonzero(aplicadas)
+    resultados = [{'status': 'ERROR', 'message': 'Lectura fuera de orden o repetida'}] * len(df)
+    if not len(posiciones): return resultados, []
+    res, alertas = evaluar_lote(completo.iloc[posiciones], col_cliente, anotar)
+    for i, r in zip(posiciones, res): resultados[i] = r
+    return resultados, [(int(posiciones[a[0]]), *a[1:]) for a in alertas]
+
+#ESCRITOR DE ALERTAS (group commit)
+_escritores = {}  #path -> EscritorAlertas (uno por shard)
+_lock_escritor = threading.Lock()
+
+def _registrar_alerta_escritor(cur, alerta):
+    _, cliente_id, estado, detalle, p_hoy, version = alerta
+    return _registrar_alerta(cur, cliente_id, estado, detalle, p_hoy, version)
+
+def _deshacer_alertas_escritor(alertas):
+    antirrebote.olvidar([str(a[1]) for a in alertas])
+
+def escritor_alertas(path=None):
+    """
+    El EscritorAlertas del proceso para path (gesai.db o un shard; se crea al primer uso), o None
+    si GRUPO_COMMIT = 0. Se rehace tras un fork (el hilo del padre no existe en el hijo); los de
+    ficheros que ya no están en uso (DB_PATH o SHARDS cambiados) se paran.
+    """
+    if GRUPO_COMMIT <= 0: return None
+    path = path or DB_PATH
+    e = _escritores.get(path)
+    if e is not None and e.vivo and e.pid == os.getpid(): return e
+    with _lock_escritor:
+        e = _escritores.get(path)
+        if e is None or not e.vivo or e.pid != os.getpid():
+            en_uso = set(_paths_datos())
+            for p, viejo in list(_escritores.items()):
+                if p == path or p not in en_uso:
+                    if viejo.pid == os.getpid() and viejo.vivo: viejo.cerrar()
+                    del _escritores[p]
+            #Conexión propia del escritor, fuera del pool: la tiene toda la vida del hilo
+            e = EscritorAlertas(lambda: _conexion_propia(path), _registrar_alerta_escritor, GRUPO_COMMIT, GRUPO_ESPERA,
+                                nombre=f"gesai-escritor-{os.path.basename(path)}", deshacer=_deshacer_alertas_escritor)
+            e.path = path
+            _escritores[path] = e
+    return e
+
+def cerrar_escritor_alertas():
+    """Espera a que se guarde lo encolado y para los escritores (también al salir)."""
+    with _lock_escritor:
+        escritores = list(_escritores.values())
+        _escritores.clear()
+    for e in escritores:
+        if e.pid == os.getpid(): e.cerrar()
+
+def estadisticas_escritor():
+    """Estadísticas de los escritores sumadas (uno por shard)."""
+    stats = [e.estadisticas() for e in list(_escritores.values())]
+    if not stats: return {}
+    total = {k: sum(s[k] for s in stats) for k in ('alertas', 'commits', 'errores', 'reintentos', 'alertas_s', 'commits_s')}
+    total['grupo_medio'] = total['alertas'] / total['commits'] if total['commits'] else 0.0
+    total['grupo_max'] = max(s['grupo_max'] for s in stats)
+    total['ms_por_commit'] = sum(s['ms_por_commit'] * s['commits'] for s in stats) / total['commits'] if total['commits'] else 0.0
+    total['escritores'] = len(stats)
+    return total
+
+atexit.register(cerrar_escritor_alertas)
+
+#VERSIÓN DE CAMBIOS (sondeos de la app)
+_versiones = None  #Una VersionesCambios por fichero de datos
+_lock_versiones = threading.Lock()
+
+def version_cambios():
+    """
+    {'incidencias': n, 'notificaciones': n}: suben con cada cambio, desde cualquier proceso
+    (con shards, la suma de los de cada uno).
+    None si está desactivado (VERSION_CAMBIOS_INTERVALO = 0) o no hay BBDD: hay que consultar.
+    """
+    global _versiones
+    if VERSION_CAMBIOS_INTERVALO <= 0: return None
+    paths = _paths_datos()
+    vs = _versiones
+    if vs is None or tuple(v.path for v in vs) != paths or vs[0].pid != os.getpid():
+        with _lock_versiones:
+            vs = _versiones
+            if vs is None or tuple(v.path for v in vs) != paths or vs[0].pid != os.getpid():
+                for v in vs or []:
+                    if v.pid == os.getpid(): v.cerrar()
+                #Conexión propia, fuera del pool: data_version es por conexión
+                vs = [VersionesCambios(lambda p=p: _conexion_propia(p), VERSION_CAMBIOS_INTERVALO) for p in paths]
+                for v, p in zip(vs, paths): v.path = p
+                _versiones = vs
+    total = {}
+    for v in vs:
+        actuales = v.actuales()
+        if actuales is None: return None
+        for ambito, n in actuales.items(): total[ambito] = total.get(ambito, 0) + n
+    return total
+
+def estadisticas_versiones():
+    vs = _versiones
+    if not vs: return {}
+    stats = [v.estadisticas() for v in vs]
+    return dict(stats[0], **{k: sum(s[k] for s in stats) for k in ('desde_memoria', 'comprobaciones', 'lecturas')})
+
+def registrar_alertas_async(alertas):
+    """Encola cada alerta en el escritor de su shard y retorna sus futures (None si no hay group commit)."""
+    if GRUPO_COMMIT <= 0: return None
+    return [escritor_alertas(_path_cliente(a[1])).enviar(a) for a in alertas]
+
+def registrar_alertas(alertas):
+    """
+    Guarda las alertas de evaluar_lote en una única transacción por fichero (gesai.db, o una por
+    shard) o, con group commit, en los grupos de los escritores, junto con las de otros hilos.
+    Retorna un resultado por alerta, en el mismo orden.
+    """
+    if not alertas: return []
+    futuros = registrar_alertas_async(alertas)
+    if futuros is not None:
+        resultados, limite = [], time.monotonic() + ESPERA_ESCRITOR
+        for f in futuros:
+            try: resultados.append(f.result(max(limite - time.monotonic(), 0)))
+            except Exception as e: resultados.append({'status': 'ERROR', 'message': str(e) or type(e).__name__})
+        return resultados
+    por_path = {}
+    for i, alerta in enumerate(alertas): por_path.setdefault(_path_cliente(alerta[1]), []).append(i)
+    res = [None] * len(alertas)
+    for path, indices in por_path.items():
+        conn = _conectar_bbdd(path)
+        if not conn:
+            for i in indices: res[i] = {'status': 'ERROR'}
+            continue
+        try:
+            cur = conn.cursor()
+            for i in indices:
+                _, cliente_id, estado, detalle, p_hoy, version = alertas[i]
+                res[i] = _registrar_alerta(cur, cliente_id, estado, detalle, p_hoy, version)
+            conn.commit()
+        except Exception:
+            antirrebote.olvidar([str(alertas[i][1]) for i in indices])
+            raise
+        finally:
+            conn.close()
+    return res
+
+def ejecutar_deteccion_lote(df: pd.DataFrame, col_cliente='POLISSA_SUBM') -> list:
+    """
+    Puntúa un lote de lecturas de una sola vez: una matriz de features,
+    una predicción por horizonte y reglas vectorizadas.
+    Devuelve una lista de resultados (mismo formato que ejecutar_deteccion_simulada)
+    en el orden de las filas de entrada. Las alertas se guardan en una única transacción.
+    """
+    resultados, alertas = evaluar_lote(df, col_cliente)
+
+    # 4. BBDD: todas las alertas del lote en una transacción
+    for alerta, res in zip(alertas, registrar_alertas(alertas)):
+        resultados[alerta[0]] = res
+    return resultados
 
 # --- FUNCIONES LECTURA APP (CON SEGURIDAD) ---
 
@@ -265,50 +1009,119 @@ def verificar_credenciales(u, p):
     finally: conn.close()
     return {'success': False, 'message': 'Credenciales incorrectas'}
 
-def get_lista_incidencias_activas(filtro="todas"):
-    conn = _conectar_bbdd()
-    # PROTECCIÓN 1: Si no hay conexión
-    if not conn: return []
-    
-    try:
-        # FILTRAMOS SOLO LAS NO RESUELTAS (Importante para el dashboard)
-        sql = """
-            SELECT i.*, c.nombre as cliente_nombre 
-            FROM incidencias i 
-            JOIN clientes c ON i.cliente_id = c.cliente_id
-            WHERE i.verificacion != 'RESUELTA'
-        """
-        params = []
-        
-        if filtro != "todas": 
-            sql += " AND i.estado LIKE ?"
-            params.append(f"%{filtro}%")
-            
-        sql += " ORDER BY i.fecha_deteccion DESC LIMIT 50"
-        
-        cur = conn.cursor()
-        cur.execute(sql, params) # Pasamos params de forma segura
-        rows = [dict(r) for r in cur.fetchall()]
+def _filtro_incidencias(filtro):
+    """Condición SQL de un filtro del dashboard: 'todas', una clase de severidad o 'carta'."""
+    f = str(filtro or 'todas').strip()
+    if f.lower() == 'todas': return "", []
+    if f.lower() == 'carta': return " AND i.verificacion = 'CARTA PENDIENTE'", []
+    for clase in CLASES_SEVERIDAD:
+        if f.lower() == clase.lower(): return " AND i.clase = ?", [clase]
+    return " AND i.estado LIKE ?", [f"%{f}%"]
+
+def get_pagina_incidencias(filtro="todas", despues_de=None, tam=None):
+    """
+    Una página de incidencias no resueltas, de la más reciente a la más antigua.
+    Paginación por clave (fecha_deteccion, id): despues_de es el 'siguiente' de la página
+    anterior (None = primera página) y cada página cuesta lo mismo sea cual sea su posición.
+    Con shards, cada uno da su página y se mezclan por la misma clave.
+    Retorna {'incidencias': [...], 'siguiente': cursor o None si no hay más}.
+    """
+    tam = tam or TAM_PAGINA_INCIDENCIAS
+    # FILTRAMOS SOLO LAS NO RESUELTAS (Importante para el dashboard)
+    sql = """
+        SELECT i.*, c.nombre as cliente_nombre 
+        FROM incidencias i 
+        JOIN clientes c ON i.cliente_id = c.cliente_id
+        WHERE i.verificacion != 'RESUELTA'
+    """
+    condicion, params = _filtro_incidencias(filtro)
+    sql += condicion
+    if despues_de:
+        sql += " AND (i.fecha_deteccion, i.id) < (?, ?)"
+        params += list(despues_de)
         
-        # ### SEGURIDAD: Descifrar nombres para la UI ###
-        for r in rows:
-            r['cliente_nombre'] = descifrar_pii(r['cliente_nombre'])
-            
-        return rows
+    sql += " ORDER BY i.fecha_deteccion DESC, i.id DESC LIMIT ?"
+    params.append(tam + 1)  #Una de más: dice si hay otra página
+    
+    paginas = []
+    for path in _paths_datos():
+        conn = _conectar_bbdd(path)
+        # PROTECCIÓN 1: Si no hay conexión
+        if not conn: return {'incidencias': [], 'siguiente': None}
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params) # Pasamos params de forma segura
+            paginas.append([dict(r) for r in cur.fetchall()])
+        except Exception as e:
+            print(f"⚠️ Error leyendo incidencias: {e}")
+            return {'incidencias': [], 'siguiente': None}
+        finally: conn.close()
+
+    if len(paginas) == 1: rows = paginas[0]
+    else: rows = list(itertools.islice(heapq.merge(*paginas, key=lambda r: (r['fecha_deteccion'] or '', r['id']), reverse=True), tam + 1))
+    hay_mas = len(rows) > tam
+    rows = rows[:tam]
+    
+    # ### SEGURIDAD: Descifrar nombres para la UI ###
+    for r in rows:
+        r['cliente_nombre'] = descifrar_pii(r['cliente_nombre'])
         
-    except Exception as e:
-        print(f"⚠️ Error leyendo incidencias: {e}")
-        return []
-    finally: conn.close()
+    siguiente = [rows[-1]['fecha_deteccion'], rows[-1]['id']] if hay_mas else None
+    return {'incidencias': rows, 'siguiente': siguiente}
+
+def get_lista_incidencias_activas(filtro="todas"):
+    """Primera página del listado (las TAM_PAGINA_INCIDENCIAS más recientes)."""
+    return get_pagina_incidencias(filtro)['incidencias']
+
+def get_resumen_incidencias():
+    """
+    KPI del dashboard sobre todas las incidencias abiertas (no solo las 50 de la lista):
+    una lectura de resumen_incidencias, que mantienen los triggers de la migración 4
+    (con shards, la de cada uno, sumadas).
+    """
+    vacio = {'total': 0, 'graves': 0, 'moderadas': 0, 'leves': 0, 'cartas': 0, 'por_clase': {}, 'por_verificacion': {}}
+    filas = []
+    for path in _paths_datos():
+        conn = _conectar_bbdd(path)
+        if not conn: return vacio
+        try:
+            filas += conn.execute("SELECT clase, verificacion, total FROM resumen_incidencias WHERE verificacion != 'RESUELTA' AND total > 0").fetchall()
+        except Exception as e:
+            print(f"⚠️ Error leyendo el resumen de incidencias: {e}")
+            return vacio
+        finally: conn.close()
+    res = dict(vacio, por_clase={}, por_verificacion={})
+    for clase, verificacion, total in filas:
+        res['total'] += total
+        res['por_clase'][clase] = res['por_clase'].get(clase, 0) + total
+        res['por_verificacion'][verificacion] = res['por_verificacion'].get(verificacion, 0) + total
+        if 'CARTA' in verificacion.upper(): res['cartas'] += total
+    res['graves'] = res['por_clase'].get('Grave', 0)
+    res['moderadas'] = res['por_clase'].get('Moderada', 0)
+    res['leves'] = res['por_clase'].get('Leve', 0)
+    return res
+
+def _shard_de_fila(sql, params):
+    """
+    (conexión, fila) del primer fichero de datos donde sql devuelve algo, o (None, None).
+    Para buscar por id o por token: los ids no se repiten entre shards. Quien llama cierra la conexión.
+    """
+    for path in _paths_datos():
+        conn = _conectar_bbdd(path)
+        if not conn: continue
+        try: fila = conn.execute(sql, params).fetchone()
+        except Exception:
+            conn.close()
+            raise
+        if fila: return conn, fila
+        conn.close()
+    return None, None
 
 def get_detalles_incidencia(id):
-    conn = _conectar_bbdd()
+    conn, inc = _shard_de_fila("SELECT * FROM incidencias WHERE id=?", (id,))
+    if not inc: return {'success': False}
     try:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM incidencias WHERE id=?", (id,))
-        inc = cur.fetchone()
-        if not inc: return {'success': False}
-        
         cur.execute("SELECT * FROM clientes WHERE cliente_id=?", (inc['cliente_id'],))
         cli = cur.fetchone()
         
@@ -331,34 +1144,43 @@ def get_detalles_incidencia(id):
     finally: conn.close()
 
 def get_notificaciones_pendientes_cliente(cid):
-    conn = _conectar_bbdd()
+    conn = _conectar_bbdd(_path_cliente(cid))
     try:
         cur = conn.cursor()
         cur.execute("SELECT * FROM notificaciones WHERE cliente_id=? AND leida=0", (str(cid),))
         return [dict(r) for r in cur.fetchall()]
     finally: conn.close()
 
-def marcar_notificacion_leida(nid):
-    conn = _conectar_bbdd()
-    try: conn.execute("UPDATE notificaciones SET leida=1 WHERE notificacion_id=?", (nid,)); conn.commit()
+def marcar_notificacion_leida(nid, cliente_id=None):
+    """
+    Marca leída la notificación con una sola escritura: en el shard de cliente_id o, sin él, en el
+    que la tenga (se busca solo leyendo, como el token en validar_token_y_registrar).
+    """
+    if cliente_id is not None or SHARDS <= 0:
+        conn = _conectar_bbdd(_path_cliente(cliente_id))
+    else:
+        conn, fila = _shard_de_fila("SELECT 1 FROM notificaciones WHERE notificacion_id=?", (nid,))
+        if not fila: return
+    try:
+        conn.execute("UPDATE notificaciones SET leida=1 WHERE notificacion_id=?", (nid,)); conn.commit()
     finally: conn.close()
 
 def validar_token_y_registrar(token, respuestas):
     """
     Valida token y guarda encuesta.
     """
-    conn = _conectar_bbdd()
-    if not conn: return {'success': False, 'message': 'Error de conexión'}
-
     try:
-        cur = conn.cursor()
-        # Verificar token
-        cur.execute("SELECT incidencia_id FROM tokens_verificacion WHERE token=?", (token,))
-        row = cur.fetchone()
+        # Verificar token (en el shard que lo tenga: la incidencia está en el mismo)
+        conn, row = _shard_de_fila("SELECT incidencia_id FROM tokens_verificacion WHERE token=?", (token,))
+    except Exception as e:
+        print(f"Error en validar_token_y_registrar: {e}")
+        return {'success': False, 'message': str(e)}
 
-        if not row: 
-            return {'success': False, 'message': 'Token inválido o ya utilizado'}
+    if not row: 
+        return {'success': False, 'message': 'Token inválido o ya utilizado'}
 
+    try:
+        cur = conn.cursor()
         inc_id = row['incidencia_id']
         respuestas_json = json.dumps(respuestas, ensure_ascii=False)
 
@@ -0,0 +1,100 @@
+# src/pool_bbdd.py
+# Pool de conexiones SQLite de larga vida para el motor. Antes cada función abría y cerraba su
+# propia conexión (sqlite3.connect + PRAGMAs + parseo de las sentencias), y el dashboard consulta
+# cada 2 s y la vista móvil cada 3 s.
+#   - Cada conexión la usa un solo hilo a la vez: se saca del pool y se devuelve con close().
+#   - Configuración al abrir: WAL (lectores y escritor no se bloquean), synchronous, caché de
+#     páginas, mmap, busy_timeout y caché de sentencias preparadas de sqlite3.
+#   - Si el fichero se sustituye (setup_database) o el proceso hace fork, las conexiones viejas
+#     se descartan.
+
+import os
+import sqlite3
+import threading
+
+class ConexionPool(sqlite3.Connection):
+    """
+    Conexión del pool: close() deshace lo no confirmado y la devuelve al pool en vez de cerrarla,
+    así el código que abre y cierra una conexión por llamada no cambia.
+    """
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None: return super().close()
+        pool.devolver(self)
+
+    def cerrar(self):
+        """Cierre real (al descartarla del pool)."""
+        self._pool = None
+        super().close()
+
+class PoolConexiones:
+    """
+    Conexiones libres en una pila (LIFO: la más reciente tiene la caché caliente). Sin límite de
+    conexiones en uso; como mucho max_libres quedan abiertas esperando. Seguro entre hilos.
+    """
+
+    def __init__(self, path, max_libres=8, pragmas=None, sentencias=256, preparar=None):
+        self.path = path
+        self.max_libres = int(max_libres)
+        self.pragmas = dict(pragmas or {})
+        self.sentencias = int(sentencias)
+        self.preparar = preparar  #fn(conn) en cada conexión nueva (p.ej. migraciones)
+        self.pid = os.getpid()
+        self._libres = []
+        self._lock = threading.Lock()
+        self.aperturas = self.reutilizadas = self.descartadas = 0
+
+    def _fichero(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_dev, st.st_ino)
+        except OSError:
+            return None
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=ConexionPool,
+                               cached_statements=self.sentencias)
+        for nombre, valor in self.pragmas.items():
+            conn.execute(f"PRAGMA {nombre} = {valor}").fetchall()
+        conn.row_factory = sqlite3.Row
+        if self.preparar: self.preparar(conn)
+        conn._pool, conn._fichero = self, self._fichero()
+        with self._lock: self.aperturas += 1
+        return conn
+
+    def obtener(self):
+        fichero = self._fichero()
+        while True:
+            with self._lock:
+                if not self._libres: break
+                conn = self._libres.pop()
+            if conn._fichero == fichero and fichero is not None:
+                with self._lock: self.reutilizadas += 1
+                return conn
+            #El fichero ha cambiado (BBDD regenerada): la conexión apunta al antiguo
+            with self._lock: self.descartadas += 1
+            conn.cerrar()
+        return self._abrir()
+
+    def devolver(self, conn):
+        try:
+            if conn.in_transaction: conn.rollback()  #Igual que al cerrar sin commit
+        except sqlite3.Error:
+            conn.cerrar()
+            return
+        with self._lock:
+            if len(self._libres) < self.max_libres:
+                self._libres.append(conn)
+                return
+        conn.cerrar()
+
+    def cerrar(self):
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for conn in libres: conn.cerrar()
+
+    def estadisticas(self):
+        with self._lock:
+            return {'path': self.path, 'libres': len(self._libres), 'max_libres': self.max_libres,
+                    'aperturas': self.aperturas, 'reutilizadas': self.reutilizadas, 'descartadas': self.descartadas}
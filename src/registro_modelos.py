@@ -0,0 +1,115 @@
+# src/registro_modelos.py
+# Registro de versiones de modelos: cada versión es un directorio inmutable con los
+# tres .joblib (HOY / MANANA / 7DIAS) y un manifiesto con features y umbrales.
+#   python src/registro_modelos.py publicar --origen data/processed-data [--version v2]
+#   python src/registro_modelos.py listar
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import datetime
+
+#CONFIG
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+REGISTRO_DIR = os.path.join(BASE_DIR, 'data', 'processed-data', 'registro_modelos')
+MANIFIESTO = 'manifiesto.json'
+HORIZONTES = ['HOY', 'MANANA', '7DIAS']
+
+def fichero_modelo(directorio, horizonte):
+    return os.path.join(directorio, f'lgbm_model_TARGET_{horizonte}.joblib')
+
+def dir_version(version, registro=None):
+    return os.path.join(registro or REGISTRO_DIR, version)
+
+def leer_manifiesto(version, registro=None):
+    """Manifiesto de una versión publicada (lanza OSError / ValueError si no es válido)."""
+    with open(os.path.join(dir_version(version, registro), MANIFIESTO), encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    if manifiesto.get('version') != version or not manifiesto.get('features'):
+        raise ValueError(f"Manifiesto inconsistente en {version}")
+    return manifiesto
+
+def listar_versiones(registro=None):
+    """Versiones publicadas, de la más antigua a la más reciente (por fecha de publicación)."""
+    registro = registro or REGISTRO_DIR
+    versiones = []
+    try:
+        entradas = list(os.scandir(registro))
+    except FileNotFoundError:
+        return []
+    for e in entradas:
+        #Los directorios que empiezan por '.' son publicaciones a medias
+        if not e.is_dir() or e.name.startswith('.'): continue
+        try: versiones.append((leer_manifiesto(e.name, registro)['publicado'], e.name))
+        except (OSError, ValueError, KeyError): continue
+    return [v for _, v in sorted(versiones)]
+
+def ultima_version(registro=None):
+    versiones = listar_versiones(registro)
+    return versiones[-1] if versiones else None
+
+def publicar_version(origen, version=None, umbrales=None, registro=None):
+    """
+    Copia los tres .joblib de `origen` al registro como una versión nueva.
+    Se escribe en un directorio temporal y se renombra: el motor nunca ve una versión a medias.
+    """
+    import joblib
+    registro = registro or REGISTRO_DIR
+    ahora = datetime.datetime.now()
+    version = version or ahora.strftime('v%Y%m%d-%H%M%S')
+    destino = dir_version(version, registro)
+    if os.path.exists(destino):
+        raise FileExistsError(f"La versión {version} ya existe")
+
+    modelos = {h: joblib.load(fichero_modelo(origen, h)) for h in HORIZONTES}
+    features = modelos['HOY'].booster_.feature_name()
+    for h, m in modelos.items():
+        if m.booster_.feature_name() != features:
+            raise ValueError(f"El modelo {h} no tiene las mismas features que HOY")
+
+    os.makedirs(registro, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f'.{version}-', dir=registro)
+    try:
+        for h in HORIZONTES: shutil.copy2(fichero_modelo(origen, h), fichero_modelo(tmp, h))
+        manifiesto = {
+            'version': version,
+            'publicado': ahora.isoformat(timespec='microseconds'),
+            'horizontes': HORIZONTES,
+            'features': features,
+            'umbrales': umbrales or {},
+        }
+        with open(os.path.join(tmp, MANIFIESTO), 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+        os.rename(tmp, destino)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return version
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Registro de versiones de modelos GeSAI")
+    sub = parser.add_subparsers(dest='accion', required=True)
+    p_pub = sub.add_parser('publicar', help="Publica los .joblib de un directorio como nueva versión")
+    p_pub.add_argument('--origen', default=os.path.join(BASE_DIR, 'data', 'processed-data'))
+    p_pub.add_argument('--version', default=None)
+    p_pub.add_argument('--umbrales', default=None, help='JSON, p.ej. \'{"UMBRAL_ALERTA": 0.75}\'')
+    sub.add_parser('listar', help="Lista las versiones publicadas")
+    args = parser.parse_args()
+
+    if args.accion == 'publicar':
+        try:
+            v = publicar_version(args.origen, args.version, json.loads(args.umbrales) if args.umbrales else None)
+            print(f"✅ Versión {v} publicada en {REGISTRO_DIR}")
+        except (OSError, ValueError) as e:
+            print(f"❌ No se pudo publicar: {e}")
+            sys.exit(1)
+    else:
+        versiones = listar_versiones()
+        if not versiones: print("(registro vacío)")
+        for v in versiones:
+            m = leer_manifiesto(v)
+            print(f"{v:<24} {m['publicado']}  {len(m['features'])} features  umbrales={m['umbrales']}")
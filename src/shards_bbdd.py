@@ -0,0 +1,161 @@
+# src/shards_bbdd.py
+# Reparto de gesai.db en N ficheros SQLite (shards) por hash de cliente_id: cada cliente, con sus
+# incidencias, notificaciones y tokens, vive en un solo shard, así N escritores confirman alertas
+# en paralelo en vez de esperar al único bloqueo de escritura de gesai.db. usuarios_empresa se
+# queda en gesai.db. El motor enruta solo (GESAI_SHARDS, motor_gesai._path_cliente) y los listados
+# del dashboard juntan lo de todos los shards.
+# Los ids (incidencias, notificaciones, tokens) no se repiten entre shards: cada uno numera en su
+# propio tramo de ESPACIO_IDS, por encima del id más alto que ya hubiera.
+#   python src/shards_bbdd.py --shards 4 [--bbdd gesai.db] [--desde 0]
+# Reparte la BBDD actual (gesai.db, o los shards de --desde) en ficheros nuevos
+# gesai.shard-KK-de-NN.db; el origen no se toca. Después, arrancar con GESAI_SHARDS=N.
+
+import os
+import sys
+import glob
+import time
+import zlib
+import sqlite3
+import argparse
+import functools
+import migraciones_bbdd
+
+#CONFIG
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+DB_PATH = os.path.join(BASE_DIR, 'gesai.db')
+#Tablas que se reparten por cliente (en orden: las claves ajenas apuntan a las anteriores)
+TABLAS_CLIENTE = ('clientes', 'incidencias', 'notificaciones', 'tokens_verificacion')
+ESPACIO_IDS = 10**9  #Ids por shard y reparto: el shard k numera desde techo + k * ESPACIO_IDS
+FILAS_POR_LOTE = 50_000
+
+def shard_de(cliente_id, n):
+    """Shard (0..n-1) de un cliente. crc32 y no hash(): tiene que dar lo mismo en todos los procesos."""
+    return zlib.crc32(str(cliente_id).encode()) % n
+
+@functools.lru_cache(maxsize=None)
+def paths_shards(db_path, n):
+    """gesai.db -> [gesai.shard-00-de-04.db, ...]"""
+    raiz, ext = os.path.splitext(db_path)
+    return tuple(f"{raiz}.shard-{k:02d}-de-{n:02d}{ext or '.db'}" for k in range(n))
+
+def ficheros_shards(db_path):
+    """Todos los ficheros de shards de db_path, de cualquier reparto (con sus -wal y -shm)."""
+    raiz, ext = os.path.splitext(db_path)
+    return sorted(glob.glob(f"{glob.escape(raiz)}.shard-*-de-*{ext or '.db'}*"))
+
+def _columnas(conn, tabla):
+    """Columnas que se pueden insertar (sin las generadas, como incidencias.clase)."""
+    return [r[1] for r in conn.execute(f"PRAGMA table_xinfo({tabla})") if r[6] == 0]
+
+def _techo_ids(origenes):
+    """Id más alto usado en cualquier tabla de cualquier origen (sqlite_sequence no baja al borrar)."""
+    techo = 0
+    for conn in origenes:
+        fila = conn.execute("SELECT MAX(seq) FROM sqlite_sequence").fetchone()
+        techo = max(techo, fila[0] or 0)
+    return techo
+
+def _crear_shard(path, esquema, version, k, techo):
+    """Shard vacío con las tablas de gesai.db (sin índices ni triggers: se crean tras copiar)."""
+    conn = sqlite3.connect(path)
+    #Ya en WAL, como lo abre el motor: si no, los procesos que lo abren a la vez se pisan al cambiarlo
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")  #Fichero temporal: si se corta, se repite el reparto
+    for tipo, nombre, sql in esquema:
+        if tipo == 'table': conn.execute(sql)
+    #Cada shard numera en su tramo: los ids no chocan al juntar listados ni al volver a repartir
+    conn.executemany("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                     [(nombre, techo + k * ESPACIO_IDS) for tipo, nombre, sql in esquema
+                      if tipo == 'table' and 'AUTOINCREMENT' in sql.upper()])
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+    conn.commit()
+    return conn
+
+def _copiar_tabla(origenes, destinos, tabla, sql_cliente):
+    """Copia las filas de tabla de todos los orígenes al shard de su cliente. Retorna filas copiadas."""
+    columnas = _columnas(origenes[0], tabla)
+    lista = ", ".join(columnas)
+    insertar = f"INSERT INTO {tabla} ({lista}) VALUES ({', '.join('?' * len(columnas))})"
+    n, copiadas = len(destinos), 0
+    for origen in origenes:
+        cur = origen.execute(f"SELECT {sql_cliente}, {', '.join('t.' + c for c in columnas)} FROM {tabla} t")
+        while filas := cur.fetchmany(FILAS_POR_LOTE):
+            por_shard = [[] for _ in range(n)]
+            for fila in filas:
+                if fila[0] is None: continue  #Token de una incidencia que ya no existe
+                por_shard[shard_de(fila[0], n)].append(fila[1:])
+            for destino, lote in zip(destinos, por_shard):
+                if lote: destino.executemany(insertar, lote)
+            copiadas += sum(len(l) for l in por_shard)
+    return copiadas
+
+def repartir(db_path, n, desde=0, verbose=True):
+    """
+    Reparte los datos de clientes de db_path (desde=0) o de sus `desde` shards en n shards nuevos.
+    Escribe en ficheros .tmp y los renombra al terminar; no modifica el origen.
+    Retorna {tabla: filas copiadas}.
+    """
+    if n < 1: raise ValueError("Hacen falta al menos 1 shard")
+    if desde == n: raise ValueError(f"El origen ya está repartido en {n} shards")
+    origen_paths = list(paths_shards(db_path, desde)) if desde > 0 else [db_path]
+    faltan = [p for p in [db_path] + origen_paths if not os.path.exists(p)]
+    if faltan: raise FileNotFoundError(f"No existe {faltan[0]}")
+    destino_paths = paths_shards(db_path, n)
+    t0 = time.perf_counter()
+
+    abiertas = [sqlite3.connect(p) for p in dict.fromkeys([db_path] + origen_paths)]
+    for conn in abiertas: migraciones_bbdd.migrar(conn)  #Todos en el mismo esquema antes de copiar
+    principal, origenes = abiertas[0], (abiertas[1:] if desde > 0 else abiertas)
+    esquema = principal.execute("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY rowid").fetchall()
+    version = migraciones_bbdd.version(principal)
+    techo = _techo_ids(origenes)
+
+    for p in destino_paths:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(p + '.tmp' + sufijo): os.remove(p + '.tmp' + sufijo)
+    destinos = [_crear_shard(p + '.tmp', esquema, version, k, techo) for k, p in enumerate(destino_paths)]
+    copiadas = {}
+    try:
+        #El cliente de cada fila: los tokens lo toman de su incidencia (en el mismo origen)
+        clientes = {'clientes': "t.cliente_id", 'incidencias': "t.cliente_id", 'notificaciones': "t.cliente_id",
+                    'tokens_verificacion': "(SELECT i.cliente_id FROM incidencias i WHERE i.id = t.incidencia_id)"}
+        for tabla in TABLAS_CLIENTE:
+            copiadas[tabla] = _copiar_tabla(origenes, destinos, tabla, clientes[tabla])
+            if verbose: print(f"   🔄 {tabla}: {copiadas[tabla]} filas ({time.perf_counter() - t0:.1f}s)")
+        for destino in destinos:
+            #Índices y triggers de gesai.db, ya con los datos dentro (más rápido que fila a fila)
+            for tipo, nombre, sql in esquema:
+                if tipo in ('index', 'trigger', 'view'): destino.execute(sql)
+            #Tablas derivadas: el recuento se rehace y las versiones arrancan de las del principal
+            migraciones_bbdd._resumen_incidencias(destino)
+            destino.executemany("INSERT OR REPLACE INTO versiones_cambios (ambito, version) VALUES (?, ?)",
+                                principal.execute("SELECT ambito, version FROM versiones_cambios").fetchall())
+            destino.commit()
+    finally:
+        for conn in destinos + abiertas: conn.close()
+    for p in destino_paths:
+        for sufijo in ('-wal', '-shm'):
+            if os.path.exists(p + sufijo): os.remove(p + sufijo)
+        os.replace(p + '.tmp', p)
+    if verbose:
+        print(f"✅ {sum(copiadas.values())} filas repartidas en {n} shards ({time.perf_counter() - t0:.1f}s)")
+    return copiadas
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reparte gesai.db en shards por cliente")
+    parser.add_argument('--shards', type=int, required=True, help="Número de shards nuevo")
+    parser.add_argument('--bbdd', default=DB_PATH)
+    parser.add_argument('--desde', type=int, default=int(os.environ.get('GESAI_SHARDS', 0)),
+                        help="Reparto actual: 0 = todo en gesai.db (por defecto GESAI_SHARDS)")
+    args = parser.parse_args()
+
+    origen = os.path.basename(args.bbdd) if args.desde == 0 else f"{args.desde} shards"
+    print(f"📊 Repartiendo {origen} en {args.shards} shards por hash de cliente_id...")
+    try:
+        repartir(args.bbdd, args.shards, args.desde)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for p in paths_shards(args.bbdd, args.shards): print(f"   📝 {p}")
+    print(f"🚀 Arranca la app y el simulador con GESAI_SHARDS={args.shards} (el origen queda como copia)")
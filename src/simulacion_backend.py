@@ -4,53 +4,46 @@ import sys
 import os
 import time
 import random
+import signal
+import argparse
+import threading
+import hashlib
+import multiprocessing as mp
+import queue
+from concurrent.futures import wait
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
 # Parche de ruta para importar módulos hermanos
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from motor_gesai import ejecutar_deteccion_simulada, _conectar_bbdd
+from motor_gesai import (
+    ejecutar_deteccion_simulada, evaluar_lote, registrar_alertas, registrar_alertas_async,
+    iniciar_vigilante_modelos, iniciar_buffer_consumo, _cargar_motor
+)
+import motor_gesai
+import dataset_features
 
 # Configuración de la simulación
 TIEMPO_ENTRE_LECTURAS = 3  # Segundos
+TAM_LOTE_WORKER = 64  # Lecturas por tarea en el modo pool
+TAM_LOTE_REPLAY = 500  # Máximo de lecturas de un mismo instante puntuadas juntas en el replay
+TAM_LOTE_SERIE = 1000  # Lecturas al azar que se pasan a dict de una vez en el modo original
+LOTES_POR_TAREA_MAPEADA = 16  # Modo pool sobre el Arrow mapeado: una lectura del fichero por 16 lotes
+ESPERA_RESULTADOS = 1.0  # Segundos entre comprobaciones de que los workers siguen vivos mientras no llegan resultados
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PATH_DATOS_SIMULACION = os.path.join(BASE_DIR, 'data', 'processed-data', 'datos_simulacion_features.csv')
 
-def cargar_datos_simulacion():
-    """Carga el CSV con los datos futuros para alimentar a la IA."""
-    if not os.path.exists(PATH_DATOS_SIMULACION):
-        print(f"[*] No se encuentra el fichero de simulación: {PATH_DATOS_SIMULACION}")
-        return None
-    try:
-        # Leemos el CSV. Importante: asegurar tipos
-        df = pd.read_csv(PATH_DATOS_SIMULACION)
-        # Convertir a tipos numéricos lo que se pueda para evitar errores en el modelo
-        return df
-    except Exception as e:
-        print(f" Error leyendo CSV simulación: {e}")
-        return None
-
-def main():
-    print("===========================================================")
-    print("                 GeSAI BACKEND: SIMULADOR IOT + IA ACTIVA")
-    print(f"   (Intervalo: {TIEMPO_ENTRE_LECTURAS}s | Fuente: datos_simulacion_features.csv)")
-    print("===========================================================\n")
-    
-    # 1. Cargar Datos Reales
-    df_simulacion = cargar_datos_simulacion()
-    if df_simulacion is None or df_simulacion.empty:
-        print("[*] No hay datos para simular. Ejecuta primero el notebook de entrenamiento.")
-        return
-
-    # Convertimos a lista de diccionarios para acceso rápido
-    # (Simulamos que llega un dato de un contador cada intervalo)
-    registros = df_simulacion.to_dict('records')
-    print(f"[*] Conectado a red IoT. {len(registros)} lecturas disponibles para streaming.\n")
+def lecturas_al_azar(memoria_mb=None, semilla=None):
+    """Lecturas sueltas (dict) al azar de todo el dataset, convirtiendo a dict solo TAM_LOTE_SERIE cada vez."""
+    for lote in dataset_features.lecturas_aleatorias(TAM_LOTE_SERIE, semilla, memoria_mb=memoria_mb, path_csv=PATH_DATOS_SIMULACION):
+        yield from lote.to_dict('records')
 
+def ejecutar_serie(lecturas):
+    """Modo original: una lectura cada TIEMPO_ENTRE_LECTURAS segundos, en este proceso."""
     try:
-        while True:
-            # 2. Elegir una lectura al azar del "futuro"
-            lectura_actual = random.choice(registros)
+        # 2. Lecturas al azar del "futuro" (lecturas_al_azar)
+        for lectura_actual in lecturas:
             cliente_id = str(lectura_actual['POLISSA_SUBM']) # Asegurar string
             
             timestamp = datetime.now().strftime("%H:%M:%S")
@@ -78,5 +71,374 @@ def main():
     except KeyboardInterrupt:
         print("\n🛑 Sistema detenido.")
 
+#MODO POOL (varios procesos)
+def _worker(datos, cola_tareas, cola_resultados, tam_lote):
+    """
+    Proceso de inferencia: puntúa los lotes de índices que saca de la cola con los modelos
+    heredados del proceso principal (con fork) o cargados aquí una vez. No escribe en la BBDD:
+    las alertas van al escritor único.
+    datos es un DataFrame o la tabla Arrow mapeada (compartida con los demás procesos).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  #Ctrl+C lo gestiona el proceso principal
+    #Un hilo de LightGBM por worker: sin sobresuscribir la CPU y sin usar en el hijo el pool
+    #OpenMP que el padre creó antes del fork (no sobrevive al fork)
+    motor_gesai.PARAMETROS_PREDICCION = {'num_threads': 1}
+    _cargar_motor()
+    #Con fork el hilo vigilante del padre no se hereda: cada worker vigila el registro
+    if motor_gesai.INTERVALO_RECARGA > 0: iniciar_vigilante_modelos()
+    cola_resultados.put(('listo', os.getpid()))
+    while True:
+        idx = cola_tareas.get()
+        if idx is None: break
+        if isinstance(datos, pd.DataFrame):
+            lotes = [datos.iloc[idx]]
+        else:
+            #Solo estas filas salen del fichero; se puntúan en lotes de tam_lote
+            filas = dataset_features.tomar(datos, idx).to_pandas(split_blocks=True)
+            lotes = [filas.iloc[i:i + tam_lote] for i in range(0, len(filas), tam_lote)]
+        for lote in lotes:
+            _, alertas = evaluar_lote(lote, anotar=False)
+            #El buffer de consumo vive en el proceso principal (un solo volcado a disco)
+            consumos = motor_gesai.lecturas_consumo(lote) if motor_gesai.buffer_lecturas.activo else None
+            cola_resultados.put(('lote', len(lote), alertas, consumos))
+    cola_resultados.put(('fin', os.getpid()))
+
+def _productor(num_registros, cola_tareas, num_workers, max_lecturas, tam_lote, parar):
+    """Reparte lecturas al azar (como el modo serie) en lotes de índices hasta max_lecturas o Ctrl+C."""
+    enviadas = 0
+    while not parar.is_set() and (max_lecturas is None or enviadas < max_lecturas):
+        k = tam_lote if max_lecturas is None else min(tam_lote, max_lecturas - enviadas)
+        cola_tareas.put([random.randrange(num_registros) for _ in range(k)])
+        enviadas += k
+    for _ in range(num_workers): cola_tareas.put(None)
+
+def _escribir_alertas(alertas, pendiente=None):
+    """
+    Con group commit (GESAI_GRUPO_COMMIT) encola las alertas sin esperar y retorna el future de
+    la última (las anteriores se guardan antes); sin él, las guarda en una transacción.
+    """
+    futuros = registrar_alertas_async(alertas) if alertas else None
+    if futuros is None:
+        registrar_alertas(alertas)
+        return pendiente
+    return futuros[-1]
+
+def _esperar_escritor(pendiente):
+    if pendiente is not None: wait([pendiente], timeout=motor_gesai.ESPERA_ESCRITOR)
+
+def imprimir_escritor():
+    e = motor_gesai.estadisticas_escritor()
+    if e: print(f"📝 Escritor (group commit): {e['alertas']} alertas en {e['commits']} commits (grupo medio {e['grupo_medio']:.1f},"
+                f" máx {e['grupo_max']}) | {e['alertas_s']:.0f} alertas/s | {e['commits_s']:.1f} commits (fsync)/s"
+                f" | {e['ms_por_commit']:.2f} ms por commit | errores {e['errores']}")
+    a = motor_gesai.estadisticas_antirrebote()
+    if a['omitidas'] or a['refrescadas']:
+        print(f"📝 Antirrebote ({a['intervalo']:.0f}s): {a['escritas']} alertas escritas, {a['refrescadas']} refrescadas sin push,"
+              f" {a['omitidas']} omitidas ({a['tasa_omitidas']:.0%})")
+
+def _recibir(cola_resultados, workers, terminados):
+    """
+    Siguiente mensaje de los workers. Si no llega nada y algún worker que no ha mandado 'fin' ya no
+    está vivo (OOM, excepción al cargar los modelos o a mitad de un lote), lanza RuntimeError en vez
+    de esperar para siempre. terminados: pids que ya mandaron 'fin'.
+    """
+    muertos_antes = set()
+    while True:
+        try:
+            return cola_resultados.get(timeout=ESPERA_RESULTADOS)
+        except queue.Empty:
+            #Muerto en dos comprobaciones seguidas: su 'fin' no estaba aún en camino por la tubería
+            muertos = [w for w in workers if not w.is_alive() and w.pid not in terminados]
+            caidos = [w for w in muertos if w.pid in muertos_antes]
+            if caidos:
+                raise RuntimeError("Worker(s) terminados sin acabar: " +
+                                   ", ".join(f"pid {w.pid} (código {w.exitcode})" for w in caidos))
+            muertos_antes = {w.pid for w in muertos}
+
+def _parar_pool(parar, cola_tareas, workers):
+    """Para el productor y los workers (Ctrl+C o un worker caído)."""
+    parar.set()
+    cola_tareas.cancel_join_thread()  #Sin esperar a vaciar una cola que ya nadie lee
+    for w in workers: w.terminate()
+
+def ejecutar_pool(datos, num_workers, max_lecturas=None, tam_lote=TAM_LOTE_WORKER, informe_cada=1.0, verbose=True, escribir=True):
+    """
+    Modo pool: num_workers procesos puntúan en paralelo y este proceso es el único
+    escritor de SQLite (una transacción por lote; con group commit, el hilo escritor del
+    motor, sin frenar la recogida de resultados). Retorna métricas de rendimiento.
+    datos: DataFrame, o la tabla Arrow mapeada (dataset_features.tabla_mapeada) para recorrer
+    un dataset que no cabe en memoria; los workers la heredan y leen solo las filas sorteadas.
+    escribir=False descarta las alertas (mide solo la inferencia).
+    """
+    if isinstance(datos, pd.DataFrame):
+        datos, tam_tarea = datos.reset_index(drop=True), tam_lote
+    else:
+        tam_tarea = tam_lote * LOTES_POR_TAREA_MAPEADA
+    t0 = time.perf_counter()
+    #Con fork los workers heredan los modelos ya cargados aquí: los árboles de LightGBM (o los arrays
+    #mmap del motor NumPy) quedan en páginas compartidas copia-en-escritura en vez de una copia por worker
+    if mp.get_start_method() == 'fork': _cargar_motor()
+    cola_tareas = mp.Queue(maxsize=4 * num_workers)  #Acotada: el productor no se adelanta a los workers
+    cola_resultados = mp.Queue()
+    workers = [mp.Process(target=_worker, args=(datos, cola_tareas, cola_resultados, tam_lote), daemon=True) for _ in range(num_workers)]
+    for w in workers: w.start()
+
+    #Esperamos a que todos tengan los modelos cargados antes de medir
+    parar = threading.Event()
+    listos, terminados = 0, set()
+    try:
+        while listos < num_workers:
+            if _recibir(cola_resultados, workers, terminados)[0] == 'listo': listos += 1
+    except BaseException:
+        _parar_pool(parar, cola_tareas, workers)
+        raise
+    t_carga = time.perf_counter() - t0
+
+    productor = threading.Thread(target=_productor, args=(len(datos), cola_tareas, num_workers, max_lecturas, tam_tarea, parar), daemon=True)
+    t_inicio = t_ultimo = time.perf_counter()
+    productor.start()
+
+    lecturas = alertas_total = lecturas_ultimo = 0
+    t_escritura, pendiente = 0.0, None
+    try:
+        while len(terminados) < num_workers:
+            msg = _recibir(cola_resultados, workers, terminados)
+            if msg[0] == 'fin':
+                terminados.add(msg[1])
+                continue
+            _, n, alertas, consumos = msg
+            motor_gesai.anotar_lecturas(consumos)
+            t_w = time.perf_counter()
+            if escribir: pendiente = _escribir_alertas(alertas, pendiente)
+            t_escritura += time.perf_counter() - t_w
+            lecturas += n
+            alertas_total += len(alertas)
+            ahora = time.perf_counter()
+            if verbose and ahora - t_ultimo >= informe_cada:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] {(lecturas - lecturas_ultimo) / (ahora - t_ultimo):8.0f} lecturas/s"
+                      f" | total {lecturas} | 🔴🟠 alertas {alertas_total}")
+                t_ultimo, lecturas_ultimo = ahora, lecturas
+    except KeyboardInterrupt:
+        print("\n🛑 Sistema detenido.")
+        _parar_pool(parar, cola_tareas, workers)
+    except BaseException:
+        _parar_pool(parar, cola_tareas, workers)
+        _esperar_escritor(pendiente)  #Lo ya puntuado se guarda igualmente
+        raise
+    for w in workers: w.join()
+    t_w = time.perf_counter()
+    _esperar_escritor(pendiente)
+    t_escritura += time.perf_counter() - t_w
+
+    duracion = time.perf_counter() - t_inicio
+    return {
+        'workers': num_workers, 'lecturas': lecturas, 'alertas': alertas_total,
+        'segundos': duracion, 'lecturas_s': lecturas / duracion if duracion else 0.0,
+        'carga_modelos_s': t_carga, 'escritura_s': t_escritura,
+    }
+
+#MODO SECUENCIAL (todo el dataset, memoria acotada)
+def ejecutar_secuencial(lotes, max_lecturas=None, tam_lote=TAM_LOTE_REPLAY, informe_cada=1.0, verbose=True):
+    """
+    Puntúa las lecturas en el orden del fichero a máxima velocidad, trozo a trozo
+    (dataset_features.iterar_lotes): en memoria solo está el trozo en curso, así que recorre
+    datasets más grandes que la RAM. Retorna métricas, con el pico de memoria del proceso.
+    """
+    _cargar_motor()
+    lecturas = alertas = lecturas_ultimo = 0
+    pendiente = None
+    t_inicio = t_ultimo = time.perf_counter()
+    try:
+        for trozo in lotes:
+            if max_lecturas is not None: trozo = trozo.iloc[:max_lecturas - lecturas]
+            for inicio in range(0, len(trozo), tam_lote):
+                lote = trozo.iloc[inicio:inicio + tam_lote]
+                _, alertas_lote = evaluar_lote(lote)
+                pendiente = _escribir_alertas(alertas_lote, pendiente)
+                lecturas += len(lote)
+                alertas += len(alertas_lote)
+            ahora = time.perf_counter()
+            if verbose and ahora - t_ultimo >= informe_cada:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] {(lecturas - lecturas_ultimo) / (ahora - t_ultimo):8.0f} lecturas/s"
+                      f" | total {lecturas} | 🔴🟠 alertas {alertas}")
+                t_ultimo, lecturas_ultimo = ahora, lecturas
+            if max_lecturas is not None and lecturas >= max_lecturas: break
+    except KeyboardInterrupt:
+        print("\n🛑 Sistema detenido.")
+    _esperar_escritor(pendiente)
+    duracion = time.perf_counter() - t_inicio
+    try:
+        import resource  #Solo en Unix
+        rss_max_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        rss_max_mb = None
+    return {
+        'lecturas': lecturas, 'alertas': alertas, 'segundos': duracion,
+        'lecturas_s': lecturas / duracion if duracion else 0.0,
+        'rss_max_mb': rss_max_mb,
+    }
+
+#MODO REPLAY (orden cronológico)
+def ejecutar_replay(datos=None, velocidad=1.0, desde=None, hasta=None, clientes=None, tam_lote=TAM_LOTE_REPLAY, verbose=True, semilla=0, memoria_mb=None):
+    """
+    Reproduce las lecturas en orden cronológico. velocidad=1 es tiempo real, 100 es x100 y
+    0/None es lo más rápido posible. Las lecturas de un mismo instante se puntúan juntas
+    (evaluar_lote + registrar_alertas). La latencia de cada lectura va desde su instante programado
+    hasta que su resultado está guardado, así que incluye el retraso si el motor no da abasto.
+    datos: DataFrame con las lecturas, o None para recorrer datos_simulacion_features por ventanas
+    de instantes (dataset_features.iterar_cronologico): en memoria solo la fecha y la póliza del
+    rango y la ventana en curso. Retorna métricas y una huella de los resultados (igual entre
+    ejecuciones con los mismos datos), o None si no hay lecturas en el rango / clientes.
+    """
+    ventanas = dataset_features.iterar_cronologico(datos, clientes, desde, hasta, memoria_mb=memoria_mb, path_csv=PATH_DATOS_SIMULACION)
+    ventana = next(ventanas, None)
+    if ventana is None:
+        print("[*] Ninguna lectura en el rango / clientes indicados.")
+        return None
+    random.seed(semilla)  #El fallback aleatorio (sin modelos) también es reproducible
+    _cargar_motor()
+
+    origen = ultima = None
+    huella = hashlib.sha256()
+    latencias = []
+    estados = {}
+    alertas = 0
+
+    t_inicio = time.perf_counter()
+    try:
+        while ventana is not None:
+            fechas, df = ventana
+            if origen is None: origen = fechas[0]
+            df['POLISSA_SUBM'] = df['POLISSA_SUBM'].astype(str)
+            cortes = np.flatnonzero(fechas[1:] != fechas[:-1]) + 1
+            for idx in np.split(np.arange(len(df)), cortes):
+                simulado = (fechas[idx[0]] - origen) / np.timedelta64(1, 's')
+                programado = t_inicio + (simulado / velocidad if velocidad else 0.0)
+                espera = programado - time.perf_counter()
+                if espera > 0: time.sleep(espera)
+                if not velocidad: programado = time.perf_counter()
+
+                alertas_grupo = 0
+                for inicio in range(0, len(idx), tam_lote):
+                    trozo = idx[inicio:inicio + tam_lote]
+                    resultados, alertas_trozo = evaluar_lote(df.iloc[trozo])
+                    for alerta, r in zip(alertas_trozo, registrar_alertas(alertas_trozo)): resultados[alerta[0]] = r
+                    latencias.append(np.full(len(trozo), time.perf_counter() - programado))
+                    #Huella de las decisiones del motor (no de los efectos en BBDD, que dependen de su estado)
+                    decisiones = {a[0]: f"{a[2]}|{a[3]}|{a[4]:.6f}" for a in alertas_trozo}
+                    for j, (i, r) in enumerate(zip(trozo, resultados)):
+                        estado = r.get('status', 'UNKNOWN')
+                        estados[estado] = estados.get(estado, 0) + 1
+                        alertas_grupo += estado == 'ALERTA'
+                        huella.update(f"{df.at[i, 'POLISSA_SUBM']}|{decisiones.get(j, r.get('message', ''))}\n".encode())
+                    ultima = fechas[idx[0]]
+                alertas += alertas_grupo
+                if verbose:
+                    print(f"[{pd.Timestamp(fechas[idx[0]])}] {len(idx):5d} lecturas | 🔴🟠 {alertas_grupo:4d} alertas"
+                          f" | retraso {(time.perf_counter() - programado) * 1000:7.1f} ms")
+            ventana = next(ventanas, None)
+    except KeyboardInterrupt:
+        print("\n🛑 Replay detenido.")
+
+    duracion = time.perf_counter() - t_inicio
+    lat = np.concatenate(latencias) * 1000 if latencias else None  #None: detenido antes de la primera lectura
+    percentil = lambda q: float(np.percentile(lat, q)) if lat is not None else None
+    return {
+        'lecturas': 0 if lat is None else len(lat), 'alertas': alertas, 'estados': estados,
+        'desde': str(pd.Timestamp(origen)) if lat is not None else None,
+        'hasta': str(pd.Timestamp(ultima)) if lat is not None else None,
+        'segundos': duracion, 'lecturas_s': (0 if lat is None else len(lat)) / duracion if duracion else 0.0,
+        'segundos_simulados': (ultima - origen) / np.timedelta64(1, 's') if lat is not None else 0.0,
+        'lat_p50_ms': percentil(50), 'lat_p95_ms': percentil(95),
+        'lat_p99_ms': percentil(99), 'lat_max_ms': float(lat.max()) if lat is not None else None,
+        'huella': huella.hexdigest()[:16],
+    }
+
+def imprimir_resumen_replay(m):
+    print("\n📊 RESUMEN REPLAY")
+    if not m['lecturas']:
+        print("   Ninguna lectura reproducida (detenido antes del primer instante).")
+        return
+    print(f"   Rango      : {m['desde']} -> {m['hasta']}")
+    print(f"   Lecturas   : {m['lecturas']} en {m['segundos']:.1f}s -> {m['lecturas_s']:.0f} lecturas/s"
+          f" (x{m['segundos_simulados'] / m['segundos'] if m['segundos'] else 0:.0f} sobre tiempo real)")
+    print(f"   Resultados : {m['estados']} | alertas {m['alertas']}")
+    print(f"   Latencia   : p50={m['lat_p50_ms']:.1f} ms p95={m['lat_p95_ms']:.1f} ms p99={m['lat_p99_ms']:.1f} ms máx={m['lat_max_ms']:.1f} ms")
+    print(f"   Huella     : {m['huella']} (idéntica entre ejecuciones con los mismos datos y modelos)")
+
+def main():
+    parser = argparse.ArgumentParser(description="GeSAI: simulador IoT + IA")
+    parser.add_argument('--workers', type=int, default=0, help="Procesos de inferencia (0 = modo original, una lectura cada intervalo)")
+    parser.add_argument('--lecturas', type=int, default=None, help="Modos pool y secuencial: parar tras N lecturas (por defecto, hasta Ctrl+C / el final)")
+    parser.add_argument('--lote', type=int, default=TAM_LOTE_WORKER, help="Modo pool: lecturas por tarea")
+    parser.add_argument('--replay', action='store_true', help="Reproduce el CSV en orden de FECHA_HORA_CRONO")
+    parser.add_argument('--velocidad', type=float, default=1.0, help="Replay: 1 = tiempo real, 100 = x100, 0 = lo más rápido posible")
+    parser.add_argument('--desde', default=None, help="Replay: fecha/hora inicial (p.ej. 2024-03-01 o '2024-03-01 06:00')")
+    parser.add_argument('--hasta', default=None, help="Replay: fecha/hora final (incluida)")
+    parser.add_argument('--clientes', default=None, help="Replay: pólizas separadas por comas, o @fichero con una por línea")
+    parser.add_argument('--secuencial', action='store_true', help="Recorre todo el dataset en el orden del fichero a máxima velocidad")
+    parser.add_argument('--memoria-mb', type=float, default=None,
+                        help=f"Techo de memoria de los trozos leídos del dataset (por defecto {dataset_features.MEMORIA_LECTOR_MB:g}, GESAI_MEMORIA_LECTOR_MB)")
+    args = parser.parse_args()
+
+    print("===========================================================")
+    print("                 GeSAI BACKEND: SIMULADOR IOT + IA ACTIVA")
+    if args.replay:
+        print(f"   (Replay: {'máxima velocidad' if not args.velocidad else f'x{args.velocidad:g}'} | Fuente: datos_simulacion_features.csv)")
+    elif args.secuencial:
+        print("   (Secuencial: todo el dataset en orden | Fuente: datos_simulacion_features.csv)")
+    elif args.workers > 0:
+        print(f"   (Pool: {args.workers} workers | Fuente: datos_simulacion_features.csv)")
+    else:
+        print(f"   (Intervalo: {TIEMPO_ENTRE_LECTURAS}s | Fuente: datos_simulacion_features.csv)")
+    if motor_gesai.GRUPO_COMMIT > 0:
+        print(f"   (Group commit: hasta {motor_gesai.GRUPO_COMMIT} alertas por transacción, espera máx. {motor_gesai.GRUPO_ESPERA * 1000:g} ms)")
+    print("===========================================================\n")
+    
+    # 1. Datos Reales: nunca el dataset entero en memoria (el replay lo recorre por ventanas de instantes)
+    if not dataset_features.disponible(PATH_DATOS_SIMULACION):
+        print("[*] No hay datos para simular. Ejecuta primero el notebook de entrenamiento.")
+        return
+    tabla = dataset_features.tabla_mapeada(path_csv=PATH_DATOS_SIMULACION)
+    if tabla is not None:
+        print(f"[*] Conectado a red IoT. {tabla.num_rows} lecturas disponibles para streaming.\n")
+    else:
+        print("[*] Conectado a red IoT. Lectura del CSV por trozos (importa el Arrow con "
+              "'python src/dataset_features.py importar' para acceso aleatorio).\n")
+    #Las lecturas puntuadas alimentan el histórico reciente que ve la app (volcado periódico a disco)
+    iniciar_buffer_consumo()
+
+    if args.replay:
+        clientes = None
+        if args.clientes:
+            if args.clientes.startswith('@'):
+                with open(args.clientes[1:], encoding='utf-8') as f: clientes = [l.strip() for l in f if l.strip()]
+            else:
+                clientes = [c.strip() for c in args.clientes.split(',') if c.strip()]
+        m = ejecutar_replay(None, args.velocidad, args.desde, args.hasta, clientes, memoria_mb=args.memoria_mb)
+        if m: imprimir_resumen_replay(m)
+    elif args.secuencial:
+        m = ejecutar_secuencial(dataset_features.iterar_lotes(memoria_mb=args.memoria_mb, path_csv=PATH_DATOS_SIMULACION), args.lecturas)
+        print(f"\n📊 {m['lecturas']} lecturas en {m['segundos']:.1f}s -> {m['lecturas_s']:.0f} lecturas/s | "
+              f"alertas {m['alertas']}" + (f" | pico de memoria {m['rss_max_mb']:.0f} MB" if m['rss_max_mb'] is not None else ""))
+    elif args.workers > 0:
+        datos = tabla
+        if datos is None:
+            #Sin acceso aleatorio al CSV: los workers sortean sobre una muestra que cabe en memoria
+            datos = dataset_features.muestra(None, memoria_mb=args.memoria_mb, path_csv=PATH_DATOS_SIMULACION)
+            print(f"⚠️ Sin Arrow importado: el pool sortea sobre una muestra de {len(datos)} lecturas del CSV.")
+        try:
+            m = ejecutar_pool(datos, args.workers, args.lecturas, args.lote)
+        except RuntimeError as e:
+            print(f"❌ Modo pool detenido: {e}")
+            sys.exit(1)
+        print(f"\n📊 {m['lecturas']} lecturas en {m['segundos']:.1f}s con {m['workers']} workers -> "
+              f"{m['lecturas_s']:.0f} lecturas/s ({m['lecturas_s'] / m['workers']:.0f} por worker) | "
+              f"alertas {m['alertas']} | escritura BBDD {m['escritura_s']:.1f}s")
+    else:
+        # (Simulamos que llega un dato de un contador cada intervalo, al azar de todo el dataset)
+        ejecutar_serie(lecturas_al_azar(args.memoria_mb))
+    imprimir_escritor()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
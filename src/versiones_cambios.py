@@ -0,0 +1,66 @@
+# src/versiones_cambios.py
+# Versión de cambios de incidencias y notificaciones: contadores en la tabla versiones_cambios
+# (migración 5) que suben con cada escritura, por triggers, desde cualquier proceso (simulador,
+# gateway, app). Aquí se reflejan en memoria para los sondeos del dashboard (2 s) y de la vista
+# móvil (3 s): cada navegador envía la última versión que vio y, si no se ha movido, el callback
+# responde no_update sin consultar ni descifrar nada.
+# La copia en memoria se comprueba como mucho una vez cada `intervalo` segundos, para todas las
+# sesiones a la vez, con PRAGMA data_version (no lee ninguna tabla; cambia cuando otra conexión
+# confirma una transacción). Solo entonces se releen los contadores.
+
+import os
+import time
+import threading
+
+class VersionesCambios:
+    """
+    conectar(): conexión propia (de solo lectura en la práctica: si escribiera, data_version no
+    vería sus propios cambios). Seguro entre hilos.
+    """
+
+    def __init__(self, conectar, intervalo=0.25):
+        self.conectar = conectar
+        self.intervalo = float(intervalo)
+        self._conn = None
+        self._data_version = None
+        self._versiones = None
+        self._comprobado = 0.0
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        self.memoria = self.comprobaciones = self.lecturas = 0
+
+    def actuales(self):
+        """{'incidencias': n, 'notificaciones': n}, o None si no hay BBDD."""
+        with self._lock:
+            ahora = time.monotonic()
+            if self._versiones is not None and ahora - self._comprobado < self.intervalo:
+                self.memoria += 1
+                return dict(self._versiones)
+            try:
+                if self._conn is None: self._conn = self.conectar()
+                data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                self.comprobaciones += 1
+                if data_version != self._data_version or self._versiones is None:
+                    self._versiones = dict(self._conn.execute("SELECT ambito, version FROM versiones_cambios").fetchall())
+                    self._data_version = data_version
+                    self.lecturas += 1
+            except Exception as e:
+                print(f"⚠️ Error leyendo versiones de cambios: {e}")
+                self.cerrar_conexion()
+                return None
+            self._comprobado = ahora
+            return dict(self._versiones)
+
+    def cerrar_conexion(self):
+        if self._conn is not None:
+            try: getattr(self._conn, 'cerrar', self._conn.close)()
+            except Exception: pass
+        self._conn, self._data_version, self._versiones = None, None, None
+
+    def cerrar(self):
+        with self._lock: self.cerrar_conexion()
+
+    def estadisticas(self):
+        with self._lock:
+            return {'intervalo': self.intervalo, 'desde_memoria': self.memoria,
+                    'comprobaciones': self.comprobaciones, 'lecturas': self.lecturas}
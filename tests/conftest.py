@@ -0,0 +1,30 @@
+# tests/conftest.py
+# Fixtures comunes de los tests: src/ y la raíz en el path, y una gesai.db temporal a la que se
+# apunta el motor. Se ejecutan desde la raíz del proyecto con: python -m pytest -q
+
+import os
+import sys
+import sqlite3
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('GESAI_INTERVALO_RECARGA', '0')  #Sin hilo vigilante del registro de modelos
+
+@pytest.fixture
+def bbdd(tmp_path, monkeypatch):
+    """gesai.db vacía (esquema de setup_database + migraciones) y el motor apuntando a ella, sin shards."""
+    import motor_gesai
+    from setup_database import crear_tablas
+    path = str(tmp_path / 'gesai.db')
+    conn = sqlite3.connect(path)
+    crear_tablas(conn)
+    conn.close()
+    monkeypatch.setattr(motor_gesai, 'DB_PATH', path)
+    monkeypatch.setattr(motor_gesai, 'BUFFER_DIR', str(tmp_path / 'buffer_consumo'))
+    monkeypatch.setattr(motor_gesai, 'SHARDS', 0)
+    motor_gesai.cerrar_pool_bbdd()
+    yield path
+    motor_gesai.cerrar_pool_bbdd()
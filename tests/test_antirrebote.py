@@ -0,0 +1,48 @@
+# tests/test_antirrebote.py
+# Antirrebote de alertas (antirrebote_alertas.py) desde motor_gesai.registrar_alertas: desactivado
+# (GESAI_ANTIRREBOTE_S=0, el valor por defecto) cada alerta repetida de una incidencia abierta se
+# escribe y se notifica como antes; con un intervalo, las de la misma clase se agrupan.
+
+import sqlite3
+import pytest
+import motor_gesai
+from antirrebote_alertas import AntirreboteAlertas
+
+CLIENTE = '200001'
+
+def _alerta(estado):
+    return (0, CLIENTE, estado, 'test', 0.9, 'test')
+
+def _contar(path):
+    conn = sqlite3.connect(path)
+    incidencias = conn.execute("SELECT COUNT(*), MAX(actualizaciones) FROM incidencias WHERE cliente_id = ?", (CLIENTE,)).fetchone()
+    notificaciones = conn.execute("SELECT COUNT(*) FROM notificaciones WHERE cliente_id = ?", (CLIENTE,)).fetchone()[0]
+    conn.close()
+    return incidencias, notificaciones
+
+@pytest.fixture
+def reloj():
+    return [0.0]
+
+def _con_antirrebote(monkeypatch, intervalo, reloj):
+    monkeypatch.setattr(motor_gesai, 'GRUPO_COMMIT', 0)
+    monkeypatch.setattr(motor_gesai, 'antirrebote', AntirreboteAlertas(intervalo, reloj=lambda: reloj[0]))
+
+def test_sin_antirrebote_cada_alerta_se_escribe_y_notifica(bbdd, monkeypatch, reloj):
+    _con_antirrebote(monkeypatch, 0, reloj)
+    res = [motor_gesai.registrar_alertas([_alerta('Fuga Grave')])[0] for _ in range(3)]
+    assert [r['message'] for r in res] == ['Fuga Grave (Nueva) - Push Enviado'] + ['Fuga Grave (Actualizada) - Push Enviado'] * 2
+    assert _contar(bbdd) == ((1, 2), 3)
+    assert motor_gesai.estadisticas_antirrebote()['omitidas'] == 0
+
+def test_con_intervalo_agrupa_las_repetidas(bbdd, monkeypatch, reloj):
+    _con_antirrebote(monkeypatch, 3600, reloj)
+    res = [motor_gesai.registrar_alertas([_alerta('Fuga Grave')])[0] for _ in range(3)]
+    assert res[0]['message'] == 'Fuga Grave (Nueva) - Push Enviado'
+    assert all('Agrupada' in r['message'] for r in res[1:])
+    assert _contar(bbdd) == ((1, 0), 1)
+    #Pasado el intervalo se refresca sin push nuevo; un cambio de clase vuelve a notificar
+    reloj[0] = 3600
+    assert motor_gesai.registrar_alertas([_alerta('Fuga Grave')])[0]['message'] == 'Fuga Grave (Actualizada) - Ya notificada'
+    assert motor_gesai.registrar_alertas([_alerta('Fuga Moderada')])[0]['message'] == 'Fuga Moderada (Actualizada) - Push Enviado'
+    assert _contar(bbdd) == ((1, 2), 2)
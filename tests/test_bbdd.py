@@ -0,0 +1,117 @@
+# tests/test_bbdd.py
+# Esquema de gesai.db: migraciones desde las tablas de antes de migraciones_bbdd, índices que usan
+# las consultas calientes del motor (EXPLAIN QUERY PLAN) y una sola incidencia abierta por cliente,
+# también con varios procesos registrando alertas a la vez sobre los mismos clientes.
+
+import multiprocessing as mp
+import random
+import sqlite3
+import pytest
+import motor_gesai
+import migraciones_bbdd
+
+#Tablas tal como las creaba setup_database antes de las migraciones (esquema v0)
+TABLAS_V0 = [
+    "CREATE TABLE clientes (cliente_id TEXT PRIMARY KEY, nombre TEXT, telefono TEXT, email TEXT, direccion TEXT)",
+    "CREATE TABLE incidencias (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id TEXT, fecha_deteccion DATETIME DEFAULT CURRENT_TIMESTAMP, estado TEXT, verificacion TEXT, descripcion TEXT, encuesta_resultado TEXT, FOREIGN KEY (cliente_id) REFERENCES clientes (cliente_id))",
+    "CREATE TABLE notificaciones (notificacion_id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id TEXT, mensaje TEXT, link TEXT, leida INTEGER DEFAULT 0, FOREIGN KEY (cliente_id) REFERENCES clientes (cliente_id))",
+    "CREATE TABLE tokens_verificacion (id INTEGER PRIMARY KEY AUTOINCREMENT, token TEXT UNIQUE, incidencia_id INTEGER, fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY (incidencia_id) REFERENCES incidencias (id))",
+]
+
+INDICES = ['ux_incidencias_abierta', 'ux_tokens_incidencia', 'idx_incidencias_activas_fecha', 'idx_notificaciones_cliente',
+           'idx_incidencias_clase_fecha', 'idx_incidencias_verificacion_fecha']
+
+ABIERTAS_DUPLICADAS = "SELECT cliente_id, COUNT(*) FROM incidencias WHERE verificacion != 'RESUELTA' GROUP BY cliente_id HAVING COUNT(*) > 1"
+
+def pagina_sql(filtro, despues_de=False):
+    """La consulta de get_pagina_incidencias para un filtro (con la condición del propio motor)."""
+    condicion, params = motor_gesai._filtro_incidencias(filtro)
+    sql = ("SELECT i.*, c.nombre as cliente_nombre FROM incidencias i JOIN clientes c ON i.cliente_id = c.cliente_id "
+           f"WHERE i.verificacion != 'RESUELTA'{condicion}")
+    if despues_de:
+        sql += " AND (i.fecha_deteccion, i.id) < (?, ?)"
+        params += ['2024-01-01 00:00:00', 10**6]
+    return sql + " ORDER BY i.fecha_deteccion DESC, i.id DESC LIMIT ?", params + [51]
+
+#(qué es, sentencia, parámetros, índice que tiene que aparecer en el plan)
+CONSULTAS = [
+    ('listado del dashboard', *pagina_sql('todas'), 'idx_incidencias_activas_fecha'),
+    ('listado, página siguiente', *pagina_sql('todas', True), 'idx_incidencias_activas_fecha'),
+    ('listado filtrado por clase', *pagina_sql('Grave'), 'idx_incidencias_clase_fecha'),
+    ('listado de cartas pendientes', *pagina_sql('carta'), 'idx_incidencias_verificacion_fecha'),
+    ('incidencia abierta del cliente', "SELECT id FROM incidencias WHERE cliente_id = ? AND verificacion != 'RESUELTA'", ['1'], 'ux_incidencias_abierta'),
+    ('notificaciones pendientes', "SELECT * FROM notificaciones WHERE cliente_id=? AND leida=0", ['1'], 'idx_notificaciones_cliente'),
+    ('token de una incidencia', "SELECT token FROM tokens_verificacion WHERE incidencia_id = ?", [1], 'ux_tokens_incidencia'),
+]
+
+@pytest.fixture
+def migrada(tmp_path):
+    """BBDD v0 con tres incidencias abiertas del mismo cliente (lo que dejaba la carrera SELECT + INSERT), migrada."""
+    conn = sqlite3.connect(str(tmp_path / 'v0.db'))
+    for sql in TABLAS_V0: conn.execute(sql)
+    conn.execute("INSERT INTO clientes (cliente_id) VALUES ('1')")
+    conn.executemany("INSERT INTO incidencias (cliente_id, estado, verificacion) VALUES ('1', 'Fuga Grave', 'PENDIENTE')", [()] * 3)
+    conn.commit()
+    migraciones_bbdd.migrar(conn)
+    yield conn
+    conn.close()
+
+def test_migra_a_la_ultima_version_con_sus_indices(migrada):
+    assert migraciones_bbdd.version(migrada) == migraciones_bbdd.VERSION_ACTUAL
+    existentes = {r[0] for r in migrada.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(INDICES) <= existentes
+
+def test_migracion_cierra_las_abiertas_duplicadas(migrada):
+    assert migrada.execute(ABIERTAS_DUPLICADAS).fetchall() == []
+    assert migrada.execute("SELECT COUNT(*) FROM incidencias WHERE verificacion != 'RESUELTA'").fetchone()[0] == 1
+
+def test_indice_unico_rechaza_una_segunda_abierta(migrada):
+    unicos = {r[1]: r[2] for r in migrada.execute("PRAGMA index_list(incidencias)")}
+    assert unicos.get('ux_incidencias_abierta') == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        migrada.execute("INSERT INTO incidencias (cliente_id, estado, verificacion) VALUES ('1', 'Fuga Grave', 'PENDIENTE')")
+    migrada.rollback()
+
+@pytest.mark.parametrize('nombre, sql, params, indice', CONSULTAS, ids=[c[0] for c in CONSULTAS])
+def test_consulta_caliente_usa_su_indice(migrada, nombre, sql, params, indice):
+    plan = [r[3] for r in migrada.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    assert any(indice in paso for paso in plan), f"{nombre}: {' / '.join(plan)}"
+
+def _detector(args):
+    """Proceso detector: alertas sueltas (una transacción cada una) sobre pocos clientes; retorna los errores."""
+    k, alertas, clientes = args
+    motor_gesai.cerrar_pool_bbdd()  #Conexiones propias de este proceso
+    rng = random.Random(k)
+    estados = ['Fuga Grave', 'Fuga Moderada', 'Fuga Leve (Tendencia)']
+    errores = 0
+    for _ in range(alertas):
+        res = motor_gesai.registrar_alertas([(0, str(100000 + rng.randrange(clientes)), rng.choice(estados), 'test', 0.9, 'test')])
+        errores += sum(r.get('status') == 'ERROR' for r in res)
+    motor_gesai.cerrar_pool_bbdd()
+    return errores
+
+@pytest.mark.skipif('fork' not in mp.get_all_start_methods(), reason="Los detectores heredan el motor configurado por fork")
+def test_una_abierta_por_cliente_con_upserts_concurrentes(bbdd, monkeypatch):
+    procesos, alertas, clientes = 8, 150, 10
+    monkeypatch.setattr(motor_gesai.antirrebote, 'intervalo', 0)  #Cada alerta llega al upsert
+    monkeypatch.setattr(motor_gesai, 'GRUPO_COMMIT', 0)
+    conn = sqlite3.connect(bbdd)
+    conn.execute("PRAGMA journal_mode = WAL")
+    #La mitad de los clientes sin dar de alta: también chocan las altas
+    conn.executemany("INSERT INTO clientes (cliente_id) VALUES (?)", [(str(100000 + c),) for c in range(0, clientes, 2)])
+    conn.commit()
+    with mp.get_context('fork').Pool(procesos) as pool:
+        pendiente = pool.map_async(_detector, [(k, alertas, clientes) for k in range(procesos)])
+        #Mientras tanto, la app resuelve incidencias: la siguiente alerta del cliente abre otra
+        resueltas, rng = 0, random.Random(0)
+        while not pendiente.ready():
+            with conn: resueltas += conn.execute("UPDATE incidencias SET verificacion = 'RESUELTA' WHERE cliente_id = ? AND verificacion != 'RESUELTA'",
+                                                 (str(100000 + rng.randrange(clientes)),)).rowcount
+            pendiente.wait(0.01)
+        errores = sum(pendiente.get(timeout=300))
+    duplicadas = conn.execute(ABIERTAS_DUPLICADAS).fetchall()
+    total = conn.execute("SELECT COUNT(*) FROM incidencias").fetchone()[0]
+    conn.close()
+    assert errores == 0
+    assert total > clientes  #Hubo incidencias resueltas y reabiertas durante la carrera
+    assert duplicadas == []